@@ -0,0 +1,43 @@
+"""Draining a scanner's offline queue: POST /attendance once per scan versus one /attendance/sync
+
+    python -m benchmarks.attendance_sync [--scans 300]
+
+Each run gets its own freshly issued QR codes, since a code can only be
+used once.
+"""
+import argparse
+
+from benchmarks.harness import app_client, queued_scans, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scans", type=int, default=300)
+    args = parser.parse_args()
+    
+    with app_client(students=30) as (client, headers, student_ids):
+        single = queued_scans(student_ids, args.scans)
+        batch = queued_scans(student_ids, args.scans)
+        
+        def one_by_one():
+            for scan in single:
+                item = {key: value for key, value in scan.items() if key != "idempotency_key"}
+                client.post("/api/v1/attendance/", json=item, headers=headers).raise_for_status()
+        
+        def synced():
+            for start in range(0, len(batch), 1000):
+                response = client.post(
+                    "/api/v1/attendance/sync",
+                    json={"scans": batch[start:start + 1000]},
+                    headers=headers
+                )
+                response.raise_for_status()
+                assert response.json()["rejected"] == 0, response.text
+        
+        # The codes are spent by the first run, so each side runs once
+        timed(f"{args.scans} x POST /attendance/", one_by_one, repeat=1)
+        timed(f"POST /attendance/sync with {args.scans} scans", synced, repeat=1)
+
+
+if __name__ == "__main__":
+    main()
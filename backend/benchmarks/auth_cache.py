@@ -0,0 +1,35 @@
+"""Authenticated requests with and without the principal cache
+
+    python -m benchmarks.auth_cache [--requests 500]
+
+The cold run clears the cache before every request, so each one loads the
+user row again, as every request did before the cache existed.
+"""
+import argparse
+
+from benchmarks.harness import app_client, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    
+    from src.auth.auth import principal_cache
+    
+    with app_client() as (client, headers, _):
+        def cold():
+            for _ in range(args.requests):
+                principal_cache.clear()
+                client.get("/api/v1/auth/me", headers=headers).raise_for_status()
+        
+        def warm():
+            for _ in range(args.requests):
+                client.get("/api/v1/auth/me", headers=headers).raise_for_status()
+        
+        timed(f"{args.requests} x GET /auth/me, user row loaded", cold)
+        timed(f"{args.requests} x GET /auth/me, cached principal", warm)
+
+
+if __name__ == "__main__":
+    main()
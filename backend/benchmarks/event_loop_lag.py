@@ -0,0 +1,100 @@
+"""Event-loop lag while history queries run on the sync and the async engine
+
+    python -m benchmarks.event_loop_lag [--fixes 20000] [--queries 20]
+
+A probe task sleeps 10 ms in a loop and records how late it wakes up while
+`--queries` concurrent coroutines each read 1000 rows of location history.
+The sync run issues the query through SessionLocal inside the coroutine,
+as the hot routes did before they moved to AsyncSession; the async run
+awaits the same query on AsyncSessionLocal.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from benchmarks.harness import app_client
+
+PROBE_INTERVAL = 0.01
+
+
+def _history_query(student_pk: int):
+    from src import models
+    
+    return (
+        select(models.LocationTracking)
+        .where(models.LocationTracking.student_id == student_pk)
+        .order_by(models.LocationTracking.timestamp.desc())
+        .limit(1000)
+    )
+
+
+async def _probe(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def _measure(label: str, read, queries: int):
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(read() for _ in range(queries)))
+    elapsed = (time.perf_counter() - started) * 1000
+    stop.set()
+    await probe
+    print(
+        f"{label:<28} total {elapsed:8.1f} ms  "
+        f"loop lag max {max(lags) * 1000:7.1f} ms  median {statistics.median(lags) * 1000:6.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixes", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+    
+    with app_client(students=1) as (client, headers, student_ids):
+        start = datetime.now(timezone.utc) - timedelta(days=1)
+        for offset in range(0, args.fixes, 1000):
+            client.post("/api/v1/location/batch", headers=headers, json={"locations": [
+                {
+                    "student_id": student_ids[0],
+                    "timestamp": (start + timedelta(seconds=5 * index)).isoformat(),
+                    "location": {"lat": -1.2921, "lng": 36.8219},
+                    "accuracy": 5
+                }
+                for index in range(offset, min(offset + 1000, args.fixes))
+            ]}).raise_for_status()
+    
+    from config.database import AsyncSessionLocal, SessionLocal
+    from src import models
+    
+    with SessionLocal() as db:
+        student_pk = db.execute(select(models.Student.id)).scalar_one()
+    query = _history_query(student_pk)
+    
+    async def sync_read():
+        with SessionLocal() as db:
+            db.execute(query).scalars().all()
+    
+    async def async_read():
+        async with AsyncSessionLocal() as db:
+            (await db.execute(query)).scalars().all()
+    
+    async def run():
+        await _measure("sync Session in coroutine", sync_read, args.queries)
+        await _measure("AsyncSession", async_read, args.queries)
+    
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
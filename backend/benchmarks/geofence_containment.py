@@ -0,0 +1,75 @@
+"""GeofenceIndex.is_inside throughput over many schools
+
+    python -m benchmarks.geofence_containment [--schools 3000] [--fixes 500000]
+
+Builds circle and polygon fences for `schools` schools spread over Kenya
+and checks a mix of fixes against each student's own school: about a
+third inside the fence, a third near it and a third far away.
+"""
+import argparse
+import json
+import random
+import time
+from types import SimpleNamespace
+
+from benchmarks import harness  # noqa: F401  (environment for the app imports)
+
+
+def _schools(count: int, rng: random.Random) -> list:
+    schools = []
+    for school_id in range(1, count + 1):
+        lat, lng = rng.uniform(-4.5, 4.5), rng.uniform(34.0, 41.5)
+        polygon = None
+        if school_id % 4 == 0:
+            # A 400 m square, as drawn around a compound
+            half = 0.0018
+            polygon = json.dumps([
+                (lat - half, lng - half), (lat - half, lng + half), (lat + half, lng + half), (lat + half, lng - half)
+            ])
+        schools.append(SimpleNamespace(
+            id=school_id, name=f"School {school_id}", latitude=lat, longitude=lng,
+            geofence_radius_m=None, geofence_polygon=polygon
+        ))
+    return schools
+
+
+def _fixes(schools: list, count: int, rng: random.Random) -> list:
+    fixes = []
+    for index in range(count):
+        school = rng.choice(schools)
+        spread = (0.001, 0.01, 1.0)[index % 3]
+        fixes.append((
+            school.id,
+            school.latitude + rng.uniform(-spread, spread),
+            school.longitude + rng.uniform(-spread, spread)
+        ))
+    return fixes
+
+
+def main():
+    from src.geofencing.engine import GeofenceIndex, build_geofence
+    
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schools", type=int, default=3000)
+    parser.add_argument("--fixes", type=int, default=500_000)
+    args = parser.parse_args()
+    
+    rng = random.Random(0)
+    schools = _schools(args.schools, rng)
+    index = GeofenceIndex(build_geofence(school) for school in schools)
+    fixes = _fixes(schools, args.fixes, rng)
+    
+    samples = []
+    for _ in range(3):
+        started = time.perf_counter()
+        inside = sum(index.is_inside(school_id, lat, lng) for school_id, lat, lng in fixes)
+        samples.append(time.perf_counter() - started)
+    elapsed = sorted(samples)[1]
+    print(
+        f"{args.fixes} fixes against {args.schools} schools: {inside} inside, "
+        f"{elapsed * 1000:.0f} ms, {args.fixes / elapsed / 1000:.0f}k fixes/s (median of 3)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Douglas-Peucker simplification and polyline size for a synthetic day of fixes
+
+    python -m benchmarks.gps_paths [--hours 24] [--interval 5] [--noise-m 3]
+
+Builds a wandering track with one fix every `interval` seconds and gaussian
+noise, then reports how many points each tolerance keeps, how long
+simplify_path takes, and the size of the response in each format.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.reports import geometry
+
+METRES_PER_DEGREE = 111_000
+
+
+def _track(count: int, interval: float, noise_m: float):
+    # A random walk at walking-to-bus speeds, heading changing slowly
+    rng = np.random.default_rng(0)
+    heading = np.cumsum(rng.normal(0, 0.05, count))
+    step_m = np.abs(rng.normal(1.2, 0.5, count)) * interval
+    north = np.cumsum(step_m * np.cos(heading)) + rng.normal(0, noise_m, count)
+    east = np.cumsum(step_m * np.sin(heading)) + rng.normal(0, noise_m, count)
+    return -1.28 + north / METRES_PER_DEGREE, 36.82 + east / METRES_PER_DEGREE
+
+
+def _points_json(lats, lngs, start: datetime, interval: float) -> int:
+    path = [
+        {"timestamp": (start + timedelta(seconds=interval * index)).isoformat(), "lat": lat, "lng": lng, "accuracy": 5.0}
+        for index, (lat, lng) in enumerate(zip(lats.tolist(), lngs.tolist()))
+    ]
+    return len(json.dumps({"path": path}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--interval", type=float, default=5)
+    parser.add_argument("--noise-m", type=float, default=3)
+    args = parser.parse_args()
+    
+    count = int(args.hours * 3600 / args.interval)
+    lats, lngs = _track(count, args.interval, args.noise_m)
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    print(f"{'raw':<16} {count:>7} points  {_points_json(lats, lngs, start, args.interval) / 1024:8.1f} KB points JSON")
+    
+    for tolerance in (10, 25):
+        samples = []
+        for _ in range(3):
+            started = time.perf_counter()
+            keep = geometry.simplify_path(lats, lngs, tolerance)
+            samples.append((time.perf_counter() - started) * 1000)
+        polyline = geometry.encode_polyline(lats[keep], lngs[keep])
+        points_kb = _points_json(lats[keep], lngs[keep], start, args.interval) / 1024
+        print(
+            f"{f'tolerance {tolerance} m':<16} {len(keep):>7} points  {points_kb:8.1f} KB points JSON"
+            f"  {len(polyline) / 1024:6.1f} KB polyline  {sorted(samples)[1]:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Shared setup for the benchmark scripts
+
+Each script runs the app in-process against a throwaway SQLite database,
+the same way the test suite does, so the numbers it prints can be
+reproduced on any machine with `python -m benchmarks.<name>` from the
+backend directory. Absolute timings depend on the machine; compare the
+rows a script prints against each other, not against another machine.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, List, Tuple
+
+_db_dir = tempfile.mkdtemp(prefix="esalama-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/bench.db")
+os.environ.setdefault("DEBUG", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = "bench-password"
+
+
+@contextmanager
+def app_client(students: int = 10) -> Iterator[Tuple[object, dict, List[str]]]:
+    """A TestClient on a fresh database with one school, an admin and `students` students"""
+    from fastapi.testclient import TestClient
+    
+    from config.database import SessionLocal
+    from src import models
+    from src.auth.auth import get_password_hash
+    from src.main import app
+    
+    with TestClient(app) as client:
+        db = SessionLocal()
+        admin = models.User(
+            email="admin@example.com",
+            hashed_password=get_password_hash(PASSWORD),
+            full_name="Admin",
+            role=models.UserRole.ADMIN
+        )
+        school = models.School(name="Bench School", code="BS1", latitude=-1.28, longitude=36.82)
+        db.add_all([admin, school])
+        db.commit()
+        student_ids = [f"B{index:05d}" for index in range(students)]
+        db.add_all([
+            models.Student(
+                student_id=student_id,
+                full_name=f"Student {student_id}",
+                class_name="4A",
+                school_id=school.id,
+                parent_id=admin.id,
+                teacher_id=admin.id
+            )
+            for student_id in student_ids
+        ])
+        db.commit()
+        db.close()
+        
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": "admin@example.com", "password": PASSWORD}
+        )
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        yield client, headers, student_ids
+
+
+def timed(label: str, function: Callable[[], object], repeat: int = 3) -> float:
+    """Run function `repeat` times and print the median wall time in ms"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    median = statistics.median(samples)
+    print(f"{label:<48} {median:10.1f} ms  (median of {repeat})")
+    return median
+
+
+def queued_scans(student_ids: List[str], count: int) -> List[dict]:
+    """Issue `count` arrival codes, stored as /qr/generate would, as /attendance/sync scans"""
+    from config.database import SessionLocal
+    from src import models
+    from src.qr_verification.tokens import issue_qr_token
+    
+    now = datetime.now(timezone.utc)
+    expires_at = (now + timedelta(minutes=15)).replace(microsecond=0)
+    with SessionLocal() as db:
+        pks = dict(db.query(models.Student.student_id, models.Student.id))
+        scans, rows = [], []
+        for index in range(count):
+            student_id = student_ids[index % len(student_ids)]
+            token = issue_qr_token(student_id, models.AttendanceType.ARRIVAL, expires_at)
+            rows.append(models.QRToken(
+                token=token, student_id=pks[student_id], type=models.AttendanceType.ARRIVAL, expires_at=expires_at
+            ))
+            scans.append({
+                "student_id": student_id,
+                "type": "arrival",
+                "timestamp": (now - timedelta(seconds=count - index)).isoformat(),
+                "location": {"lat": -1.28, "lng": 36.82},
+                "qr_code_token": token,
+                "scanner_id": "bench-gate",
+                "idempotency_key": str(uuid.uuid4())
+            })
+        db.add_all(rows)
+        db.commit()
+    return scans
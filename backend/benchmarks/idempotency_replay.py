@@ -0,0 +1,48 @@
+"""POST /location with fresh Idempotency-Keys versus replays of the same keys
+
+    python -m benchmarks.idempotency_replay [--fixes 200]
+
+The first pass runs the handler for every key; the second sends identical
+retries, which the middleware answers from the store without touching the
+handler or the database.
+"""
+import argparse
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.harness import app_client, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixes", type=int, default=200)
+    args = parser.parse_args()
+    
+    with app_client() as (client, headers, student_ids):
+        start = datetime.now(timezone.utc)
+        requests = [
+            (
+                {**headers, "Idempotency-Key": str(uuid.uuid4())},
+                {
+                    "student_id": student_ids[index % len(student_ids)],
+                    "timestamp": (start + timedelta(seconds=index)).isoformat(),
+                    "location": {"lat": -1.2921 + index * 1e-5, "lng": 36.8219},
+                    "accuracy": 5
+                }
+            )
+            for index in range(args.fixes)
+        ]
+        
+        def post_all(replayed: bool):
+            for request_headers, fix in requests:
+                response = client.post("/api/v1/location/", json=fix, headers=request_headers)
+                response.raise_for_status()
+                assert (response.headers.get("Idempotent-Replayed") == "true") == replayed
+        
+        # Keys are spent by the first pass, so it can only run once
+        timed(f"{args.fixes} x POST /location/, new keys", lambda: post_all(False), repeat=1)
+        timed(f"{args.fixes} x POST /location/, replayed keys", lambda: post_all(True))
+
+
+if __name__ == "__main__":
+    main()
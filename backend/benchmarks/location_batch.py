@@ -0,0 +1,48 @@
+"""POST /location once per fix versus one POST /location/batch
+
+    python -m benchmarks.location_batch [--fixes 500]
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.harness import app_client, timed
+
+
+def _fixes(student_ids, count: int) -> list:
+    start = datetime.now(timezone.utc)
+    return [
+        {
+            "student_id": student_ids[index % len(student_ids)],
+            "timestamp": (start + timedelta(seconds=index)).isoformat(),
+            "location": {"lat": -1.2921 + index * 1e-5, "lng": 36.8219},
+            "accuracy": 5
+        }
+        for index in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixes", type=int, default=500)
+    args = parser.parse_args()
+    
+    with app_client() as (client, headers, student_ids):
+        def one_by_one():
+            for fix in _fixes(student_ids, args.fixes):
+                client.post("/api/v1/location/", json=fix, headers=headers).raise_for_status()
+        
+        def batched():
+            fixes = _fixes(student_ids, args.fixes)
+            for start in range(0, len(fixes), 1000):
+                client.post(
+                    "/api/v1/location/batch",
+                    json={"locations": fixes[start:start + 1000]},
+                    headers=headers
+                ).raise_for_status()
+        
+        timed(f"{args.fixes} x POST /location/", one_by_one)
+        timed(f"POST /location/batch with {args.fixes} fixes", batched)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Notification rows written for a burst of arrival scans, with and without digests
+
+    python -m benchmarks.notification_digest [--scans 120] [--window 60]
+
+Three students share one parent and one teacher. The burst is synced in one
+/attendance/sync request, first with the digest window off and then with
+`--window` seconds, after which open digests are flushed as at shutdown.
+"""
+import argparse
+
+from sqlalchemy import func, select
+
+from benchmarks.harness import app_client, queued_scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scans", type=int, default=120)
+    parser.add_argument("--window", type=float, default=60)
+    args = parser.parse_args()
+    
+    with app_client(students=3) as (client, headers, student_ids):
+        from config.database import SessionLocal
+        from src import models
+        from src.notifications.service import coalescer
+        
+        with SessionLocal() as db:
+            parent = models.User(email="parent@example.com", hashed_password="!", full_name="Parent",
+                                 role=models.UserRole.PARENT)
+            teacher = models.User(email="teacher@example.com", hashed_password="!", full_name="Teacher",
+                                  role=models.UserRole.TEACHER)
+            db.add_all([parent, teacher])
+            db.flush()
+            for student in db.query(models.Student):
+                student.parent_id, student.teacher_id = parent.id, teacher.id
+            db.commit()
+        
+        def notification_rows() -> int:
+            with SessionLocal() as db:
+                return db.scalar(select(func.count()).select_from(models.Notification))
+        
+        for window in (0, args.window):
+            coalescer.window_seconds = window
+            before, digests = notification_rows(), coalescer.digests_sent
+            scans = queued_scans(student_ids, args.scans)
+            client.post("/api/v1/attendance/sync", json={"scans": scans}, headers=headers).raise_for_status()
+            client.portal.call(coalescer.flush, True)
+            print(
+                f"window {window:>5.0f}s: {args.scans} scans -> {notification_rows() - before:4} notification rows "
+                f"({coalescer.digests_sent - digests} digests)"
+            )
+
+
+if __name__ == "__main__":
+    main()
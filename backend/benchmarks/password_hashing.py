@@ -0,0 +1,67 @@
+"""Event-loop lag during a burst of logins, bcrypt inline versus on the executor
+
+    python -m benchmarks.password_hashing [--logins 20]
+
+A probe task sleeps 10 ms in a loop and records how late it wakes up while
+`--logins` coroutines each verify a bcrypt hash: first by calling
+verify_password directly, as the login route did before, then through
+verify_password_async on the bounded password executor.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks import harness  # noqa: F401  (environment for the app imports)
+
+PROBE_INTERVAL = 0.01
+
+
+async def _probe(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def _measure(label: str, verify, logins: int):
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(verify() for _ in range(logins)))
+    elapsed = (time.perf_counter() - started) * 1000
+    stop.set()
+    await probe
+    print(
+        f"{label:<28} total {elapsed:8.1f} ms  "
+        f"loop lag max {max(lags) * 1000:7.1f} ms  median {statistics.median(lags) * 1000:6.2f} ms"
+    )
+
+
+def main():
+    from src.auth.auth import get_password_hash, verify_password, verify_password_async
+    from src.auth.passwords import password_executor
+    
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=20)
+    args = parser.parse_args()
+    
+    hashed = get_password_hash(harness.PASSWORD)
+    
+    async def inline():
+        assert verify_password(harness.PASSWORD, hashed)
+    
+    async def executor():
+        assert await verify_password_async(harness.PASSWORD, hashed)
+    
+    async def run():
+        await _measure("inline verify_password", inline, args.logins)
+        await _measure(f"executor ({password_executor.workers} workers)", executor, args.logins)
+    
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
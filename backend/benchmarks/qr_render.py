@@ -0,0 +1,48 @@
+"""Cost of rendering a QR code in each format, and of a render-cache hit
+
+    python -m benchmarks.qr_render [--codes 50]
+
+Renders `--codes` distinct attendance codes with render_qr, once per
+format, then reads them back through render_cached.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import harness  # noqa: F401  (environment for the app imports)
+
+
+def main():
+    from src.models import AttendanceType
+    from src.qr_verification.rendering import qr_content, render_cached, render_qr
+    from src.qr_verification.tokens import issue_qr_token
+    
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--codes", type=int, default=50)
+    args = parser.parse_args()
+    
+    expires_at = (datetime.now(timezone.utc) + timedelta(minutes=15)).replace(microsecond=0)
+    tokens = [issue_qr_token(f"B{index:05d}", AttendanceType.ARRIVAL, expires_at) for index in range(args.codes)]
+    contents = [qr_content(f"B{index:05d}", "arrival", token) for index, token in enumerate(tokens)]
+    
+    for output_format in ("matrix", "svg", "png"):
+        started = time.perf_counter()
+        for content in contents:
+            render_qr(content, output_format)
+        per_code = (time.perf_counter() - started) / args.codes
+        print(f"render_qr {output_format:<6}          {per_code * 1000:8.2f} ms per code")
+    
+    async def cached():
+        for token, content in zip(tokens, contents):
+            await render_cached(token, content, "png", expires_at)
+        started = time.perf_counter()
+        for token, content in zip(tokens, contents):
+            await render_cached(token, content, "png", expires_at)
+        return (time.perf_counter() - started) / args.codes
+    
+    print(f"render_cached hit             {asyncio.run(cached()) * 1e6:8.2f} us per code")
+
+
+if __name__ == "__main__":
+    main()
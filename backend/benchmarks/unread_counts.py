@@ -0,0 +1,81 @@
+"""Unread badge: COUNT(*) over the partial index versus the maintained counter
+
+    python -m benchmarks.unread_counts [--notifications 500000] [--recipients 1000] [--reads 2000]
+
+Fills the notifications table with `--notifications` rows spread over
+`--recipients` users, 3% of them unread, rebuilds the counters, then times
+`--reads` badge lookups for random recipients each way.
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import func, insert, select
+
+from benchmarks.harness import app_client
+
+
+def _fill(db, notifications: int, recipients: int) -> list:
+    from src import models
+    
+    users = db.execute(
+        insert(models.User).returning(models.User.id),
+        [
+            {"email": f"user{index}@example.com", "hashed_password": "!", "full_name": f"User {index}",
+             "role": models.UserRole.PARENT}
+            for index in range(recipients)
+        ]
+    ).scalars().all()
+    rng = random.Random(0)
+    for start in range(0, notifications, 50_000):
+        db.execute(insert(models.Notification), [
+            {"recipient_id": rng.choice(users), "type": "arrival", "message": "Arrived at school",
+             "is_read": rng.random() >= 0.03}
+            for _ in range(start, min(start + 50_000, notifications))
+        ])
+    db.commit()
+    return users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notifications", type=int, default=500_000)
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+    
+    with app_client(students=1):
+        from config.database import SessionLocal
+        from src import models
+        from src.notifications.counters import rebuild_unread_counts
+        
+        with SessionLocal() as db:
+            users = _fill(db, args.notifications, args.recipients)
+            rebuild_unread_counts(db)
+            
+            count_query = (
+                select(func.count())
+                .select_from(models.Notification)
+                .where(models.Notification.is_read.is_(False))
+            )
+            counter_query = select(models.NotificationCounter.unread)
+            rng = random.Random(1)
+            recipients = [rng.choice(users) for _ in range(args.reads)]
+            
+            for label, lookup in [
+                ("COUNT(*) of unread rows", lambda user_id: db.scalar(
+                    count_query.where(models.Notification.recipient_id == user_id)
+                )),
+                ("notification_counters lookup", lambda user_id: db.scalar(
+                    counter_query.where(models.NotificationCounter.recipient_id == user_id)
+                ) or 0)
+            ]:
+                started = time.perf_counter()
+                for user_id in recipients:
+                    lookup(user_id)
+                per_read = (time.perf_counter() - started) / args.reads
+                print(f"{label:<32} {per_read * 1e6:8.1f} us per badge read")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Broadcast delivery time with one stalled subscriber among fast ones
+
+    python -m benchmarks.websocket_fanout [--clients 50] [--messages 20] [--slow-ms 200]
+
+Compares awaiting every socket's send in turn (the broadcast loop before
+each connection got its own queue) with ConnectionManager, and reports how
+long the fast subscribers took to receive every message.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import harness  # noqa: F401  (environment for the app imports)
+
+
+class FakeWebSocket:
+    def __init__(self, send_delay: float):
+        self.send_delay = send_delay
+        self.received = 0
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, text: str):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.received += 1
+    
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def _wait_for(sockets, messages: int):
+    while any(websocket.received < messages for websocket in sockets):
+        await asyncio.sleep(0.001)
+
+
+async def _sequential(args) -> float:
+    slow = FakeWebSocket(args.slow_ms / 1000)
+    fast = [FakeWebSocket(0) for _ in range(args.clients - 1)]
+    started = time.perf_counter()
+    for n in range(args.messages):
+        text = json.dumps({"type": "location_update", "n": n})
+        for websocket in [slow, *fast]:
+            await websocket.send_text(text)
+    await _wait_for(fast, args.messages)
+    return time.perf_counter() - started
+
+
+async def _queued(args) -> float:
+    from src.streaming.routes import ConnectionManager
+    
+    manager = ConnectionManager()
+    slow = FakeWebSocket(args.slow_ms / 1000)
+    fast = [FakeWebSocket(0) for _ in range(args.clients - 1)]
+    for websocket in [slow, *fast]:
+        await manager.connect_location(websocket, "STU0")
+    started = time.perf_counter()
+    for n in range(args.messages):
+        await manager.broadcast_location("STU0", {"type": "location_update", "n": n})
+        # Updates arrive from separate requests; without a yield a burst
+        # larger than the queue would drop fast clients' messages too
+        await asyncio.sleep(0)
+    await _wait_for(fast, args.messages)
+    elapsed = time.perf_counter() - started
+    for websocket in [slow, *fast]:
+        manager.disconnect_location(websocket, "STU0")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--slow-ms", type=float, default=200)
+    args = parser.parse_args()
+    
+    for label, run in [("sequential await per socket", _sequential), ("per-connection queues", _queued)]:
+        elapsed = asyncio.run(run(args))
+        print(f"{label:<30} fast clients got {args.messages} messages in {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
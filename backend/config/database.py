@@ -1,25 +1,179 @@
 """Database connection and session management"""
+import threading
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from config.settings import get_settings
 
 settings = get_settings()
 
+# Async drivers used for each synchronous database URL scheme
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Translate the configured database URL to its asyncio driver"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS:
+        url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return url.render_as_string(hide_password=False)
+
+
+class PoolWaitStats:
+    """How long requests waited to check a connection out of a pool"""
+    
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_seconds / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3)
+            }
+
+
+class _TimedPoolMixin:
+    """Records the time spent waiting for a free connection on every checkout"""
+    wait_stats: PoolWaitStats
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    wait_stats = PoolWaitStats()
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    wait_stats = PoolWaitStats()
+
+
+def _engine_options(database_url: str, is_async: bool) -> dict:
+    """Pool sizing and per-connection settings for an engine"""
+    options = {
+        "pool_pre_ping": True,
+        "echo": settings.debug
+    }
+    backend = make_url(database_url).get_backend_name()
+    if backend == "sqlite":
+        # SQLite keeps SQLAlchemy's default pooling; sizing knobs don't apply
+        return options
+    
+    options.update(
+        poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle
+    )
+    
+    if backend == "postgresql" and settings.db_statement_timeout_ms:
+        timeout = str(settings.db_statement_timeout_ms)
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    
+    return options
+
+
 # Create engine
 engine = create_engine(
     settings.database_url,
-    pool_pre_ping=True,
-    echo=settings.debug
+    **_engine_options(settings.database_url, is_async=False)
 )
 
-# Create session factory
+# Create async engine for the async route handlers
+async_engine = create_async_engine(
+    get_async_database_url(settings.database_url),
+    **_engine_options(settings.database_url, is_async=True)
+)
+
+
+def pool_status(pool) -> dict:
+    """Connection counts and checkout wait times for a connection pool"""
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout()
+        )
+    if isinstance(pool, _TimedPoolMixin):
+        status["wait"] = pool.wait_stats.snapshot()
+    return status
+
+
+def get_pool_metrics() -> dict:
+    """Pool telemetry for both the sync and async engines of this process"""
+    return {
+        "sync": pool_status(engine.pool),
+        "async": pool_status(async_engine.pool)
+    }
+
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Base class for models
 Base = declarative_base()
 
 
+# INSERT constructs that support ON CONFLICT upserts, by dialect name
+_upsert_inserts = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def upsert_insert(db, table):
+    """Dialect-specific INSERT for table that offers on_conflict_do_update"""
+    return _upsert_inserts[db.bind.dialect.name](table)
+
+
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
@@ -27,3 +181,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency to get an async database session that never blocks the event loop"""
+    async with AsyncSessionLocal() as db:
+        yield db
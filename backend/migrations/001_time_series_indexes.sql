@@ -0,0 +1,45 @@
+-- 001: composite indexes for the time-series query patterns
+--
+-- Every hot read filters one student (or recipient) and orders by time:
+--   location:      GET /location/{id}/last, /history, /reports/gps-paths
+--   attendance:    GET /attendance, /reports/attendance
+--   notifications: GET /notifications, /reports/alerts
+--   audit logs:    GET /audit-logs (timestamp range)
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so apply
+-- this file with autocommit (plain psql does this by default):
+--   psql "$DATABASE_URL" -f migrations/001_time_series_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_attendance_student_id_timestamp
+    ON attendance (student_id, timestamp DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_attendance_timestamp
+    ON attendance (timestamp);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_location_tracking_student_id_timestamp
+    ON location_tracking (student_id, timestamp DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_recipient_id_sent_at
+    ON notifications (recipient_id, sent_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_student_id_sent_at
+    ON notifications (student_id, sent_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_audit_logs_timestamp
+    ON audit_logs (timestamp);
+
+-- Only unused tokens are looked up when a code is scanned
+-- (dropped again by 009: the unique index on token already serves these lookups)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_qr_tokens_unused_token
+    ON qr_tokens (token) WHERE is_used = false;
+
+ANALYZE attendance;
+ANALYZE location_tracking;
+ANALYZE notifications;
+ANALYZE audit_logs;
+ANALYZE qr_tokens;
+
+-- Check the planner picks them up, e.g.:
+--   EXPLAIN SELECT * FROM location_tracking
+--     WHERE student_id = 1 ORDER BY timestamp DESC LIMIT 1;
+-- should show "Index Scan using ix_location_tracking_student_id_timestamp".
@@ -0,0 +1,32 @@
+-- 002: latest GPS fix per student
+--
+-- POST /location and /location/batch upsert into this table in the same
+-- transaction as the history insert, so GET /location/{id}/last and the
+-- school dashboard are primary-key / index lookups instead of
+-- ORDER BY timestamp DESC scans over location_tracking.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS student_last_location (
+    student_id  INTEGER PRIMARY KEY REFERENCES students (id),
+    school_id   INTEGER REFERENCES schools (id),
+    latitude    DOUBLE PRECISION NOT NULL,
+    longitude   DOUBLE PRECISION NOT NULL,
+    accuracy    DOUBLE PRECISION,
+    timestamp   TIMESTAMPTZ NOT NULL,
+    updated_at  TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_student_last_location_school_id
+    ON student_last_location (school_id);
+
+-- Backfill from history; relies on ix_location_tracking_student_id_timestamp
+INSERT INTO student_last_location (student_id, school_id, latitude, longitude, accuracy, timestamp)
+SELECT DISTINCT ON (lt.student_id)
+       lt.student_id, s.school_id, lt.latitude, lt.longitude, lt.accuracy, lt.timestamp
+FROM location_tracking lt
+JOIN students s ON s.id = lt.student_id
+ORDER BY lt.student_id, lt.timestamp DESC
+ON CONFLICT (student_id) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,40 @@
+-- 003: per-school, per-class, per-day attendance counts
+--
+-- POST /attendance increments the matching row in the same transaction as
+-- the attendance insert; GET /reports/attendance/summary reads only these
+-- rows. Days are local to SCHOOL_TIMEZONE and arrivals after
+-- LATE_ARRIVAL_TIME count as late. The backfill below assumes the defaults
+-- (Africa/Nairobi, 08:00); with other settings run
+-- `python -m src.reports.rollups rebuild` instead.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS attendance_daily_rollups (
+    school_id      INTEGER NOT NULL REFERENCES schools (id),
+    class_name     VARCHAR NOT NULL DEFAULT '',
+    day            DATE NOT NULL,
+    arrivals       INTEGER NOT NULL DEFAULT 0,
+    departures     INTEGER NOT NULL DEFAULT 0,
+    late_arrivals  INTEGER NOT NULL DEFAULT 0,
+    updated_at     TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (school_id, class_name, day)
+);
+
+CREATE INDEX IF NOT EXISTS ix_attendance_daily_rollups_school_id_day
+    ON attendance_daily_rollups (school_id, day);
+
+INSERT INTO attendance_daily_rollups (school_id, class_name, day, arrivals, departures, late_arrivals)
+SELECT s.school_id,
+       COALESCE(s.class_name, ''),
+       (a.timestamp AT TIME ZONE 'Africa/Nairobi')::date,
+       COUNT(*) FILTER (WHERE a.type = 'ARRIVAL'),
+       COUNT(*) FILTER (WHERE a.type = 'DEPARTURE'),
+       COUNT(*) FILTER (WHERE a.type = 'ARRIVAL'
+                          AND (a.timestamp AT TIME ZONE 'Africa/Nairobi')::time > '08:00')
+FROM attendance a
+JOIN students s ON s.id = a.student_id
+WHERE s.school_id IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (school_id, class_name, day) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,86 @@
+-- 004: monthly range partitions for location_tracking
+--
+-- Rebuilds location_tracking as a table partitioned by RANGE (timestamp),
+-- one partition per UTC month, and copies the existing rows across. The
+-- primary key becomes (id, timestamp) because a partitioned table's unique
+-- constraints must include the partition key; ids keep coming from the same
+-- sequence. Afterwards:
+--   * every worker creates upcoming partitions in the background
+--     (LOCATION_PARTITION_MONTHS_AHEAD), and drops or archives whole months
+--     past LOCATION_RETENTION_MONTHS instead of running bulk DELETEs;
+--   * queries that filter on timestamp only touch the matching partitions.
+--
+-- The copy holds an exclusive lock on location_tracking, so run it in a
+-- maintenance window. Re-running it on an already partitioned table is a
+-- no-op. Rows outside every monthly range (e.g. devices with a wrong clock)
+-- land in location_tracking_default.
+
+DO $$
+DECLARE
+    month_start date;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('location_tracking')
+    ) THEN
+        RAISE NOTICE 'location_tracking is already partitioned';
+        RETURN;
+    END IF;
+
+    ALTER TABLE location_tracking RENAME TO location_tracking_unpartitioned;
+    ALTER TABLE location_tracking_unpartitioned
+        RENAME CONSTRAINT location_tracking_pkey TO location_tracking_unpartitioned_pkey;
+    DROP INDEX IF EXISTS ix_location_tracking_id;
+    DROP INDEX IF EXISTS ix_location_tracking_student_id_timestamp;
+    ALTER SEQUENCE location_tracking_id_seq OWNED BY NONE;
+
+    CREATE TABLE location_tracking (
+        id          INTEGER NOT NULL DEFAULT nextval('location_tracking_id_seq'),
+        student_id  INTEGER NOT NULL REFERENCES students (id),
+        latitude    DOUBLE PRECISION NOT NULL,
+        longitude   DOUBLE PRECISION NOT NULL,
+        accuracy    DOUBLE PRECISION,
+        timestamp   TIMESTAMPTZ NOT NULL,
+        created_at  TIMESTAMPTZ DEFAULT now(),
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+    ALTER SEQUENCE location_tracking_id_seq OWNED BY location_tracking.id;
+
+    -- Created on the parent, so every partition gets its own copy
+    CREATE INDEX ix_location_tracking_id ON location_tracking (id);
+    CREATE INDEX ix_location_tracking_student_id_timestamp
+        ON location_tracking (student_id, timestamp DESC);
+
+    -- One partition per month from the oldest row to two months ahead
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', LEAST(
+                COALESCE((SELECT min(timestamp) FROM location_tracking_unpartitioned), now()),
+                now()
+            ) AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months',
+            interval '1 month'
+        )::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF location_tracking FOR VALUES FROM (%L) TO (%L)',
+            'location_tracking_p' || to_char(month_start, 'YYYY_MM'),
+            month_start::text || ' 00:00:00+00',
+            (month_start + interval '1 month')::date::text || ' 00:00:00+00'
+        );
+    END LOOP;
+    CREATE TABLE location_tracking_default PARTITION OF location_tracking DEFAULT;
+
+    INSERT INTO location_tracking (id, student_id, latitude, longitude, accuracy, timestamp, created_at)
+    SELECT id, student_id, latitude, longitude, accuracy, timestamp, created_at
+    FROM location_tracking_unpartitioned;
+
+    DROP TABLE location_tracking_unpartitioned;
+END
+$$;
+
+ANALYZE location_tracking;
+
+-- Check pruning, e.g.:
+--   EXPLAIN SELECT * FROM location_tracking
+--     WHERE student_id = 1 AND timestamp >= '2024-03-01' AND timestamp < '2024-03-02';
+-- should scan only location_tracking_p2024_03.
@@ -0,0 +1,20 @@
+-- 005: school geofences and per-student geofence state
+--
+-- Schools get an optional radius (metres around latitude/longitude) or
+-- polygon (JSON [[lat, lng], ...]); schools with neither use
+-- GEOFENCE_DEFAULT_RADIUS_M. Every location post updates
+-- student_geofence_state and alerts parents when a student leaves the fence.
+
+BEGIN;
+
+ALTER TABLE schools ADD COLUMN IF NOT EXISTS geofence_radius_m DOUBLE PRECISION;
+ALTER TABLE schools ADD COLUMN IF NOT EXISTS geofence_polygon TEXT;
+
+CREATE TABLE IF NOT EXISTS student_geofence_state (
+    student_id  INTEGER PRIMARY KEY REFERENCES students (id),
+    school_id   INTEGER NOT NULL REFERENCES schools (id),
+    is_inside   BOOLEAN NOT NULL,
+    timestamp   TIMESTAMPTZ NOT NULL
+);
+
+COMMIT;
@@ -0,0 +1,15 @@
+-- 006: index for the QR token sweeper
+--
+-- The background sweeper (src/qr_verification/sweeper.py) deletes tokens
+-- that expired more than QR_TOKEN_RETENTION_MINUTES ago in bounded batches;
+-- this index lets each batch find them without a sequential scan.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so apply
+-- this file with autocommit (plain psql does this by default).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_qr_tokens_expires_at
+    ON qr_tokens (expires_at);
+
+-- The first sweeps on a large table delete a backlog; reclaim the space
+-- afterwards with a plain VACUUM (not VACUUM FULL, which locks the table):
+--   VACUUM (ANALYZE) qr_tokens;
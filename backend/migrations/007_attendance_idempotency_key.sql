@@ -0,0 +1,13 @@
+-- 007: idempotency keys for offline scanner sync
+--
+-- POST /attendance/sync stores the key each gate scanner generates for a
+-- queued scan, so a re-sent queue is recognised instead of recorded twice.
+-- Keys are NULL for scans recorded online; the unique index ignores NULLs.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so apply
+-- this file with autocommit (plain psql does this by default).
+
+ALTER TABLE attendance ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(128);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_attendance_idempotency_key
+    ON attendance (idempotency_key);
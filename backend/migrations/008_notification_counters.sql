@@ -0,0 +1,29 @@
+-- 008: per-recipient unread notification counters
+--
+-- Notification inserts increment notification_counters in the same
+-- transaction, and mark-read decrements it, so GET
+-- /notifications/unread-count is a primary-key lookup. The partial index
+-- serves unread lists and PUT /notifications/read-all.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so apply
+-- this file with autocommit (plain psql does this by default). Apply it
+-- after deploying the application: the backfill overwrites each counter
+-- with an exact recount, so nothing the new code counted first is counted
+-- twice. `python -m src.notifications.counters rebuild` recounts at any time.
+
+CREATE TABLE IF NOT EXISTS notification_counters (
+    recipient_id  INTEGER PRIMARY KEY REFERENCES users (id),
+    unread        INTEGER NOT NULL DEFAULT 0,
+    updated_at    TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_recipient_id_unread
+    ON notifications (recipient_id, id)
+    WHERE is_read = false;
+
+INSERT INTO notification_counters (recipient_id, unread)
+SELECT recipient_id, COUNT(*)
+FROM notifications
+WHERE is_read = false
+GROUP BY recipient_id
+ON CONFLICT (recipient_id) DO UPDATE SET unread = EXCLUDED.unread;
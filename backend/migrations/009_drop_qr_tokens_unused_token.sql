@@ -0,0 +1,12 @@
+-- 009: drop the redundant partial index on qr_tokens.token
+--
+-- 001 added ix_qr_tokens_unused_token (token) WHERE is_used = false, but
+-- token is already covered by the unique ix_qr_tokens_token created with the
+-- table. Every lookup is by exact token, which the unique index answers with
+-- at most one row, so the partial index only cost an extra write per issued
+-- and consumed token.
+--
+-- DROP INDEX CONCURRENTLY cannot run inside a transaction block, so apply
+-- this file with autocommit (plain psql does this by default).
+
+DROP INDEX CONCURRENTLY IF EXISTS ix_qr_tokens_unused_token;
@@ -0,0 +1,41 @@
+-- 010: count absentees from distinct arriving students
+--
+-- attendance_daily_rollups.arrivals counts arrival scans, so a student who
+-- scans in twice made the summary report one absentee too few. Each
+-- student's first arrival of a day now claims a row in student_arrival_days
+-- and only that arrival increments students_arrived, which the summary
+-- subtracts from enrolment. The backfill assumes SCHOOL_TIMEZONE is the
+-- default (Africa/Nairobi); otherwise run
+-- `python -m src.reports.rollups rebuild` instead.
+
+BEGIN;
+
+ALTER TABLE attendance_daily_rollups
+    ADD COLUMN IF NOT EXISTS students_arrived INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS student_arrival_days (
+    student_id  INTEGER NOT NULL REFERENCES students (id),
+    day         DATE NOT NULL,
+    PRIMARY KEY (student_id, day)
+);
+
+INSERT INTO student_arrival_days (student_id, day)
+SELECT DISTINCT a.student_id, (a.timestamp AT TIME ZONE 'Africa/Nairobi')::date
+FROM attendance a
+WHERE a.type = 'ARRIVAL'
+ON CONFLICT (student_id, day) DO NOTHING;
+
+UPDATE attendance_daily_rollups r
+SET students_arrived = counts.students
+FROM (
+    SELECT s.school_id, COALESCE(s.class_name, '') AS class_name, d.day, COUNT(*) AS students
+    FROM student_arrival_days d
+    JOIN students s ON s.id = d.student_id
+    WHERE s.school_id IS NOT NULL
+    GROUP BY 1, 2, 3
+) counts
+WHERE r.school_id = counts.school_id
+  AND r.class_name = counts.class_name
+  AND r.day = counts.day;
+
+COMMIT;
@@ -1,12 +1,28 @@
 """Attendance management API routes"""
-from typing import List, Optional
-from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from config.database import get_db
+from config.database import get_async_db
+from config.settings import get_settings
 from src import models, schemas
 from src.auth.auth import get_current_active_user
+from src.students.resolver import StudentIdentity, get_student_or_404, resolve_students
+from src.reports.rollups import record_attendance_rollup, record_attendance_rollups
+from src.notifications.counters import increment_unread
+from src.notifications.service import add_attendance_notifications, dispatch_attendance_notifications
+from src.qr_verification.tokens import (
+    ExpiredQRToken,
+    InvalidQRToken,
+    QRTokenClaims,
+    spent_nonces,
+    verify_qr_token
+)
+from src.timestamps import as_utc
+
+settings = get_settings()
 
 router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
@@ -14,42 +30,65 @@ router = APIRouter(prefix="/attendance", tags=["Attendance"])
 @router.post("/", response_model=schemas.AttendanceResponse)
 async def record_attendance(
     attendance_data: schemas.AttendanceCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Record student arrival or departure"""
     # Find student
-    student = db.query(models.Student).filter(
-        models.Student.student_id == attendance_data.student_id
-    ).first()
+    student = await get_student_or_404(db, attendance_data.student_id)
     
-    if not student:
+    # Verify QR token signature and expiration before touching the database
+    try:
+        claims = verify_qr_token(attendance_data.qr_code_token)
+    except ExpiredQRToken:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Student not found"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="QR code has expired"
+        )
+    except InvalidQRToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired QR code"
         )
     
-    # Verify QR token
-    qr_token = db.query(models.QRToken).filter(
-        models.QRToken.token == attendance_data.qr_code_token,
-        models.QRToken.is_used.is_(False)
-    ).first()
+    if claims.student_id != student.student_id or claims.type.value != attendance_data.type.value:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="QR code does not match this student"
+        )
     
-    if not qr_token:
+    if spent_nonces.is_spent(claims.nonce):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired QR code"
         )
     
-    if qr_token.expires_at < datetime.now(timezone.utc):
+    # Consume the token in one conditional UPDATE: the row stays the
+    # single-use authority across workers, and of two concurrent scans of
+    # the same code only one can match is_used = false
+    result = await db.execute(
+        update(models.QRToken)
+        .where(
+            models.QRToken.token == attendance_data.qr_code_token,
+            models.QRToken.is_used.is_(False),
+            models.QRToken.expires_at > func.now()
+        )
+        .values(is_used=True)
+        .returning(models.QRToken.student_id, models.QRToken.type)
+        # No QRToken objects are loaded, so skip session sync: it adds the
+        # primary key to RETURNING, and under concurrent scans that column
+        # leaked into the row read below and every scan was rejected
+        .execution_options(synchronize_session=False)
+    )
+    consumed = result.first()
+    
+    if not consumed or consumed.student_id != student.id:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="QR code has expired"
+            detail="Invalid or expired QR code"
         )
     
-    # Mark token as used
-    qr_token.is_used = True
-    
     # Create attendance record
     db_attendance = models.Attendance(
         student_id=student.id,
@@ -62,41 +101,221 @@ async def record_attendance(
     )
     
     db.add(db_attendance)
-    db.commit()
-    db.refresh(db_attendance)
-    
-    # Send notification to parent and teacher
-    from src.notifications.service import send_attendance_notification
-    await send_attendance_notification(
-        db=db,
-        student=student,
-        attendance_type=attendance_data.type,
-        timestamp=attendance_data.timestamp.strftime("%H:%M")
-    )
+    
+    # Notifications for parent and teacher commit with the attendance record
+    attendance_type = attendance_data.type.value
+    timestamp = attendance_data.timestamp.strftime("%H:%M")
+    notice = add_attendance_notifications(db, student, attendance_type, timestamp)
+    await increment_unread(db, notice.recipients)
+    
+    # Keep the daily dashboard counts in step with the raw record
+    await record_attendance_rollup(db, student, attendance_type, attendance_data.timestamp)
+    
+    # The attendance insert (id via RETURNING), notifications and rollup
+    # flush and commit with the token UPDATE; no refresh round-trip needed
+    await db.commit()
+    spent_nonces.mark_spent(claims)
+    
+    # Push delivery happens in the background dispatcher
+    dispatch_attendance_notifications([notice])
     
     return db_attendance
 
 
+def _verify_offline_scan(
+    scan: schemas.AttendanceSyncItem,
+    student: Optional[StudentIdentity],
+    now: datetime
+) -> QRTokenClaims:
+    """Check one queued scan without the database; raises InvalidQRToken with the reason"""
+    if student is None:
+        raise InvalidQRToken("Student not found")
+    
+    scanned_at = as_utc(scan.timestamp)
+    if scanned_at < now - timedelta(hours=settings.attendance_sync_max_age_hours):
+        raise InvalidQRToken("Scan is too old to sync")
+    if scanned_at > now + timedelta(seconds=settings.attendance_sync_clock_skew_seconds):
+        raise InvalidQRToken("Scan time is in the future")
+    
+    # The code only had to be valid when the scanner read it
+    try:
+        claims = verify_qr_token(scan.qr_code_token, at=scanned_at)
+    except ExpiredQRToken:
+        raise InvalidQRToken("QR code had expired when scanned")
+    except InvalidQRToken:
+        raise InvalidQRToken("Invalid or expired QR code")
+    
+    if claims.student_id != student.student_id or claims.type.value != scan.type.value:
+        raise InvalidQRToken("QR code does not match this student")
+    if spent_nonces.is_spent(claims.nonce):
+        raise InvalidQRToken("QR code already used")
+    return claims
+
+
+async def _attendance_ids(db: AsyncSession, keys) -> Dict[str, int]:
+    """Attendance IDs already recorded under the given idempotency keys"""
+    keys = list(keys)
+    if not keys:
+        return {}
+    result = await db.execute(
+        select(models.Attendance.idempotency_key, models.Attendance.id)
+        .where(models.Attendance.idempotency_key.in_(keys))
+    )
+    return dict(result.all())
+
+
+@router.post("/sync", response_model=schemas.AttendanceSyncResponse)
+async def sync_attendance(
+    sync_data: schemas.AttendanceSyncRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Record a gate scanner's queued offline scans in one request
+
+    Scans are handled in order and each carries an idempotency key, so
+    re-sending a batch whose response was lost returns the original records
+    as duplicates. Tokens are checked against the time of the scan, then
+    consumed with a single UPDATE; attendance rows, notifications and
+    rollups commit in one transaction.
+    """
+    scans = sync_data.scans
+    now = datetime.now(timezone.utc)
+    students = await resolve_students(db, (scan.student_id for scan in scans))
+    recorded_ids = await _attendance_ids(db, {scan.idempotency_key for scan in scans})
+    
+    results: List[Optional[dict]] = [None] * len(scans)
+    first_index: Dict[str, int] = {}
+    repeats = []
+    candidates = {}  # token -> (index, scan, student, claims), first scan of each token wins
+    for index, scan in enumerate(scans):
+        key = scan.idempotency_key
+        if key in first_index:
+            repeats.append((index, first_index[key]))
+            continue
+        first_index[key] = index
+        
+        if key in recorded_ids:
+            results[index] = {"status": "duplicate", "attendance_id": recorded_ids[key]}
+            continue
+        try:
+            claims = _verify_offline_scan(scan, students.get(scan.student_id), now)
+            if scan.qr_code_token in candidates:
+                raise InvalidQRToken("QR code already used")
+        except InvalidQRToken as exc:
+            results[index] = {"status": "rejected", "detail": str(exc)}
+            continue
+        candidates[scan.qr_code_token] = (index, scan, students[scan.student_id], claims)
+    
+    # Consume every verified token at once; a token missing from RETURNING
+    # was already used, never issued or belongs to another student, as in the
+    # single-scan route. Binding the owner means such a token is never spent.
+    consumed = set()
+    if candidates:
+        result = await db.execute(
+            update(models.QRToken)
+            .where(
+                tuple_(models.QRToken.token, models.QRToken.student_id).in_([
+                    (token, student.id) for token, (_, _, student, _) in candidates.items()
+                ]),
+                models.QRToken.is_used.is_(False)
+            )
+            .values(is_used=True)
+            .returning(models.QRToken.token)
+            .execution_options(synchronize_session=False)
+        )
+        consumed = set(result.scalars())
+    
+    accepted = []
+    for token, (index, scan, student, claims) in candidates.items():
+        if token in consumed:
+            accepted.append((index, scan, student, claims))
+        else:
+            results[index] = {"status": "rejected", "detail": "Invalid or expired QR code"}
+    
+    # A concurrent upload of the same queue may have just committed these
+    # scans and spent their tokens; report them as duplicates instead
+    if len(accepted) < len(candidates):
+        late_ids = await _attendance_ids(
+            db,
+            (scan.idempotency_key for index, scan, _, _ in candidates.values() if results[index])
+        )
+        for key, attendance_id in late_ids.items():
+            results[first_index[key]] = {"status": "duplicate", "attendance_id": attendance_id}
+    
+    pending = []
+    staged = set()  # One individual notice per recipient and type for the whole batch
+    if accepted:
+        result = await db.execute(
+            insert(models.Attendance).returning(models.Attendance.idempotency_key, models.Attendance.id),
+            [
+                {
+                    "student_id": student.id,
+                    "type": models.AttendanceType(scan.type.value),
+                    "timestamp": scan.timestamp,
+                    "latitude": scan.location.lat,
+                    "longitude": scan.location.lng,
+                    "qr_code_token": scan.qr_code_token,
+                    "scanner_id": scan.scanner_id,
+                    "idempotency_key": scan.idempotency_key
+                }
+                for _, scan, student, _ in accepted
+            ]
+        )
+        new_ids = dict(result.all())
+        
+        for index, scan, student, _ in accepted:
+            results[index] = {"status": "recorded", "attendance_id": new_ids[scan.idempotency_key]}
+            pending.append(add_attendance_notifications(
+                db,
+                student,
+                scan.type.value,
+                scan.timestamp.strftime("%H:%M"),
+                staged
+            ))
+        await increment_unread(db, (recipient_id for notice in pending for recipient_id in notice.recipients))
+        await record_attendance_rollups(
+            db,
+            ((student, scan.type.value, scan.timestamp) for _, scan, student, _ in accepted)
+        )
+    
+    await db.commit()
+    for _, _, _, claims in accepted:
+        spent_nonces.mark_spent(claims)
+    dispatch_attendance_notifications(pending)
+    
+    for index, first in repeats:
+        repeated = results[first]
+        results[index] = (
+            {"status": "duplicate", "attendance_id": repeated["attendance_id"]}
+            if repeated.get("attendance_id") else repeated
+        )
+    
+    items = [
+        {"index": index, "idempotency_key": scan.idempotency_key, **outcome}
+        for index, (scan, outcome) in enumerate(zip(scans, results))
+    ]
+    statuses = [item["status"] for item in items]
+    return {
+        "recorded": statuses.count("recorded"),
+        "duplicates": statuses.count("duplicate"),
+        "rejected": statuses.count("rejected"),
+        "results": items
+    }
+
+
 @router.get("/", response_model=List[schemas.AttendanceResponse])
 async def get_attendance(
     student_id: Optional[str] = Query(None),
     date: Optional[date] = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Get attendance records"""
-    query = db.query(models.Attendance)
+    query = select(models.Attendance)
     
     if student_id:
-        student = db.query(models.Student).filter(
-            models.Student.student_id == student_id
-        ).first()
-        
-        if not student:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Student not found"
-            )
+        student = await get_student_or_404(db, student_id)
         
         # Check permissions
         if current_user.role.value == "parent" and student.parent_id != current_user.id:
@@ -105,16 +324,16 @@ async def get_attendance(
                 detail="Not authorized to view this student's attendance"
             )
         
-        query = query.filter(models.Attendance.student_id == student.id)
+        query = query.where(models.Attendance.student_id == student.id)
     
     if date:
         # Filter by date
         start_of_day = datetime.combine(date, datetime.min.time())
         end_of_day = datetime.combine(date, datetime.max.time())
-        query = query.filter(
+        query = query.where(
             models.Attendance.timestamp >= start_of_day,
             models.Attendance.timestamp <= end_of_day
         )
     
-    attendance_records = query.order_by(models.Attendance.timestamp.desc()).all()
-    return attendance_records
+    result = await db.execute(query.order_by(models.Attendance.timestamp.desc()))
+    return result.scalars().all()
@@ -1,15 +1,19 @@
 """Authentication utilities and dependencies"""
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config.settings import get_settings
-from config.database import get_db
+from config.database import get_async_db
 from src import models, schemas
+from src.auth.passwords import password_executor
+from src.cache import TTLCache
 
 settings = get_settings()
 
@@ -20,8 +24,38 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"/api/{settings.api_version}/auth/login")
 
 
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Detached snapshot of a user row, safe to share between requests"""
+    id: int
+    email: str
+    full_name: str
+    phone: Optional[str]
+    role: models.UserRole
+    is_active: bool
+    created_at: Optional[datetime]
+
+
+# Principals keyed by token subject, so authenticated calls skip the users query
+principal_cache = TTLCache(
+    max_entries=settings.auth_cache_max_entries,
+    ttl_seconds=settings.auth_cache_ttl_seconds
+)
+
+
+def invalidate_user(email: str):
+    """Drop a cached principal after the user row has changed"""
+    principal_cache.pop(email)
+
+
+# Stored for accounts created without a password (e.g. bulk imports); matches nothing
+UNUSABLE_PASSWORD = "!"
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
+    if hashed_password == UNUSABLE_PASSWORD:
+        return False
     return pwd_context.verify(plain_password, hashed_password)
 
 
@@ -30,6 +64,16 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password executor, keeping the event loop free"""
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password executor, keeping the event loop free"""
+    return await password_executor.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -43,20 +87,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
     """Authenticate user with email and password"""
-    user = db.query(models.User).filter(models.User.email == email).first()
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    user = result.scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> models.User:
+    db: AsyncSession = Depends(get_async_db)
+) -> AuthenticatedUser:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -73,16 +118,33 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    principal = principal_cache.get(token_data.email)
+    if principal is not None:
+        return principal
+    
+    result = await db.execute(
+        select(models.User).where(models.User.email == token_data.email)
+    )
+    user = result.scalars().first()
     if user is None:
         raise credentials_exception
     
-    return user
+    principal = AuthenticatedUser(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        phone=user.phone,
+        role=user.role,
+        is_active=user.is_active,
+        created_at=user.created_at
+    )
+    principal_cache.set(token_data.email, principal)
+    return principal
 
 
 async def get_current_active_user(
-    current_user: models.User = Depends(get_current_user)
-) -> models.User:
+    current_user: AuthenticatedUser = Depends(get_current_user)
+) -> AuthenticatedUser:
     """Get current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -91,7 +153,7 @@ async def get_current_active_user(
 
 def require_role(*allowed_roles: str):
     """Dependency to require specific user roles"""
-    async def role_checker(current_user: models.User = Depends(get_current_active_user)):
+    async def role_checker(current_user: AuthenticatedUser = Depends(get_current_active_user)):
         if current_user.role.value not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
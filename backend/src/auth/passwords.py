@@ -0,0 +1,98 @@
+"""Bounded executor for bcrypt work so logins never stall the event loop
+
+bcrypt releases the GIL while hashing, so a small thread pool gives real
+parallelism without the pickling and start-up cost of processes. The pool
+size caps how many hashes run at once; beyond `max_pending` queued calls the
+executor sheds load with a 503 rather than letting a login burst build an
+unbounded backlog.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from fastapi import HTTPException, status
+
+from config.settings import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class PasswordExecutor:
+    """Runs password hashing and verification off the event loop, with metrics"""
+    
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+    
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Run func(*args) in the pool, rejecting with 503 when the queue is full"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent logins, please retry",
+                    headers={"Retry-After": "1"}
+                )
+            self._pending += 1
+        
+        future = self._executor.submit(self._timed, time.perf_counter(), func, args)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            # A call cancelled while still queued never reaches _timed
+            if future.cancelled():
+                with self._lock:
+                    self._pending -= 1
+    
+    def _timed(self, submitted: float, func: Callable[..., T], args) -> T:
+        started = time.perf_counter()
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            queued = started - submitted
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                self.queue_seconds_total += queued
+                self.queue_seconds_max = max(self.queue_seconds_max, queued)
+                self.run_seconds_total += finished - started
+    
+    def stats(self) -> dict:
+        """Pool size, queue depth and average/maximum queue wait"""
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "running": self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_ms_avg": round(self.queue_seconds_total / completed * 1000, 2),
+                "queue_ms_max": round(self.queue_seconds_max * 1000, 2),
+                "run_ms_avg": round(self.run_seconds_total / completed * 1000, 2)
+            }
+
+
+password_executor = PasswordExecutor(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending
+)
@@ -0,0 +1,302 @@
+"""Bulk CSV import of users and students for term start
+
+Rows are validated in memory, checked for uniqueness against the database
+with one IN query per `import_batch_size` keys, and loaded in a single
+transaction: with COPY on PostgreSQL (psycopg2), otherwise with one
+executemany INSERT. Invalid rows are reported by CSV line number and
+skipped; the valid rows are still imported.
+
+Passwords are hashed in a process pool. bcrypt is deliberately slow (a few
+hashes per second per core), so for large onboarding files leave the
+password column blank and have admins or the reset flow set passwords later.
+
+    python -m src.bulk_import.importer users parents.csv [--dry-run]
+    python -m src.bulk_import.importer students students.csv [--dry-run]
+"""
+import argparse
+import csv
+import enum
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, TextIO, Tuple
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Table, insert, select
+from sqlalchemy.orm import Session
+
+from config.database import SessionLocal
+from config.settings import get_settings
+from src import models, schemas
+from src.auth.auth import UNUSABLE_PASSWORD, get_password_hash
+
+settings = get_settings()
+
+# Columns that must appear in the CSV header; the rest of the schema is optional
+USER_COLUMNS = ["email", "full_name", "role"]
+STUDENT_COLUMNS = ["student_id", "full_name", "school_code", "parent_email"]
+
+# Roles an admin may import; admin and system_admin accounts need a system admin
+IMPORTABLE_ROLES = {models.UserRole.PARENT, models.UserRole.TEACHER, models.UserRole.GATE_SCANNER}
+
+# Below this many passwords, starting worker processes costs more than it saves
+_MIN_POOL_HASHES = 8
+
+CsvRow = Tuple[int, dict]
+
+
+class ImportFileError(ValueError):
+    """Raised when a CSV file cannot be imported at all"""
+
+
+def read_csv(stream: TextIO, required_columns: Iterable[str]) -> List[CsvRow]:
+    """Parse a CSV with a header row into (line number, row) pairs, blanks as None"""
+    reader = csv.DictReader(stream)
+    missing = set(required_columns) - set(reader.fieldnames or [])
+    if missing:
+        raise ImportFileError(f"Missing CSV columns: {', '.join(sorted(missing))}")
+    
+    rows = []
+    for row in reader:
+        if len(rows) >= settings.import_max_rows:
+            raise ImportFileError(f"CSV has more than {settings.import_max_rows} rows")
+        rows.append((
+            reader.line_num,
+            {key: (value.strip() or None) if isinstance(value, str) else value for key, value in row.items()}
+        ))
+    return rows
+
+
+def _validate(rows: List[CsvRow], schema, errors: List[dict]) -> List[Tuple[int, BaseModel]]:
+    valid = []
+    for line, row in rows:
+        try:
+            valid.append((line, schema.model_validate(row)))
+        except ValidationError as exc:
+            detail = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in exc.errors()
+            )
+            errors.append({"row": line, "detail": detail})
+    return valid
+
+
+def _drop_duplicates(items, key: str, errors: List[dict]):
+    """Keep the first row for each key value; later ones are errors"""
+    seen = set()
+    unique = []
+    for line, item in items:
+        value = getattr(item, key)
+        if value in seen:
+            errors.append({"row": line, "detail": f"Duplicate {key} in file"})
+            continue
+        seen.add(value)
+        unique.append((line, item))
+    return unique
+
+
+def _existing(db: Session, column, values: Iterable[str]) -> Set[str]:
+    """Values of column already in the database, one IN query per batch"""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), settings.import_batch_size):
+        batch = values[start:start + settings.import_batch_size]
+        found.update(db.execute(select(column).where(column.in_(batch))).scalars())
+    return found
+
+
+def _lookup(db: Session, key_column, columns, values: Iterable[str]) -> Dict[str, tuple]:
+    """Rows keyed by key_column, one IN query per batch"""
+    values = list(values)
+    rows = {}
+    for start in range(0, len(values), settings.import_batch_size):
+        batch = values[start:start + settings.import_batch_size]
+        for row in db.execute(select(key_column, *columns).where(key_column.in_(batch))):
+            rows[row[0]] = row
+    return rows
+
+
+def hash_passwords(passwords: List[Optional[str]]) -> List[str]:
+    """bcrypt every password across a process pool; missing ones become unusable"""
+    to_hash = [password for password in passwords if password]
+    if len(to_hash) < _MIN_POOL_HASHES:
+        hashed = [get_password_hash(password) for password in to_hash]
+    else:
+        workers = settings.import_hash_workers or os.cpu_count() or 1
+        # spawn, not fork: the API process has live threads and pooled connections
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            hashed = list(pool.map(
+                get_password_hash,
+                to_hash,
+                chunksize=max(1, len(to_hash) // (workers * 4))
+            ))
+    
+    hashed_iter = iter(hashed)
+    return [next(hashed_iter) if password else UNUSABLE_PASSWORD for password in passwords]
+
+
+def _copy_value(value):
+    if value is None:
+        return None
+    # SQLEnum columns store member names
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def bulk_load(db: Session, table: Table, records: List[dict]):
+    """Insert records in the session's transaction, with COPY where the driver allows it"""
+    if not records:
+        return
+    connection = db.connection()
+    if connection.dialect.driver != "psycopg2":
+        db.execute(insert(table), records)
+        return
+    
+    columns = list(records[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        # Unquoted empty fields are NULL in COPY's CSV format
+        writer.writerow([_copy_value(record[column]) for column in columns])
+    buffer.seek(0)
+    
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _result(rows: List[CsvRow], created: int, dry_run: bool, errors: List[dict]) -> dict:
+    return {
+        "total_rows": len(rows),
+        "created": created,
+        "dry_run": dry_run,
+        "errors": sorted(errors, key=lambda error: error["row"])
+    }
+
+
+def import_users(
+    db: Session,
+    rows: List[CsvRow],
+    dry_run: bool = False,
+    allow_admin_roles: bool = False
+) -> dict:
+    """Create users from parsed CSV rows; returns counts and per-row errors
+
+    Only IMPORTABLE_ROLES are accepted unless allow_admin_roles is set, which
+    callers reserve for system admins.
+    """
+    errors: List[dict] = []
+    valid = _validate(rows, schemas.UserImportRow, errors)
+    valid = _drop_duplicates(valid, "email", errors)
+    
+    existing = _existing(db, models.User.email, (item.email for _, item in valid))
+    accepted = []
+    for line, item in valid:
+        role = models.UserRole(item.role.value)
+        if not allow_admin_roles and role not in IMPORTABLE_ROLES:
+            errors.append({"row": line, "detail": f"Only a system admin can import {role.value} accounts"})
+        elif item.email in existing:
+            errors.append({"row": line, "detail": "Email already registered"})
+        else:
+            accepted.append(item)
+    
+    if dry_run or not accepted:
+        return _result(rows, 0 if dry_run else len(accepted), dry_run, errors)
+    
+    hashed = hash_passwords([item.password for item in accepted])
+    records = [
+        {
+            "email": item.email,
+            "hashed_password": hashed_password,
+            "full_name": item.full_name,
+            "phone": item.phone,
+            "role": models.UserRole(item.role.value),
+            "is_active": True
+        }
+        for item, hashed_password in zip(accepted, hashed)
+    ]
+    bulk_load(db, models.User.__table__, records)
+    db.commit()
+    return _result(rows, len(records), dry_run, errors)
+
+
+def import_students(db: Session, rows: List[CsvRow], dry_run: bool = False) -> dict:
+    """Create students from parsed CSV rows, resolving schools and parents by code and email"""
+    errors: List[dict] = []
+    valid = _validate(rows, schemas.StudentImportRow, errors)
+    valid = _drop_duplicates(valid, "student_id", errors)
+    
+    existing = _existing(db, models.Student.student_id, (item.student_id for _, item in valid))
+    schools = _lookup(db, models.School.code, [models.School.id], {item.school_code for _, item in valid})
+    emails = {item.parent_email for _, item in valid} | {
+        item.teacher_email for _, item in valid if item.teacher_email
+    }
+    users = _lookup(db, models.User.email, [models.User.id, models.User.role], emails)
+    
+    records = []
+    for line, item in valid:
+        school = schools.get(item.school_code)
+        parent = users.get(item.parent_email)
+        teacher = users.get(item.teacher_email) if item.teacher_email else None
+        if item.student_id in existing:
+            detail = "Student ID already exists"
+        elif school is None:
+            detail = f"Unknown school code {item.school_code}"
+        elif parent is None or parent.role != models.UserRole.PARENT:
+            detail = f"No parent account for {item.parent_email}"
+        elif item.teacher_email and (teacher is None or teacher.role != models.UserRole.TEACHER):
+            detail = f"No teacher account for {item.teacher_email}"
+        else:
+            records.append({
+                "student_id": item.student_id,
+                "full_name": item.full_name,
+                "class_name": item.class_name,
+                "school_id": school.id,
+                "parent_id": parent.id,
+                "teacher_id": teacher.id if teacher else None,
+                "device_id": item.device_id,
+                "device_type": models.DeviceType(item.device_type.value) if item.device_type else None,
+                "is_active": True
+            })
+            continue
+        errors.append({"row": line, "detail": detail})
+    
+    if not dry_run:
+        bulk_load(db, models.Student.__table__, records)
+        db.commit()
+    return _result(rows, 0 if dry_run else len(records), dry_run, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users or students from CSV")
+    parser.add_argument("kind", choices=["users", "students"])
+    parser.add_argument("path", help="CSV file with a header row")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only, write nothing")
+    args = parser.parse_args()
+    
+    columns = USER_COLUMNS if args.kind == "users" else STUDENT_COLUMNS
+    with open(args.path, newline="", encoding="utf-8-sig") as stream:
+        rows = read_csv(stream, columns)
+    
+    db = SessionLocal()
+    try:
+        if args.kind == "users":
+            # Whoever runs the CLI already has the database credentials
+            result = import_users(db, rows, dry_run=args.dry_run, allow_admin_roles=True)
+        else:
+            result = import_students(db, rows, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Bulk import API routes"""
+import io
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from config.database import get_db
+from src import models, schemas
+from src.auth.auth import require_role
+from src.bulk_import.importer import (
+    STUDENT_COLUMNS,
+    USER_COLUMNS,
+    ImportFileError,
+    import_students,
+    import_users,
+    read_csv
+)
+
+router = APIRouter(prefix="/imports", tags=["Imports"])
+
+
+async def _read_upload(upload: UploadFile, columns):
+    """Decode and parse an uploaded CSV, mapping file problems to 400s"""
+    try:
+        text = (await upload.read()).decode("utf-8-sig")
+        return read_csv(io.StringIO(text, newline=""), columns)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV must be UTF-8 encoded"
+        )
+    except ImportFileError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+
+@router.post("/users", response_model=schemas.ImportResponse)
+async def import_users_csv(
+    file: UploadFile = File(..., description="CSV with email, full_name, role and optional password, phone"),
+    dry_run: bool = Query(False, description="Validate only, write nothing"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_role("admin", "system_admin"))
+):
+    """
+    Create many users from a CSV upload
+
+    Invalid rows are reported by line number and skipped; valid rows are
+    created in one transaction. Rows without a password get an account that
+    cannot log in until an admin sets one. Admins may import parents,
+    teachers and gate scanners; admin accounts need a system admin.
+    """
+    rows = await _read_upload(file, USER_COLUMNS)
+    allow_admin_roles = current_user.role == models.UserRole.SYSTEM_ADMIN
+    # Hashing and COPY block, so keep them off the event loop
+    return await run_in_threadpool(import_users, db, rows, dry_run, allow_admin_roles)
+
+
+@router.post("/students", response_model=schemas.ImportResponse)
+async def import_students_csv(
+    file: UploadFile = File(..., description="CSV with student_id, full_name, school_code, parent_email, ..."),
+    dry_run: bool = Query(False, description="Validate only, write nothing"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_role("admin", "system_admin"))
+):
+    """
+    Create many students from a CSV upload
+
+    Schools are matched by code and parents/teachers by email, so parents
+    should be imported first. Invalid rows are reported and skipped.
+    """
+    rows = await _read_upload(file, STUDENT_COLUMNS)
+    return await run_in_threadpool(import_students, db, rows, dry_run)
@@ -0,0 +1,52 @@
+"""Turn geofence transitions into parent and teacher notifications"""
+from dataclasses import dataclass
+from typing import Iterable, List
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import get_settings
+from src.geofencing.engine import GeofenceEvent
+from src.notifications.counters import increment_unread
+from src.notifications.service import (
+    add_geofence_notifications,
+    dispatch_notification,
+    geofence_message
+)
+from src.timestamps import as_utc
+
+settings = get_settings()
+_school_tz = ZoneInfo(settings.school_timezone)
+
+
+@dataclass(frozen=True)
+class PendingGeofenceAlert:
+    """A staged alert waiting for its transaction to commit"""
+    recipients: List[int]
+    title: str
+    message: str
+
+
+async def stage_geofence_alerts(db: AsyncSession, events: Iterable[GeofenceEvent]) -> List[PendingGeofenceAlert]:
+    """Add notification rows (and unread counts) for the transitions to the caller's session"""
+    pending = []
+    for event in events:
+        if event.event == "enter" and not settings.geofence_alert_on_enter:
+            continue
+        # Fixes are stored in UTC; parents read the school's wall-clock time
+        timestamp = as_utc(event.timestamp).astimezone(_school_tz).strftime("%H:%M")
+        recipients = add_geofence_notifications(db, event.student, event.event, event.school_name, timestamp)
+        if recipients:
+            pending.append(PendingGeofenceAlert(
+                recipients=recipients,
+                title=f"GEOFENCE_{event.event.upper()}",
+                message=geofence_message(event.student, event.event, event.school_name, timestamp)
+            ))
+    await increment_unread(db, (recipient_id for alert in pending for recipient_id in alert.recipients))
+    return pending
+
+
+def dispatch_geofence_alerts(pending: Iterable[PendingGeofenceAlert]):
+    """Queue delivery of staged alerts; call only after the commit"""
+    for alert in pending:
+        dispatch_notification(alert.recipients, title=alert.title, message=alert.message)
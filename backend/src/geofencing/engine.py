@@ -0,0 +1,278 @@
+"""School geofences and enter/exit detection for incoming GPS fixes
+
+Each school with coordinates gets a geofence: a polygon when one is
+configured, otherwise a circle of `geofence_radius_m` (or the default
+radius) around the school. Fences are held in memory by school id: a
+student is only ever checked against their own school's fence, so a fix
+costs one dict lookup and a bounding-box test before any geometry.
+
+A student's last inside/outside state lives in student_geofence_state. A
+transition is only reported when a newer fix flips that state; the first
+fix ever seen for a student just records where they are.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import upsert_insert
+from config.settings import get_settings
+from src import models
+from src.students.resolver import StudentIdentity
+from src.timestamps import as_utc
+
+settings = get_settings()
+
+METRES_PER_DEGREE = 111320.0
+
+
+@dataclass(frozen=True)
+class Geofence:
+    """Boundary of one school with its precomputed bounding box"""
+    school_id: int
+    school_name: str
+    latitude: float
+    longitude: float
+    radius_m: Optional[float]
+    polygon: Optional[Tuple[Tuple[float, float], ...]]
+    min_lat: float
+    min_lng: float
+    max_lat: float
+    max_lng: float
+    
+    def contains(self, lat: float, lng: float) -> bool:
+        """True if the point lies inside the fence"""
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng):
+            return False
+        if self.polygon:
+            return _point_in_polygon(lat, lng, self.polygon)
+        return _distance_m(self.latitude, self.longitude, lat, lng) <= self.radius_m
+
+
+def _distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Equirectangular distance, accurate to centimetres at geofence scale"""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * 6371008.8
+
+
+def _point_in_polygon(lat: float, lng: float, polygon: Sequence[Tuple[float, float]]) -> bool:
+    """Ray casting test; the polygon is a closed or open ring of (lat, lng)"""
+    inside = False
+    previous_lat, previous_lng = polygon[-1]
+    for vertex_lat, vertex_lng in polygon:
+        if (vertex_lat > lat) != (previous_lat > lat):
+            crossing = vertex_lng + (lat - vertex_lat) * (previous_lng - vertex_lng) / (previous_lat - vertex_lat)
+            if lng < crossing:
+                inside = not inside
+        previous_lat, previous_lng = vertex_lat, vertex_lng
+    return inside
+
+
+def build_geofence(school) -> Optional[Geofence]:
+    """Geofence for a school row, or None if the school has no location"""
+    if school.latitude is None or school.longitude is None:
+        return None
+    
+    polygon = None
+    if school.geofence_polygon:
+        polygon = tuple((float(lat), float(lng)) for lat, lng in json.loads(school.geofence_polygon))
+    
+    if polygon:
+        lats = [lat for lat, _ in polygon]
+        lngs = [lng for _, lng in polygon]
+        bbox = (min(lats), min(lngs), max(lats), max(lngs))
+        radius_m = None
+    else:
+        radius_m = school.geofence_radius_m or settings.geofence_default_radius_m
+        lat_margin = radius_m / METRES_PER_DEGREE
+        lng_margin = radius_m / (METRES_PER_DEGREE * max(math.cos(math.radians(school.latitude)), 1e-6))
+        bbox = (
+            school.latitude - lat_margin,
+            school.longitude - lng_margin,
+            school.latitude + lat_margin,
+            school.longitude + lng_margin
+        )
+    
+    return Geofence(
+        school_id=school.id,
+        school_name=school.name,
+        latitude=school.latitude,
+        longitude=school.longitude,
+        radius_m=radius_m,
+        polygon=polygon,
+        min_lat=bbox[0],
+        min_lng=bbox[1],
+        max_lat=bbox[2],
+        max_lng=bbox[3]
+    )
+
+
+class GeofenceIndex:
+    """Geofences of every located school, keyed by school id"""
+    
+    def __init__(self, fences: Iterable[Geofence]):
+        self.by_school: Dict[int, Geofence] = {fence.school_id: fence for fence in fences}
+    
+    def is_inside(self, school_id: int, lat: float, lng: float) -> bool:
+        """True if the point is inside the given school's fence"""
+        fence = self.by_school.get(school_id)
+        return fence is not None and fence.contains(lat, lng)
+
+
+class GeofenceRegistry:
+    """
+    Process-local GeofenceIndex, rebuilt from the schools table periodically
+
+    Edits through the geofence API invalidate the local copy immediately;
+    other workers pick them up within `geofence_refresh_seconds`.
+    """
+    
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._index: Optional[GeofenceIndex] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def get(self, db: AsyncSession) -> GeofenceIndex:
+        """Return the current index, reloading it if stale"""
+        if self._index is not None and time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return self._index
+        async with self._lock:
+            if self._index is None or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+                result = await db.execute(
+                    select(models.School).where(
+                        models.School.latitude.is_not(None),
+                        models.School.longitude.is_not(None)
+                    )
+                )
+                fences = [build_geofence(school) for school in result.scalars()]
+                self._index = GeofenceIndex(fences)
+                self._loaded_at = time.monotonic()
+            return self._index
+    
+    def invalidate(self):
+        """Force a reload on the next lookup"""
+        self._loaded_at = 0.0
+    
+    def stats(self) -> dict:
+        """Number of fences loaded and age of the index"""
+        return {
+            "fences": len(self._index.by_school) if self._index else 0,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._index else None
+        }
+
+
+geofence_registry = GeofenceRegistry(
+    refresh_seconds=settings.geofence_refresh_seconds
+)
+
+
+@dataclass(frozen=True)
+class GeofenceFix:
+    """One GPS fix to evaluate against the student's school fence"""
+    student: StudentIdentity
+    lat: float
+    lng: float
+    accuracy: Optional[float]
+    timestamp: datetime
+
+
+@dataclass(frozen=True)
+class GeofenceEvent:
+    """A student crossing their school's boundary"""
+    student: StudentIdentity
+    school_name: str
+    event: str  # "enter" or "exit"
+    timestamp: datetime
+
+
+async def evaluate_fixes(db: AsyncSession, fixes: Iterable[GeofenceFix]) -> List[GeofenceEvent]:
+    """
+    Update each student's inside/outside state from new fixes and return transitions
+
+    Fixes are applied per student in timestamp order, so a batch that both
+    leaves and re-enters reports both crossings. Fixes older than the stored
+    state and fixes less accurate than `geofence_max_accuracy_m` are ignored.
+    The states of every student in the batch are read with one query, and
+    only states that actually change (inside/outside or school) are upserted
+    into the caller's transaction, so a student sitting in class costs no
+    write per fix. The stored timestamp is that of the fix that set the state.
+    """
+    index = await geofence_registry.get(db)
+    
+    by_student: Dict[int, List[GeofenceFix]] = defaultdict(list)
+    for fix in fixes:
+        if fix.student.school_id not in index.by_school:
+            continue
+        if fix.accuracy is not None and fix.accuracy > settings.geofence_max_accuracy_m:
+            continue
+        by_student[fix.student.id].append(fix)
+    if not by_student:
+        return []
+    
+    state_table = models.StudentGeofenceState
+    result = await db.execute(
+        select(state_table.student_id, state_table.school_id, state_table.is_inside, state_table.timestamp)
+        .where(state_table.student_id.in_(list(by_student)))
+    )
+    states = {state.student_id: state for state in result}
+    
+    events = []
+    updates = []
+    for student_pk, student_fixes in by_student.items():
+        state = states.get(student_pk)
+        school_id = student_fixes[0].student.school_id
+        inside = state.is_inside if state else None
+        last_seen = as_utc(state.timestamp) if state else None
+        changed_at = None
+        
+        for fix in sorted(student_fixes, key=lambda fix: as_utc(fix.timestamp)):
+            timestamp = as_utc(fix.timestamp)
+            if last_seen is not None and timestamp <= last_seen:
+                continue
+            now_inside = index.is_inside(school_id, fix.lat, fix.lng)
+            if inside is not None and now_inside != inside:
+                events.append(GeofenceEvent(
+                    student=fix.student,
+                    school_name=index.by_school[school_id].school_name,
+                    event="enter" if now_inside else "exit",
+                    timestamp=timestamp
+                ))
+            if now_inside != inside:
+                changed_at = timestamp
+            inside = now_inside
+            last_seen = timestamp
+        
+        if changed_at is None and state is not None and state.school_id != school_id:
+            # Moved school: the stored state described the old fence
+            changed_at = last_seen
+        if changed_at is not None:
+            updates.append({
+                "student_id": student_pk,
+                "school_id": school_id,
+                "is_inside": inside,
+                "timestamp": changed_at
+            })
+    
+    if updates:
+        statement = upsert_insert(db, state_table).values(updates)
+        statement = statement.on_conflict_do_update(
+            index_elements=[state_table.student_id],
+            set_={
+                "school_id": statement.excluded.school_id,
+                "is_inside": statement.excluded.is_inside,
+                "timestamp": statement.excluded.timestamp
+            },
+            where=statement.excluded.timestamp > state_table.timestamp
+        )
+        await db.execute(statement)
+    
+    return events
@@ -0,0 +1,69 @@
+"""Geofence configuration API routes"""
+import json
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import get_async_db
+from src import models, schemas
+from src.auth.auth import require_role
+from src.geofencing.engine import Geofence, build_geofence, geofence_registry
+
+router = APIRouter(prefix="/geofences", tags=["Geofences"])
+
+
+def _to_response(fence: Geofence) -> dict:
+    return {
+        "school_id": fence.school_id,
+        "school_name": fence.school_name,
+        "latitude": fence.latitude,
+        "longitude": fence.longitude,
+        "radius_m": fence.radius_m,
+        "polygon": [{"lat": lat, "lng": lng} for lat, lng in fence.polygon] if fence.polygon else None
+    }
+
+
+@router.get("/", response_model=List[schemas.GeofenceResponse])
+async def list_geofences(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_role("admin", "system_admin"))
+):
+    """List the effective geofence of every school that has coordinates"""
+    index = await geofence_registry.get(db)
+    return [_to_response(fence) for fence in index.by_school.values()]
+
+
+@router.put("/{school_id}", response_model=schemas.GeofenceResponse)
+async def update_geofence(
+    school_id: int,
+    geofence_data: schemas.GeofenceUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_role("admin", "system_admin"))
+):
+    """
+    Set a school's geofence radius and/or polygon
+
+    A polygon takes precedence over the radius; send neither to fall back to
+    the default radius around the school.
+    """
+    school = await db.get(models.School, school_id)
+    if not school:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="School not found"
+        )
+    if school.latitude is None or school.longitude is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="School has no coordinates"
+        )
+    
+    school.geofence_radius_m = geofence_data.radius_m
+    school.geofence_polygon = None
+    if geofence_data.polygon:
+        school.geofence_polygon = json.dumps([[point.lat, point.lng] for point in geofence_data.polygon])
+    
+    await db.commit()
+    geofence_registry.invalidate()
+    
+    return _to_response(build_geofence(school))
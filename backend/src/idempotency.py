@@ -0,0 +1,311 @@
+"""Idempotency-Key replay for the ingest endpoints
+
+Devices on flaky mobile networks retry a POST when the response is lost, and
+without protection each retry re-runs the handler: another location row,
+another attendance attempt, another notification. A client that sends an
+`Idempotency-Key` header gets the first successful response replayed for
+every retry with the same key, without the handler or the database being
+touched again.
+
+Keys are scoped to the caller (the subject of their bearer token, so a
+refreshed token still finds its keys) and the request path, and remembered
+together with a hash of the request body:
+
+* a retry with the same body replays the stored status and body, marked
+  with an `Idempotent-Replayed: true` header;
+* a retry while the first request is still running gets 409 and Retry-After;
+* reusing a key for a different body gets 422.
+
+Only 2xx responses are kept; after an error the key is released so the
+client can retry for real. The store is an in-process LRU by default, or
+Redis (IDEMPOTENCY_BACKEND=redis) so that retries landing on another worker
+are recognised too.
+"""
+import base64
+import hashlib
+import json
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+from jose import JWTError, jwt
+from starlette import status
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import get_settings
+from src.cache import TTLCache
+
+settings = get_settings()
+
+HEADER = "idempotency-key"
+_MAX_KEY_LENGTH = 255
+
+PENDING = "pending"
+DONE = "done"
+
+
+class IdempotencyStore(ABC):
+    """Claims keys for in-flight requests and keeps completed responses"""
+    
+    def __init__(self):
+        self.stored = 0
+        self.replayed = 0
+        self.conflicts = 0
+        self.mismatches = 0
+    
+    @abstractmethod
+    async def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        """Claim key for a new request; returns the existing record if already claimed"""
+    
+    @abstractmethod
+    async def complete(self, key: str, record: dict):
+        """Replace the claim with the finished response"""
+    
+    @abstractmethod
+    async def release(self, key: str):
+        """Drop the claim so the key can be used again"""
+    
+    async def close(self):
+        """Release any connection held by the store"""
+    
+    def stats(self) -> dict:
+        """Replay counters for /metrics"""
+        return {
+            "backend": settings.idempotency_backend,
+            "stored": self.stored,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "mismatches": self.mismatches
+        }
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    Per-process LRU of recent keys
+
+    reserve() does not await between its lookup and its write, so claiming
+    a key is atomic within the worker's event loop.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float, lock_seconds: float):
+        super().__init__()
+        self.lock_seconds = lock_seconds
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    
+    async def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        existing = self._cache.get(key)
+        if existing is not None:
+            return existing
+        self._cache.set(key, {"state": PENDING, "fingerprint": fingerprint}, ttl_seconds=self.lock_seconds)
+        return None
+    
+    async def complete(self, key: str, record: dict):
+        self._cache.set(key, record)
+    
+    async def release(self, key: str):
+        self._cache.pop(key)
+    
+    def stats(self) -> dict:
+        return {**super().stats(), **self._cache.stats()}
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Keys shared by every worker, claimed atomically with SET NX"""
+    
+    def __init__(self, redis_url: str, prefix: str, ttl_seconds: int, lock_seconds: int):
+        super().__init__()
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self._client = None
+    
+    def _redis(self):
+        if self._client is None:
+            # Imported lazily so the memory store works without redis installed
+            import redis.asyncio as redis
+            
+            self._client = redis.from_url(self.redis_url)
+        return self._client
+    
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:idempotency:{key}"
+    
+    async def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        client = self._redis()
+        claim = json.dumps({"state": PENDING, "fingerprint": fingerprint})
+        if await client.set(self._key(key), claim, nx=True, ex=self.lock_seconds):
+            return None
+        existing = await client.get(self._key(key))
+        # Expired between the two calls: treat as still pending, the retry will win
+        return json.loads(existing) if existing else {"state": PENDING, "fingerprint": fingerprint}
+    
+    async def complete(self, key: str, record: dict):
+        await self._redis().set(self._key(key), json.dumps(record), ex=self.ttl_seconds)
+    
+    async def release(self, key: str):
+        await self._redis().delete(self._key(key))
+    
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_idempotency_store() -> IdempotencyStore:
+    """Build the store selected by the idempotency_backend setting"""
+    if settings.idempotency_backend == "redis":
+        return RedisIdempotencyStore(
+            settings.redis_url,
+            settings.pubsub_channel_prefix,
+            settings.idempotency_ttl_seconds,
+            settings.idempotency_lock_seconds
+        )
+    if settings.idempotency_backend == "memory":
+        return MemoryIdempotencyStore(
+            settings.idempotency_max_entries,
+            settings.idempotency_ttl_seconds,
+            settings.idempotency_lock_seconds
+        )
+    raise ValueError(f"Unknown idempotency backend: {settings.idempotency_backend}")
+
+
+idempotency_store = create_idempotency_store()
+
+
+def _caller(authorization: str) -> str:
+    """The token subject, or the raw header when it is not a valid bearer token"""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            subject = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm]).get("sub")
+        except JWTError:
+            subject = None
+        if subject:
+            return f"sub:{subject}"
+    # Unauthenticated requests fail before anything is stored, so this only needs to be stable
+    return f"header:{authorization}"
+
+
+def _scoped_key(authorization: str, path: str, client_key: str) -> str:
+    # Hashed so callers' identities never end up in Redis key names
+    scope = f"{_caller(authorization)}\n{path.rstrip('/')}\n{client_key}"
+    return hashlib.sha256(scope.encode()).hexdigest()
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware applying Idempotency-Key replay to POSTs on the given paths"""
+    
+    def __init__(self, app: ASGIApp, paths: Iterable[str], store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.paths = {path.rstrip("/") for path in paths}
+        self.store = store or idempotency_store
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"].rstrip("/") not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        headers = Headers(scope=scope)
+        client_key = headers.get(HEADER)
+        if client_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not client_key or len(client_key) > _MAX_KEY_LENGTH:
+            response = JSONResponse(
+                {"detail": f"Idempotency-Key must be 1 to {_MAX_KEY_LENGTH} characters"},
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+            await response(scope, receive, send)
+            return
+        
+        body = await _read_body(receive)
+        key = _scoped_key(headers.get("authorization", ""), scope["path"], client_key)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        
+        existing = await self.store.reserve(key, fingerprint)
+        if existing is not None:
+            await self._replay(existing, fingerprint)(scope, receive, send)
+            return
+        
+        body_sent = False
+        
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+        
+        captured = {"status": 0, "content_type": None, "body": bytearray(), "too_large": False}
+        
+        async def capture_send(message: Message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["content_type"] = Headers(raw=message["headers"]).get("content-type")
+            elif message["type"] == "http.response.body" and not captured["too_large"]:
+                captured["body"] += message.get("body", b"")
+                if len(captured["body"]) > settings.idempotency_max_response_bytes:
+                    captured["too_large"] = True
+                    captured["body"] = bytearray()
+            await send(message)
+        
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self.store.release(key)
+            raise
+        
+        if 200 <= captured["status"] < 300 and not captured["too_large"]:
+            await self.store.complete(key, {
+                "state": DONE,
+                "fingerprint": fingerprint,
+                "status": captured["status"],
+                "content_type": captured["content_type"],
+                "body": base64.b64encode(bytes(captured["body"])).decode()
+            })
+            self.store.stored += 1
+        else:
+            await self.store.release(key)
+    
+    def _replay(self, record: dict, fingerprint: str) -> Response:
+        if record["fingerprint"] != fingerprint:
+            self.store.mismatches += 1
+            return JSONResponse(
+                {"detail": "Idempotency-Key was already used for a different request"},
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record["state"] == PENDING:
+            self.store.conflicts += 1
+            return JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still being processed"},
+                status_code=status.HTTP_409_CONFLICT,
+                headers={"Retry-After": "1"}
+            )
+        
+        self.store.replayed += 1
+        headers = {"Idempotent-Replayed": "true"}
+        if record["content_type"]:
+            headers["Content-Type"] = record["content_type"]
+        return Response(
+            content=base64.b64decode(record["body"]),
+            status_code=record["status"],
+            headers=headers
+        )
@@ -0,0 +1,44 @@
+"""Maintenance of the per-student last known location"""
+from typing import Dict, Iterable
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from config.database import upsert_insert
+from src import models
+from src.timestamps import as_utc
+
+
+async def upsert_last_locations(db: AsyncSession, fixes: Iterable[dict]):
+    """
+    Record the newest fix per student in student_last_location
+
+    Each fix is a dict with student_id (internal PK), school_id, latitude,
+    longitude, accuracy and timestamp (naive timestamps are UTC). Older
+    fixes arriving late never overwrite a newer position. Runs in the
+    caller's transaction.
+    """
+    # One row per student: a single upsert cannot touch the same row twice
+    latest: Dict[int, dict] = {}
+    for fix in fixes:
+        fix = {**fix, "timestamp": as_utc(fix["timestamp"])}
+        current = latest.get(fix["student_id"])
+        if current is None or fix["timestamp"] > current["timestamp"]:
+            latest[fix["student_id"]] = fix
+    if not latest:
+        return
+    
+    statement = upsert_insert(db, models.StudentLastLocation).values(list(latest.values()))
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.StudentLastLocation.student_id],
+        set_={
+            "school_id": excluded.school_id,
+            "latitude": excluded.latitude,
+            "longitude": excluded.longitude,
+            "accuracy": excluded.accuracy,
+            "timestamp": excluded.timestamp,
+            "updated_at": func.now()
+        },
+        where=excluded.timestamp > models.StudentLastLocation.timestamp
+    )
+    await db.execute(statement)
@@ -0,0 +1,228 @@
+"""Monthly range partitions for location_tracking
+
+Migration 004 turns location_tracking into a table partitioned by month on
+`timestamp`. This module keeps the partitions ahead of the clock and drops
+(or archives) whole months past the retention window, which is a catalogue
+change instead of a bulk DELETE over millions of rows.
+
+Each worker runs `partition_maintenance_loop` in the background; an advisory
+lock makes sure only one of them does the DDL at a time. The same work can be
+run by hand or from cron:
+
+    python -m src.location_tracking.partitions ensure
+    python -m src.location_tracking.partitions prune
+"""
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from config.database import async_engine, engine
+from config.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "location_tracking"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+_PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$")
+# Arbitrary constant shared by every worker so only one runs partition DDL at a time
+_ADVISORY_LOCK_ID = 72_015
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _current_month() -> date:
+    today = datetime.now(timezone.utc).date()
+    return today.replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding the given month"""
+    return f"{PARENT_TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def _is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": PARENT_TABLE}
+    ).first() is not None
+
+
+def _lock(conn: Connection) -> bool:
+    return conn.execute(
+        text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": _ADVISORY_LOCK_ID}
+    ).scalar()
+
+
+def list_partitions(conn: Connection) -> List[date]:
+    """Months that currently have a partition, oldest first"""
+    rows = conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:table)"
+        ),
+        {"table": PARENT_TABLE}
+    )
+    months = []
+    for (name,) in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def _create_partition(conn: Connection, month: date) -> int:
+    """
+    Create one monthly partition, moving its rows out of the DEFAULT partition
+
+    Postgres refuses to create a partition while the default one holds rows
+    in its range (fixes that arrived before the month was created, or from
+    devices with a wrong clock). Those rows are moved across with the default
+    partition detached, then it is reattached. Returns the rows moved.
+    """
+    name = partition_name(month)
+    start = f"{month.isoformat()} 00:00:00+00"
+    end = f"{_add_months(month, 1).isoformat()} 00:00:00+00"
+    has_default = conn.execute(
+        text("SELECT to_regclass(:table) IS NOT NULL"), {"table": DEFAULT_PARTITION}
+    ).scalar()
+    stranded = has_default and conn.execute(
+        text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end LIMIT 1"),
+        {"start": start, "end": end}
+    ).first() is not None
+    create = text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+    if not stranded:
+        conn.execute(create)
+        return 0
+    
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+    conn.execute(create)
+    moved = conn.execute(
+        text(
+            f"WITH moved AS ("
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end RETURNING *"
+            f") INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"start": start, "end": end}
+    ).rowcount
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.warning("Moved %d location rows from %s into %s", moved, DEFAULT_PARTITION, name)
+    return moved
+
+
+def ensure_partitions(conn: Connection, months_ahead: Optional[int] = None) -> List[str]:
+    """Create the partitions for this month and the next few; returns the ones created"""
+    if not _is_partitioned(conn) or not _lock(conn):
+        return []
+    
+    months_ahead = settings.location_partition_months_ahead if months_ahead is None else months_ahead
+    existing = set(list_partitions(conn))
+    created = []
+    start = _current_month()
+    for offset in range(months_ahead + 1):
+        month = _add_months(start, offset)
+        if month in existing:
+            continue
+        _create_partition(conn, month)
+        created.append(partition_name(month))
+    
+    if created:
+        logger.info("Created location partitions: %s", ", ".join(created))
+    return created
+
+
+def prune_partitions(
+    conn: Connection,
+    retention_months: Optional[int] = None,
+    archive_schema: Optional[str] = None
+) -> List[str]:
+    """
+    Detach every partition entirely older than the retention window
+
+    Detached partitions are dropped, or moved into `archive_schema` when one
+    is configured so they can be dumped before removal. Returns their names.
+    """
+    retention_months = settings.location_retention_months if retention_months is None else retention_months
+    archive_schema = archive_schema or settings.location_archive_schema
+    if retention_months <= 0 or not _is_partitioned(conn) or not _lock(conn):
+        return []
+    
+    # Keep the current month plus retention_months full months before it
+    cutoff = _add_months(_current_month(), -retention_months)
+    expired = [partition_name(month) for month in list_partitions(conn) if month < cutoff]
+    for name in expired:
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        if archive_schema:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+            conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+    
+    if expired:
+        action = f"archived to {archive_schema}" if archive_schema else "dropped"
+        logger.info("Location partitions %s: %s", action, ", ".join(expired))
+    return expired
+
+
+def maintain_partitions(conn: Connection):
+    """Create upcoming partitions, then apply retention"""
+    ensure_partitions(conn)
+    prune_partitions(conn)
+
+
+async def partition_maintenance_loop():
+    """Run partition maintenance at startup and then periodically"""
+    interval = settings.location_partition_check_hours * 3600
+    while True:
+        try:
+            async with async_engine.begin() as conn:
+                await conn.run_sync(maintain_partitions)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Location partition maintenance failed")
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain location_tracking partitions")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    ensure = subcommands.add_parser("ensure", help="Create partitions for upcoming months")
+    ensure.add_argument("--months-ahead", type=int, help="Months to create beyond the current one")
+    prune = subcommands.add_parser("prune", help="Drop or archive partitions past retention")
+    prune.add_argument("--retention-months", type=int, help="Full months to keep before the current one")
+    prune.add_argument("--archive-schema", help="Move expired partitions here instead of dropping them")
+    args = parser.parse_args()
+    
+    with engine.begin() as conn:
+        if not _is_partitioned(conn):
+            print(f"{PARENT_TABLE} is not partitioned; apply migrations/004 first")
+            return
+        if args.command == "ensure":
+            names = ensure_partitions(conn, months_ahead=args.months_ahead)
+        else:
+            names = prune_partitions(
+                conn,
+                retention_months=args.retention_months,
+                archive_schema=args.archive_schema
+            )
+    print(f"{args.command}: {', '.join(names) or 'nothing to do'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,18 @@
 from typing import List, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from config.database import get_db
+from config.database import get_async_db
 from src import models, schemas
 from src.auth.auth import get_current_active_user
+from src.students.resolver import get_student_or_404, resolve_students
+from src.location_tracking.last_location import upsert_last_locations
+from src.geofencing.alerts import dispatch_geofence_alerts, stage_geofence_alerts
+from src.geofencing.engine import GeofenceFix, evaluate_fixes
+from src.streaming.routes import broadcast_location_update
+from src.timestamps import as_utc
 
 router = APIRouter(prefix="/location", tags=["Location"])
 
@@ -14,20 +21,12 @@ router = APIRouter(prefix="/location", tags=["Location"])
 @router.post("/")
 async def post_location(
     location_data: schemas.LocationPost,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Post GPS coordinates from student device"""
     # Find student
-    student = db.query(models.Student).filter(
-        models.Student.student_id == location_data.student_id
-    ).first()
-    
-    if not student:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Student not found"
-        )
+    student = await get_student_or_404(db, location_data.student_id)
     
     # Create location record
     db_location = models.LocationTracking(
@@ -39,28 +38,126 @@ async def post_location(
     )
     
     db.add(db_location)
-    db.commit()
+    await upsert_last_locations(db, [{
+        "student_id": student.id,
+        "school_id": student.school_id,
+        "latitude": location_data.location.lat,
+        "longitude": location_data.location.lng,
+        "accuracy": location_data.accuracy,
+        "timestamp": location_data.timestamp
+    }])
+    
+    # Boundary crossings alert parents in the same transaction
+    events = await evaluate_fixes(db, [GeofenceFix(
+        student=student,
+        lat=location_data.location.lat,
+        lng=location_data.location.lng,
+        accuracy=location_data.accuracy,
+        timestamp=location_data.timestamp
+    )])
+    alerts = await stage_geofence_alerts(db, events)
+    await db.commit()
+    dispatch_geofence_alerts(alerts)
+    
+    # Push to live subscribers on every worker
+    await broadcast_location_update(
+        student.student_id,
+        location_data.location.lat,
+        location_data.location.lng,
+        location_data.accuracy,
+        location_data.timestamp
+    )
     
     return {"status": "success", "message": "Location recorded"}
 
 
+@router.post("/batch", response_model=schemas.LocationBatchResponse)
+async def post_location_batch(
+    batch_data: schemas.LocationBatchPost,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Post many GPS fixes, possibly for many students, in one request"""
+    # Resolve every referenced student, querying only the cache misses
+    students = await resolve_students(db, (loc.student_id for loc in batch_data.locations))
+    
+    rows = []
+    last_fixes = []
+    geofence_fixes = []
+    results = []
+    for index, loc in enumerate(batch_data.locations):
+        student = students.get(loc.student_id)
+        if student is None:
+            results.append({
+                "index": index,
+                "student_id": loc.student_id,
+                "status": "rejected",
+                "detail": "Student not found"
+            })
+            continue
+        
+        rows.append({
+            "student_id": student.id,
+            "latitude": loc.location.lat,
+            "longitude": loc.location.lng,
+            "accuracy": loc.accuracy,
+            "timestamp": loc.timestamp
+        })
+        last_fixes.append({**rows[-1], "school_id": student.school_id})
+        geofence_fixes.append(GeofenceFix(
+            student=student,
+            lat=loc.location.lat,
+            lng=loc.location.lng,
+            accuracy=loc.accuracy,
+            timestamp=loc.timestamp
+        ))
+        results.append({
+            "index": index,
+            "student_id": loc.student_id,
+            "status": "accepted"
+        })
+    
+    # One bulk insert and one commit for the whole batch
+    if rows:
+        await db.execute(insert(models.LocationTracking), rows)
+        await upsert_last_locations(db, last_fixes)
+        events = await evaluate_fixes(db, geofence_fixes)
+        alerts = await stage_geofence_alerts(db, events)
+        await db.commit()
+        dispatch_geofence_alerts(alerts)
+    
+    # Live subscribers only need each student's newest fix from the batch
+    latest = {}
+    for loc in batch_data.locations:
+        if loc.student_id in students:
+            current = latest.get(loc.student_id)
+            if current is None or as_utc(loc.timestamp) > as_utc(current.timestamp):
+                latest[loc.student_id] = loc
+    for loc in latest.values():
+        await broadcast_location_update(
+            loc.student_id,
+            loc.location.lat,
+            loc.location.lng,
+            loc.accuracy,
+            loc.timestamp
+        )
+    
+    return {
+        "accepted": len(rows),
+        "rejected": len(results) - len(rows),
+        "results": results
+    }
+
+
 @router.get("/{student_id}/last", response_model=schemas.LocationResponse)
 async def get_last_location(
     student_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Get last known location of student"""
     # Find student
-    student = db.query(models.Student).filter(
-        models.Student.student_id == student_id
-    ).first()
-    
-    if not student:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Student not found"
-        )
+    student = await get_student_or_404(db, student_id)
     
     # Check permissions
     if current_user.role.value == "parent" and student.parent_id != current_user.id:
@@ -69,10 +166,8 @@ async def get_last_location(
             detail="Not authorized to view this student's location"
         )
     
-    # Get last location
-    last_location = db.query(models.LocationTracking).filter(
-        models.LocationTracking.student_id == student.id
-    ).order_by(models.LocationTracking.timestamp.desc()).first()
+    # Get last location (primary key lookup, never scans history)
+    last_location = await db.get(models.StudentLastLocation, student.id)
     
     if not last_location:
         raise HTTPException(
@@ -92,20 +187,19 @@ async def get_last_location(
 async def get_location_history(
     student_id: str,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    """Get location history for a student"""
-    # Find student
-    student = db.query(models.Student).filter(
-        models.Student.student_id == student_id
-    ).first()
+    """
+    Get location history for a student, newest first
     
-    if not student:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Student not found"
-        )
+    `start` and `end` bound the time range so only the matching monthly
+    partitions are scanned.
+    """
+    # Find student
+    student = await get_student_or_404(db, student_id)
     
     # Check permissions
     if current_user.role.value == "parent" and student.parent_id != current_user.id:
@@ -115,9 +209,15 @@ async def get_location_history(
         )
     
     # Get location history
-    locations = db.query(models.LocationTracking).filter(
-        models.LocationTracking.student_id == student.id
-    ).order_by(models.LocationTracking.timestamp.desc()).limit(limit).all()
+    query = select(models.LocationTracking).where(models.LocationTracking.student_id == student.id)
+    if start:
+        query = query.where(models.LocationTracking.timestamp >= start)
+    if end:
+        query = query.where(models.LocationTracking.timestamp < end)
+    result = await db.execute(
+        query.order_by(models.LocationTracking.timestamp.desc()).limit(limit)
+    )
+    locations = result.scalars().all()
     
     return [
         {
@@ -128,3 +228,41 @@ async def get_location_history(
         }
         for loc in locations
     ]
+
+
+@router.get("/school/{school_id}/latest", response_model=List[schemas.StudentLocationResponse])
+async def get_school_latest_locations(
+    school_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Get the last known location of every visible student in a school"""
+    query = (
+        select(models.Student.student_id, models.Student.full_name, models.StudentLastLocation)
+        .join(models.Student, models.Student.id == models.StudentLastLocation.student_id)
+        .where(models.StudentLastLocation.school_id == school_id)
+    )
+    
+    # Apply role-based filtering
+    if current_user.role.value == "parent":
+        query = query.where(models.Student.parent_id == current_user.id)
+    elif current_user.role.value == "teacher":
+        query = query.where(models.Student.teacher_id == current_user.id)
+    elif current_user.role.value not in ("admin", "system_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view school locations"
+        )
+    
+    result = await db.execute(query)
+    return [
+        {
+            "student_id": row.student_id,
+            "student_name": row.full_name,
+            "timestamp": row.StudentLastLocation.timestamp,
+            "lat": row.StudentLastLocation.latitude,
+            "lng": row.StudentLastLocation.longitude,
+            "accuracy": row.StudentLastLocation.accuracy
+        }
+        for row in result
+    ]
@@ -1,4 +1,6 @@
 """Main FastAPI application"""
+import asyncio
+import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -14,7 +16,15 @@ from src.notifications.routes import router as notifications_router
 from src.reports.routes import router as reports_router
 from src.users.routes import router as users_router
 from src.audit_logs.routes import router as audit_logs_router
-from src.streaming.routes import router as streaming_router
+from src.geofencing.routes import router as geofencing_router
+from src.bulk_import.routes import router as bulk_import_router
+from src.streaming.routes import router as streaming_router, handle_bus_event, manager as streaming_manager
+from src.streaming.pubsub import event_bus
+from src.notifications.service import coalescer as notification_coalescer, dispatcher as notification_dispatcher
+from src.location_tracking.partitions import partition_maintenance_loop
+from src.qr_verification.rendering import shutdown_render_pool
+from src.qr_verification.sweeper import qr_token_sweeper
+from src.idempotency import IdempotencyMiddleware, idempotency_store
 
 settings = get_settings()
 
@@ -25,8 +35,22 @@ async def lifespan(app: FastAPI):
     # Startup
     from config.database import engine, Base
     Base.metadata.create_all(bind=engine)
+    await notification_dispatcher.start()
+    await notification_coalescer.start()
+    await event_bus.start(handle_bus_event)
+    partition_maintenance = asyncio.create_task(partition_maintenance_loop())
+    await qr_token_sweeper.start()
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    await qr_token_sweeper.stop()
+    partition_maintenance.cancel()
+    await asyncio.gather(partition_maintenance, return_exceptions=True)
+    await event_bus.stop()
+    # Open digests go out before the dispatcher drains
+    await notification_coalescer.stop()
+    await notification_dispatcher.stop()
+    await idempotency_store.close()
+    shutdown_render_pool()
 
 
 # Initialize FastAPI app
@@ -37,7 +61,21 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Configure CORS
+api_prefix = f"/api/{settings.api_version}"
+
+# Retries of these POSTs carrying an Idempotency-Key replay the first response
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=[
+        f"{api_prefix}/location/",
+        f"{api_prefix}/location/batch",
+        f"{api_prefix}/attendance/",
+        f"{api_prefix}/attendance/sync",
+        f"{api_prefix}/notifications/"
+    ]
+)
+
+# Configure CORS (added last so it wraps replayed responses too)
 origins = settings.cors_origins.split(",")
 app.add_middleware(
     CORSMiddleware,
@@ -48,7 +86,6 @@ app.add_middleware(
 )
 
 # Include routers
-api_prefix = f"/api/{settings.api_version}"
 app.include_router(auth_router, prefix=api_prefix)
 app.include_router(students_router, prefix=api_prefix)
 app.include_router(attendance_router, prefix=api_prefix)
@@ -59,6 +96,8 @@ app.include_router(reports_router, prefix=api_prefix)
 app.include_router(users_router, prefix=api_prefix)
 app.include_router(audit_logs_router, prefix=api_prefix)
 app.include_router(streaming_router, prefix=api_prefix)
+app.include_router(geofencing_router, prefix=api_prefix)
+app.include_router(bulk_import_router, prefix=api_prefix)
 
 
 @app.get("/")
@@ -78,6 +117,34 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Per-process runtime telemetry: connection pools, caches and queues"""
+    from config.database import get_pool_metrics
+    from src.auth.auth import principal_cache
+    from src.auth.passwords import password_executor
+    from src.geofencing.engine import geofence_registry
+    from src.qr_verification.rendering import render_cache
+    from src.students.resolver import student_cache
+    
+    return {
+        "pid": os.getpid(),
+        "database_pools": get_pool_metrics(),
+        "caches": {
+            "principals": principal_cache.stats(),
+            "students": student_cache.stats(),
+            "geofences": geofence_registry.stats(),
+            "qr_renders": render_cache.stats()
+        },
+        "password_hashing": password_executor.stats(),
+        "idempotency": idempotency_store.stats(),
+        "qr_token_sweeper": qr_token_sweeper.stats(),
+        "notifications": notification_dispatcher.stats(),
+        "notification_digests": notification_coalescer.stats(),
+        "websockets": streaming_manager.stats()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,5 +1,5 @@
 """Database models for eSalama application"""
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Enum as SQLEnum, Text
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Float, Enum as SQLEnum, Text, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from config.database import Base
@@ -58,6 +58,8 @@ class School(Base):
     email = Column(String)
     latitude = Column(Float)
     longitude = Column(Float)
+    geofence_radius_m = Column(Float)  # Circle around latitude/longitude
+    geofence_polygon = Column(Text)  # JSON [[lat, lng], ...]; takes precedence over the radius
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -101,14 +103,47 @@ class Attendance(Base):
     longitude = Column(Float)
     qr_code_token = Column(String)
     scanner_id = Column(String)
+    idempotency_key = Column(String(128))  # Set by offline scanner sync
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     student = relationship("Student", back_populates="attendance_records")
+    
+    __table_args__ = (
+        Index("ix_attendance_student_id_timestamp", "student_id", text("timestamp DESC")),
+        Index("ix_attendance_timestamp", "timestamp"),
+        Index("ux_attendance_idempotency_key", "idempotency_key", unique=True),
+    )
+
+
+class AttendanceDailyRollup(Base):
+    """Per-school, per-class, per-day attendance counts maintained on every scan"""
+    __tablename__ = "attendance_daily_rollups"
+    
+    school_id = Column(Integer, ForeignKey("schools.id"), primary_key=True)
+    class_name = Column(String, primary_key=True, default="")  # "" when the student has no class
+    day = Column(Date, primary_key=True)
+    arrivals = Column(Integer, nullable=False, default=0)
+    departures = Column(Integer, nullable=False, default=0)
+    late_arrivals = Column(Integer, nullable=False, default=0)
+    students_arrived = Column(Integer, nullable=False, default=0)  # Distinct students, unlike arrivals
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_attendance_daily_rollups_school_id_day", "school_id", "day"),
+    )
+
+
+class StudentArrivalDay(Base):
+    """Days a student has arrived on, so a second arrival scan is not a second student"""
+    __tablename__ = "student_arrival_days"
+    
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
 
 
 class LocationTracking(Base):
-    """GPS location tracking records"""
+    """GPS location tracking records (partitioned by month on PostgreSQL, see migrations/004)"""
     __tablename__ = "location_tracking"
     
     id = Column(Integer, primary_key=True, index=True)
@@ -121,6 +156,33 @@ class LocationTracking(Base):
     
     # Relationships
     student = relationship("Student", back_populates="location_records")
+    
+    __table_args__ = (
+        Index("ix_location_tracking_student_id_timestamp", "student_id", text("timestamp DESC")),
+    )
+
+
+class StudentLastLocation(Base):
+    """Most recent GPS fix per student, upserted on every location post"""
+    __tablename__ = "student_last_location"
+    
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    school_id = Column(Integer, ForeignKey("schools.id"), index=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    accuracy = Column(Float)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class StudentGeofenceState(Base):
+    """Whether each student was last seen inside their school's geofence"""
+    __tablename__ = "student_geofence_state"
+    
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    school_id = Column(Integer, ForeignKey("schools.id"), nullable=False)
+    is_inside = Column(Boolean, nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False)  # Fix that set the state
 
 
 class QRToken(Base):
@@ -128,12 +190,17 @@ class QRToken(Base):
     __tablename__ = "qr_tokens"
     
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, nullable=False, index=True)
+    token = Column(String, unique=True, nullable=False, index=True)  # A single unique index, ix_qr_tokens_token
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
     type = Column(SQLEnum(AttendanceType), nullable=False)
     is_used = Column(Boolean, default=False)
     expires_at = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Lets the sweeper find expired tokens without scanning the table
+        Index("ix_qr_tokens_expires_at", "expires_at"),
+    )
 
 
 class Notification(Base):
@@ -147,6 +214,28 @@ class Notification(Base):
     message = Column(Text, nullable=False)
     is_read = Column(Boolean, default=False)
     sent_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_notifications_recipient_id_sent_at", "recipient_id", text("sent_at DESC")),
+        Index("ix_notifications_student_id_sent_at", "student_id", text("sent_at DESC")),
+        # Unread lists and "mark all read up to id N" only touch unread rows
+        Index(
+            "ix_notifications_recipient_id_unread",
+            "recipient_id",
+            "id",
+            postgresql_where=text("is_read = false"),
+            sqlite_where=text("is_read = 0")
+        ),
+    )
+
+
+class NotificationCounter(Base):
+    """Unread notifications per recipient, maintained on insert and mark-read"""
+    __tablename__ = "notification_counters"
+    
+    recipient_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
 class AuditLog(Base):
@@ -161,3 +250,7 @@ class AuditLog(Base):
     details = Column(Text)
     ip_address = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_audit_logs_timestamp", "timestamp"),
+    )
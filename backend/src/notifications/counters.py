@@ -0,0 +1,101 @@
+"""Per-recipient unread notification counters
+
+Every code path that inserts notifications also increments the recipient's
+row in notification_counters, and marking notifications read decrements it
+by the number of rows the UPDATE actually flipped. The app's unread badge is
+then a primary-key lookup, however long the notification history grows.
+
+Increments run in the caller's transaction, so a counter commits or rolls
+back together with its notifications. If the counters ever drift (for
+example after a manual data fix) rebuild them from the notifications table:
+
+    python -m src.notifications.counters rebuild
+"""
+import argparse
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config.database import SessionLocal, upsert_insert
+from src import models
+
+
+async def increment_unread(db: AsyncSession, recipient_ids: Iterable[int]):
+    """Add one unread notification per recipient ID (repeats count) in one upsert"""
+    counts = Counter(recipient_id for recipient_id in recipient_ids if recipient_id)
+    if not counts:
+        return
+    
+    counter = models.NotificationCounter
+    # Sorted so concurrent transactions lock counter rows in the same order
+    statement = upsert_insert(db, counter).values([
+        {"recipient_id": recipient_id, "unread": unread}
+        for recipient_id, unread in sorted(counts.items())
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[counter.recipient_id],
+        set_={"unread": counter.unread + statement.excluded.unread, "updated_at": func.now()}
+    )
+    await db.execute(statement)
+
+
+async def decrement_unread(db: AsyncSession, recipient_id: int, count: int):
+    """Subtract notifications just marked read, never going below zero"""
+    if count <= 0:
+        return
+    counter = models.NotificationCounter
+    await db.execute(
+        update(counter)
+        .where(counter.recipient_id == recipient_id)
+        .values(
+            unread=case((counter.unread > count, counter.unread - count), else_=0),
+            updated_at=func.now()
+        )
+    )
+
+
+async def unread_count(db: AsyncSession, recipient_id: int) -> int:
+    """The recipient's unread notifications; recipients never notified have none"""
+    result = await db.execute(
+        select(models.NotificationCounter.unread)
+        .where(models.NotificationCounter.recipient_id == recipient_id)
+    )
+    return result.scalar() or 0
+
+
+def rebuild_unread_counts(db: Session) -> int:
+    """Recompute every counter with one grouped scan; returns recipients with unread notifications"""
+    rows = [
+        {"recipient_id": row.recipient_id, "unread": row.unread}
+        for row in db.execute(
+            select(models.Notification.recipient_id, func.count().label("unread"))
+            .where(models.Notification.is_read.is_(False))
+            .group_by(models.Notification.recipient_id)
+        )
+    ]
+    db.execute(delete(models.NotificationCounter))
+    if rows:
+        db.execute(insert(models.NotificationCounter), rows)
+    db.commit()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain unread notification counters")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("rebuild", help="Recompute counters from the notifications table")
+    parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        written = rebuild_unread_counts(db)
+        print(f"Rebuilt unread counters for {written} recipients")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
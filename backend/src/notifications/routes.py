@@ -1,11 +1,15 @@
 """Notification API routes"""
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from config.database import get_db
+from config.database import get_async_db
 from src import models, schemas
 from src.auth.auth import get_current_active_user, require_role
+from src.students.resolver import get_student_or_404, resolve_student
+from src.notifications.counters import decrement_unread, increment_unread, unread_count
+from src.notifications.service import dispatch_notification
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
@@ -13,20 +17,12 @@ router = APIRouter(prefix="/notifications", tags=["Notifications"])
 @router.post("/")
 async def send_notification(
     notification_data: schemas.NotificationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(require_role("admin", "system_admin", "gate_scanner"))
 ):
     """Send notification to user"""
     # Find student
-    student = db.query(models.Student).filter(
-        models.Student.student_id == notification_data.student_id
-    ).first()
-    
-    if not student:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Student not found"
-        )
+    student = await get_student_or_404(db, notification_data.student_id)
     
     # Determine recipients based on role
     recipients = []
@@ -46,30 +42,26 @@ async def send_notification(
             message=notification_data.message
         )
         db.add(db_notification)
-        db.flush()  # Get the ID without committing
+        await db.flush()  # Get the ID without committing
         notification_ids.append(db_notification.id)
     
-    db.commit()
+    await increment_unread(db, recipients)
+    await db.commit()
     
-    # Send actual notifications
-    from src.notifications.service import send_push_notification, send_sms_notification
+    # Queue delivery; the dispatcher sends in the background
+    phone_numbers = {}
+    if recipients:
+        result = await db.execute(
+            select(models.User.id, models.User.phone).where(models.User.id.in_(recipients))
+        )
+        phone_numbers = {row.id: row.phone for row in result}
     
-    for recipient_id in recipients:
-        recipient = db.query(models.User).filter(models.User.id == recipient_id).first()
-        if recipient:
-            # Send push notification (placeholder)
-            await send_push_notification(
-                user_id=recipient_id,
-                title=notification_data.type.upper(),
-                message=notification_data.message
-            )
-            
-            # Send SMS if phone number is available (placeholder)
-            if recipient.phone:
-                await send_sms_notification(
-                    phone_number=recipient.phone,
-                    message=notification_data.message
-                )
+    dispatch_notification(
+        [recipient_id for recipient_id in recipients if recipient_id in phone_numbers],
+        title=notification_data.type.upper(),
+        message=notification_data.message,
+        phone_numbers=phone_numbers
+    )
     
     return {
         "status": "success",
@@ -82,47 +74,93 @@ async def send_notification(
 async def get_notifications(
     student_id: str = None,
     unread_only: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Get notifications for current user"""
-    query = db.query(models.Notification).filter(
+    query = select(models.Notification).where(
         models.Notification.recipient_id == current_user.id
     )
     
     if student_id:
-        student = db.query(models.Student).filter(
-            models.Student.student_id == student_id
-        ).first()
+        student = await resolve_student(db, student_id)
         if student:
-            query = query.filter(models.Notification.student_id == student.id)
+            query = query.where(models.Notification.student_id == student.id)
     
     if unread_only:
-        query = query.filter(models.Notification.is_read.is_(False))
+        query = query.where(models.Notification.is_read.is_(False))
     
-    notifications = query.order_by(models.Notification.sent_at.desc()).all()
-    return notifications
+    result = await db.execute(query.order_by(models.Notification.sent_at.desc()))
+    return result.scalars().all()
+
+
+@router.get("/unread-count", response_model=schemas.UnreadCountResponse)
+async def get_unread_count(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Unread notifications for the current user, from the maintained counter"""
+    return {"unread": await unread_count(db, current_user.id)}
+
+
+@router.put("/read-all", response_model=schemas.MarkAllReadResponse)
+async def mark_all_as_read(
+    up_to_id: int = Query(..., ge=1, description="Newest notification ID the app has shown"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Mark every notification up to and including up_to_id as read with one UPDATE"""
+    result = await db.execute(
+        update(models.Notification)
+        .where(
+            models.Notification.recipient_id == current_user.id,
+            models.Notification.id <= up_to_id,
+            models.Notification.is_read.is_(False)
+        )
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    marked = result.rowcount
+    await decrement_unread(db, current_user.id, marked)
+    await db.commit()
+    
+    return {"marked": marked, "unread": await unread_count(db, current_user.id)}
 
 
 @router.put("/{notification_id}/read")
 async def mark_as_read(
     notification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Mark notification as read"""
-    notification = db.query(models.Notification).filter(
-        models.Notification.id == notification_id,
-        models.Notification.recipient_id == current_user.id
-    ).first()
-    
-    if not notification:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Notification not found"
+    # Only a row that was still unread decrements the counter, so
+    # repeated or concurrent calls cannot count it twice
+    result = await db.execute(
+        update(models.Notification)
+        .where(
+            models.Notification.id == notification_id,
+            models.Notification.recipient_id == current_user.id,
+            models.Notification.is_read.is_(False)
         )
+        .values(is_read=True)
+        .returning(models.Notification.id)
+    )
+    if result.first() is not None:
+        await decrement_unread(db, current_user.id, 1)
+    else:
+        exists = await db.scalar(
+            select(models.Notification.id).where(
+                models.Notification.id == notification_id,
+                models.Notification.recipient_id == current_user.id
+            )
+        )
+        if exists is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Notification not found"
+            )
     
-    notification.is_read = True
-    db.commit()
+    await db.commit()
     
     return {"status": "success", "message": "Notification marked as read"}
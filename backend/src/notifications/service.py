@@ -1,56 +1,163 @@
 """Notification service for sending notifications to users"""
-from typing import Optional
-from sqlalchemy.orm import Session
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import AsyncSessionLocal
+from config.settings import get_settings
 from src import models
+from src.notifications.counters import increment_unread
+from src.students.resolver import StudentIdentity
+from src.streaming.routes import send_notification_update
 
+settings = get_settings()
+logger = logging.getLogger(__name__)
 
-async def send_attendance_notification(
-    db: Session,
-    student: models.Student,
-    attendance_type: str,
+# Student names spelled out in a digest before "and N more"
+_DIGEST_NAMES = 5
+
+
+@dataclass
+class PendingAttendanceNotice:
+    """Attendance notifications staged with a scan, waiting for its commit"""
+    student: StudentIdentity
+    attendance_type: str
     timestamp: str
-):
+    recipients: List[int]  # Rows staged now, delivered individually
+    deferred: List[int]  # Folded into a digest by the coalescer
+
+
+def add_attendance_notifications(
+    db: AsyncSession,
+    student: StudentIdentity,
+    attendance_type: str,
+    timestamp: str,
+    staged: Optional[Set[Tuple[int, str]]] = None
+) -> PendingAttendanceNotice:
     """
-    Send attendance notification to parent and teacher
-    
-    This is a simple implementation that creates notification records.
-    In production, this would also:
-    - Send push notifications via Firebase/OneSignal
-    - Send SMS via Twilio
-    - Send email via AWS SES or SendGrid
+    Stage attendance notifications for the student's parent and teacher
+
+    The rows are added to the caller's session so they commit in the same
+    transaction as the attendance record. Recipients already inside a digest
+    window get no row now; their notice joins the digest instead. Callers
+    staging several scans in one transaction pass the same `staged` set, so
+    only a recipient's first notice of each type gets a row. Once the caller
+    has committed it should pass the result to
+    dispatch_attendance_notifications, which opens the digest windows; a scan
+    that is rolled back opens none.
     """
     # Prepare message
-    arrival_departure = "arrived at" if attendance_type == "arrival" else "departed from"
-    message = f"{student.full_name} has {arrival_departure} school at {timestamp}"
+    message = attendance_message(student, attendance_type, timestamp)
+    staged = set() if staged is None else staged
     
-    # Create notification for parent
-    if student.parent_id:
-        parent_notification = models.Notification(
-            recipient_id=student.parent_id,
+    recipients = []
+    deferred = []
+    for recipient_id in (student.parent_id, student.teacher_id):
+        if not recipient_id:
+            continue
+        key = (recipient_id, attendance_type)
+        if key in staged or coalescer.is_holding(recipient_id, attendance_type):
+            deferred.append(recipient_id)
+            continue
+        if coalescer.window_seconds > 0:
+            staged.add(key)
+        recipients.append(recipient_id)
+        db.add(models.Notification(
+            recipient_id=recipient_id,
             student_id=student.id,
             type=attendance_type,
             message=message
-        )
-        db.add(parent_notification)
+        ))
     
-    # Create notification for teacher
-    if student.teacher_id:
-        teacher_notification = models.Notification(
-            recipient_id=student.teacher_id,
-            student_id=student.id,
-            type=attendance_type,
-            message=message
-        )
-        db.add(teacher_notification)
+    return PendingAttendanceNotice(
+        student=student,
+        attendance_type=attendance_type,
+        timestamp=timestamp,
+        recipients=recipients,
+        deferred=deferred
+    )
+
+
+def dispatch_attendance_notifications(pending: Iterable[PendingAttendanceNotice]):
+    """Push the individual notices and hand deferred ones to the coalescer; call only after the commit"""
+    for notice in pending:
+        for recipient_id in notice.recipients:
+            coalescer.open_window(recipient_id, notice.attendance_type)
+        if notice.recipients:
+            dispatch_notification(
+                notice.recipients,
+                title=notice.attendance_type.upper(),
+                message=attendance_message(notice.student, notice.attendance_type, notice.timestamp)
+            )
+        for recipient_id in notice.deferred:
+            coalescer.defer(recipient_id, notice.attendance_type, notice.student, notice.timestamp)
+
+
+def attendance_message(student: StudentIdentity, attendance_type: str, timestamp: str) -> str:
+    """Human readable text for an arrival or departure"""
+    arrival_departure = "arrived at" if attendance_type == "arrival" else "departed from"
+    return f"{student.full_name} has {arrival_departure} school at {timestamp}"
+
+
+def attendance_digest_message(attendance_type: str, events: List[Tuple[StudentIdentity, str]]) -> str:
+    """Text for several arrivals or departures, e.g. "12 students arrived at school between 07:30 and 07:31" """
+    # One entry per student: a double scan is not a second student, a shared name may be
+    names = list({student.id: student.full_name for student, _ in events}.values())
+    if len(names) == 1:
+        return attendance_message(events[0][0], attendance_type, events[0][1])
     
-    db.commit()
+    times = sorted(timestamp for _, timestamp in events)
+    arrival_departure = "arrived at" if attendance_type == "arrival" else "departed from"
+    when = f"at {times[0]}" if times[0] == times[-1] else f"between {times[0]} and {times[-1]}"
+    listed = ", ".join(names[:_DIGEST_NAMES])
+    if len(names) > _DIGEST_NAMES:
+        listed += f" and {len(names) - _DIGEST_NAMES} more"
+    return f"{len(names)} students {arrival_departure} school {when}: {listed}"
+
+
+def add_geofence_notifications(
+    db: AsyncSession,
+    student: StudentIdentity,
+    event: str,
+    school_name: str,
+    timestamp: str
+) -> List[int]:
+    """
+    Stage geofence enter/exit notifications for the student's parent and teacher
+
+    Same contract as add_attendance_notifications: the rows commit with the
+    caller's transaction and the returned recipients go to
+    dispatch_notification afterwards.
+    """
+    message = geofence_message(student, event, school_name, timestamp)
     
-    # TODO: In production, integrate with:
-    # - Push notification service (Firebase Cloud Messaging, OneSignal)
-    # - SMS service (Twilio)
-    # - Email service (AWS SES, SendGrid)
+    recipients = [
+        recipient_id
+        for recipient_id in (student.parent_id, student.teacher_id)
+        if recipient_id
+    ]
+    for recipient_id in recipients:
+        db.add(models.Notification(
+            recipient_id=recipient_id,
+            student_id=student.id,
+            type=f"geofence_{event}",
+            message=message
+        ))
     
-    return True
+    return recipients
+
+
+def geofence_message(student: StudentIdentity, event: str, school_name: str, timestamp: str) -> str:
+    """Human readable text for a geofence crossing"""
+    crossing = "entered" if event == "enter" else "left"
+    return f"{student.full_name} has {crossing} the {school_name} boundary at {timestamp}"
 
 
 async def send_push_notification(
@@ -123,3 +230,420 @@ async def send_email_notification(
     #     }
     # )
     pass
+
+
+class SimulatedChannel:
+    """
+    Stand-in delivery channel for local load tests
+
+    Sleeps for the configured latency and fails a fraction of calls, so the
+    dispatcher's concurrency limits and retries can be exercised without
+    talking to a real provider.
+    """
+    
+    def __init__(self, name: str, latency_seconds: float, failure_rate: float = 0.0):
+        self.name = name
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self.delivered = 0
+    
+    async def __call__(self, **kwargs):
+        await asyncio.sleep(self.latency_seconds)
+        if random.random() < self.failure_rate:
+            raise ConnectionError(f"Simulated {self.name} provider failure")
+        self.delivered += 1
+
+
+@dataclass
+class NotificationJob:
+    """One delivery attempt queued for a channel"""
+    channel: str
+    payload: dict
+    attempts: int = 0
+    enqueued_at: float = 0.0
+    last_error: Optional[str] = None
+
+
+@dataclass
+class _Channel:
+    sender: Callable[..., Awaitable]
+    concurrency: int
+    queue: Optional[asyncio.Queue] = None
+    tasks: List[asyncio.Task] = field(default_factory=list)
+    in_flight: int = 0
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+
+
+class NotificationDispatcher:
+    """
+    Background delivery of push, SMS and email notifications
+
+    Every channel has its own bounded asyncio queue drained by its own
+    workers, as many as the channel's concurrency limit, so a slow provider
+    only backs up its own channel: pushes keep flowing while SMS is stalled.
+    Failed sends are retried with exponential backoff and jitter, and jobs
+    that exhaust their attempts (or arrive while their queue is full) go to
+    a bounded dead-letter store for inspection.
+    """
+    
+    def __init__(
+        self,
+        queue_size: int,
+        max_attempts: int,
+        retry_base_seconds: float,
+        dead_letter_size: int = 1000
+    ):
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.dead_letters: Deque[dict] = deque(maxlen=dead_letter_size)
+        self._channels: Dict[str, _Channel] = {}
+        self._started = False
+        self._retry_tasks = set()
+    
+    def register_channel(self, name: str, sender: Callable[..., Awaitable], concurrency: int):
+        """Install or replace the sender used for a channel"""
+        channel = self._channels.get(name)
+        if channel is None:
+            self._channels[name] = channel = _Channel(sender=sender, concurrency=concurrency)
+        else:
+            # Queued jobs stay queued and go to the new sender
+            channel.sender = sender
+            channel.concurrency = concurrency
+        if self._started:
+            self._start_workers(channel)
+    
+    def _ensure_queue(self, channel: _Channel) -> asyncio.Queue:
+        if channel.queue is None:
+            channel.queue = asyncio.Queue(maxsize=self.queue_size)
+        return channel.queue
+    
+    def _start_workers(self, channel: _Channel):
+        queue = self._ensure_queue(channel)
+        for _ in range(channel.concurrency - len(channel.tasks)):
+            channel.tasks.append(asyncio.create_task(self._worker(channel, queue)))
+    
+    async def start(self):
+        """Start every channel's workers on the running event loop"""
+        self._started = True
+        for channel in self._channels.values():
+            self._start_workers(channel)
+    
+    async def stop(self, timeout: float = 5.0):
+        """Give queued jobs a chance to drain, then cancel the workers"""
+        queues = [channel.queue for channel in self._channels.values() if channel.queue is not None and channel.tasks]
+        if queues:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in queues)), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Notification queues not drained, %d jobs left",
+                    sum(queue.qsize() for queue in queues)
+                )
+        
+        tasks = [task for channel in self._channels.values() for task in channel.tasks]
+        for task in [*tasks, *self._retry_tasks]:
+            task.cancel()
+        await asyncio.gather(*tasks, *self._retry_tasks, return_exceptions=True)
+        for channel in self._channels.values():
+            channel.tasks = []
+        self._retry_tasks = set()
+        self._started = False
+    
+    def enqueue(self, channel: str, **payload) -> bool:
+        """Queue a delivery without waiting for it; returns False if it was dead-lettered"""
+        if channel not in self._channels:
+            raise ValueError(f"Unknown notification channel: {channel}")
+        
+        job = NotificationJob(
+            channel=channel,
+            payload=payload,
+            enqueued_at=asyncio.get_running_loop().time()
+        )
+        return self._put(job)
+    
+    def _put(self, job: NotificationJob) -> bool:
+        try:
+            self._ensure_queue(self._channels[job.channel]).put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self._dead_letter(job, "Notification queue is full")
+            return False
+    
+    def _dead_letter(self, job: NotificationJob, error: str):
+        logger.error("Dead-lettering %s notification after %d attempts: %s", job.channel, job.attempts, error)
+        self.dead_letters.append({
+            "channel": job.channel,
+            "payload": job.payload,
+            "attempts": job.attempts,
+            "error": error,
+            "failed_at": datetime.now(timezone.utc).isoformat()
+        })
+    
+    async def _worker(self, channel: _Channel, queue: asyncio.Queue):
+        while True:
+            job = await queue.get()
+            channel.in_flight += 1
+            try:
+                await self._deliver(channel, job)
+            except Exception:
+                logger.exception("Unexpected error delivering %s notification", job.channel)
+            finally:
+                channel.in_flight -= 1
+                queue.task_done()
+    
+    async def _deliver(self, channel: _Channel, job: NotificationJob):
+        job.attempts += 1
+        try:
+            await channel.sender(**job.payload)
+            channel.sent += 1
+        except Exception as e:
+            job.last_error = repr(e)
+            if job.attempts >= self.max_attempts:
+                channel.failed += 1
+                self._dead_letter(job, job.last_error)
+                return
+            
+            channel.retried += 1
+            delay = self.retry_base_seconds * (2 ** (job.attempts - 1))
+            delay *= random.uniform(0.5, 1.5)
+            task = asyncio.create_task(self._retry_later(job, delay))
+            self._retry_tasks.add(task)
+            task.add_done_callback(self._retry_tasks.discard)
+    
+    async def _retry_later(self, job: NotificationJob, delay: float):
+        await asyncio.sleep(delay)
+        self._put(job)
+    
+    def stats(self) -> dict:
+        """Queue depth, in-flight work and per-channel counters"""
+        channels = self._channels.values()
+        return {
+            "queued": sum(channel.queue.qsize() for channel in channels if channel.queue is not None),
+            "in_flight": sum(channel.in_flight for channel in channels),
+            "pending_retries": len(self._retry_tasks),
+            "dead_letters": len(self.dead_letters),
+            "workers": sum(len(channel.tasks) for channel in channels),
+            "channels": {
+                name: {
+                    "queued": channel.queue.qsize() if channel.queue is not None else 0,
+                    "in_flight": channel.in_flight,
+                    "workers": len(channel.tasks),
+                    "sent": channel.sent,
+                    "failed": channel.failed,
+                    "retried": channel.retried
+                }
+                for name, channel in self._channels.items()
+            }
+        }
+
+
+dispatcher = NotificationDispatcher(
+    queue_size=settings.notification_queue_size,
+    max_attempts=settings.notification_max_attempts,
+    retry_base_seconds=settings.notification_retry_base_seconds
+)
+
+_channel_senders = {
+    "push": send_push_notification,
+    "sms": send_sms_notification,
+    "email": send_email_notification
+}
+_channel_concurrency = {
+    "push": settings.notification_push_concurrency,
+    "sms": settings.notification_sms_concurrency,
+    "email": settings.notification_email_concurrency
+}
+# Live delivery to connected apps, published on the event bus
+dispatcher.register_channel("websocket", send_notification_update, settings.notification_push_concurrency)
+
+for _name, _sender in _channel_senders.items():
+    if settings.notification_simulated_latency_ms:
+        # Local load testing: swap real providers for simulated ones
+        _sender = SimulatedChannel(
+            _name,
+            latency_seconds=settings.notification_simulated_latency_ms / 1000,
+            failure_rate=settings.notification_simulated_failure_rate
+        )
+    dispatcher.register_channel(_name, _sender, _channel_concurrency[_name])
+
+
+def dispatch_notification(
+    recipient_ids: Iterable[int],
+    title: str,
+    message: str,
+    phone_numbers: Optional[Dict[int, str]] = None,
+    data: Optional[dict] = None
+):
+    """
+    Queue live, push and (where a phone number is known) SMS deliveries
+
+    Call this only after the notification rows have been committed; it never
+    blocks on the providers.
+    """
+    phone_numbers = phone_numbers or {}
+    for recipient_id in recipient_ids:
+        dispatcher.enqueue(
+            "websocket",
+            user_id=recipient_id,
+            notification_type=title.lower(),
+            message=message,
+            data=data
+        )
+        dispatcher.enqueue("push", user_id=recipient_id, title=title, message=message, data=data)
+        if phone_numbers.get(recipient_id):
+            dispatcher.enqueue("sms", phone_number=phone_numbers[recipient_id], message=message)
+
+
+@dataclass
+class _DigestWindow:
+    closes_at: float
+    events: List[Tuple[StudentIdentity, str]] = field(default_factory=list)
+
+
+class NotificationCoalescer:
+    """
+    Folds bursts of attendance notifications into one digest per recipient
+
+    The first arrival (or departure) for a recipient is delivered straight
+    away as before, and once its scan commits it opens a window of
+    `window_seconds`. Further events of that type for the same recipient
+    inside the window are held back. When the window closes they become a
+    single notification row, bulk-inserted together with every other digest
+    due, and a single push. A teacher whose class arrives within the window
+    therefore gets two notifications instead of one per student, while the
+    window stays short enough that a parent's notice about a second child is
+    not held for long.
+
+    If writing the digests fails, their events are put back and the next
+    flush tries again. Held events live in process memory: stop() flushes
+    them, but a killed worker loses its open digests (the attendance records
+    are unaffected).
+    Each worker coalesces the scans it handles on its own.
+    """
+    
+    def __init__(self, window_seconds: float, flush_interval_seconds: float):
+        self.window_seconds = window_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self._windows: Dict[Tuple[int, str], _DigestWindow] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.digests_sent = 0
+        self.events_coalesced = 0
+    
+    def is_holding(self, recipient_id: int, attendance_type: str) -> bool:
+        """True if an open window will fold this event into the recipient's digest"""
+        window = self._windows.get((recipient_id, attendance_type))
+        return window is not None and window.closes_at > time.monotonic()
+    
+    def open_window(self, recipient_id: int, attendance_type: str):
+        """Start holding back events after a committed individual notice"""
+        if self.window_seconds <= 0 or self.is_holding(recipient_id, attendance_type):
+            return
+        key = (recipient_id, attendance_type)
+        window = _DigestWindow(closes_at=time.monotonic() + self.window_seconds)
+        # Events waiting for a retried flush stay in the recipient's next digest
+        previous = self._windows.get(key)
+        if previous is not None:
+            window.events = previous.events
+        self._windows[key] = window
+    
+    def defer(self, recipient_id: int, attendance_type: str, student: StudentIdentity, timestamp: str):
+        """Add a committed event to the recipient's open digest"""
+        key = (recipient_id, attendance_type)
+        window = self._windows.get(key)
+        if window is None:
+            # Flushed between claim() and the caller's commit: send with the next flush
+            window = self._windows[key] = _DigestWindow(closes_at=time.monotonic())
+        window.events.append((student, timestamp))
+    
+    async def start(self):
+        """Start flushing closed windows in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Cancel the background flush and send every open digest now"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush(everything=True)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification digest flush failed")
+    
+    async def flush(self, everything: bool = False) -> int:
+        """Write and dispatch the digests of closed windows; returns digests sent"""
+        now = time.monotonic()
+        due = [
+            (key, window)
+            for key, window in self._windows.items()
+            if everything or window.closes_at <= now
+        ]
+        # Taken out before the write so events deferred meanwhile start a new window
+        for key, _ in due:
+            del self._windows[key]
+        
+        digests = []
+        for (recipient_id, attendance_type), window in due:
+            if not window.events:
+                continue
+            students = {student.id for student, _ in window.events}
+            digests.append((attendance_type, {
+                "recipient_id": recipient_id,
+                # A digest about one student still links to that student
+                "student_id": next(iter(students)) if len(students) == 1 else None,
+                "type": attendance_type if len(students) == 1 else f"{attendance_type}_digest",
+                "message": attendance_digest_message(attendance_type, window.events)
+            }))
+        if not digests:
+            return 0
+        
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(models.Notification), [row for _, row in digests])
+                await increment_unread(db, (row["recipient_id"] for _, row in digests))
+                await db.commit()
+        except BaseException:
+            self._restore(due)
+            raise
+        
+        self.events_coalesced += sum(len(window.events) for _, window in due)
+        for attendance_type, row in digests:
+            dispatch_notification([row["recipient_id"]], title=attendance_type.upper(), message=row["message"])
+        self.digests_sent += len(digests)
+        return len(digests)
+    
+    def _restore(self, due: List[Tuple[Tuple[int, str], _DigestWindow]]):
+        """Put the events of a failed flush back, ahead of any deferred since"""
+        for key, window in due:
+            current = self._windows.get(key)
+            if current is None:
+                self._windows[key] = window
+            else:
+                current.events[:0] = window.events
+    
+    def stats(self) -> dict:
+        """Open windows, held events and digest counters"""
+        return {
+            "window_seconds": self.window_seconds,
+            "open_windows": len(self._windows),
+            "held_events": sum(len(window.events) for window in self._windows.values()),
+            "digests_sent": self.digests_sent,
+            "events_coalesced": self.events_coalesced
+        }
+
+
+coalescer = NotificationCoalescer(
+    window_seconds=settings.notification_digest_window_seconds,
+    flush_interval_seconds=settings.notification_digest_flush_seconds
+)
@@ -0,0 +1,155 @@
+"""QR code rendering in PNG, SVG or raw module-matrix form, with a render cache
+
+Building the module matrix (including mask selection) is the bulk of the
+cost; PNG adds PIL drawing and zlib on top. SVG is written straight from the
+matrix as one path, and the matrix form skips imaging entirely so the client
+can draw the code itself.
+
+Rendered codes are cached by (token, format) until the token expires, so
+re-fetching a code, or fetching one pre-rendered by the batch job, costs a
+dict lookup. A cache miss renders in a worker thread so the event loop keeps
+serving other requests; batch rendering for a whole class runs in a process
+pool.
+"""
+import asyncio
+import base64
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import List, Optional
+
+import qrcode
+
+from config.settings import get_settings
+from src.cache import TTLCache
+
+settings = get_settings()
+
+render_cache = TTLCache(
+    max_entries=settings.qr_render_cache_max_entries,
+    ttl_seconds=settings.qr_token_ttl_minutes * 60
+)
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+
+def qr_content(student_id: str, attendance_type: str, token: str) -> str:
+    """Text encoded in the QR code"""
+    return f"{student_id}|{attendance_type}|{token}"
+
+
+def _build(content: str) -> qrcode.QRCode:
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(content)
+    qr.make(fit=True)
+    return qr
+
+
+def _svg(matrix: List[List[bool]], box_size: int = 10) -> str:
+    """One <path> of horizontal runs in module units, scaled up by the viewBox"""
+    modules = len(matrix)
+    segments = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < modules:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < modules and row[x]:
+                x += 1
+            segments.append(f"M{start},{y}h{x - start}v1h-{x - start}z")
+    size = modules * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {modules} {modules}" '
+        f'width="{size}" height="{size}" shape-rendering="crispEdges">'
+        f'<rect width="100%" height="100%" fill="white"/>'
+        f'<path d="{"".join(segments)}" fill="black"/></svg>'
+    )
+
+
+def render_qr(content: str, output_format: str) -> dict:
+    """
+    Render content in one format
+
+    Returns {"qr_code_url": data URL} for png and svg, or {"matrix": rows}
+    for matrix, where each row is a string of "1" (dark) and "0" modules
+    including the quiet-zone border.
+    """
+    qr = _build(content)
+    if output_format == "matrix":
+        return {"matrix": ["".join("1" if module else "0" for module in row) for row in qr.get_matrix()]}
+    if output_format == "svg":
+        svg = _svg(qr.get_matrix())
+        return {"qr_code_url": f"data:image/svg+xml;base64,{base64.b64encode(svg.encode()).decode()}"}
+    
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return {"qr_code_url": f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode()}"}
+
+
+def render_many(contents: List[str], output_format: str) -> List[dict]:
+    """Render several codes; the unit of work sent to a pool process"""
+    return [render_qr(content, output_format) for content in contents]
+
+
+def _ttl_until(expires_at: datetime) -> float:
+    return max((expires_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+async def render_cached(token: str, content: str, output_format: str, expires_at: datetime) -> dict:
+    """Render content for token, reusing the cached image until the token expires"""
+    rendered = render_cache.get((token, output_format))
+    if rendered is None:
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(None, render_qr, content, output_format)
+        render_cache.set((token, output_format), rendered, ttl_seconds=_ttl_until(expires_at))
+    return rendered
+
+
+def _render_workers() -> int:
+    return settings.qr_render_workers or os.cpu_count() or 1
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        # spawn, not fork: the API process has live threads and pooled connections
+        _render_pool = ProcessPoolExecutor(
+            max_workers=_render_workers(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _render_pool
+
+
+async def render_batch(
+    tokens: List[str],
+    contents: List[str],
+    output_format: str,
+    expires_at: datetime
+) -> List[dict]:
+    """Render many codes across the process pool and cache each under its token"""
+    pool = _pool()
+    chunk_size = max(1, -(-len(contents) // _render_workers()))
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(pool, render_many, contents[start:start + chunk_size], output_format)
+        for start in range(0, len(contents), chunk_size)
+    ))
+    
+    rendered = [item for chunk in chunks for item in chunk]
+    ttl = _ttl_until(expires_at)
+    for token, item in zip(tokens, rendered):
+        render_cache.set((token, output_format), item, ttl_seconds=ttl)
+    return rendered
+
+
+def shutdown_render_pool():
+    """Stop the batch render processes, if they were started"""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
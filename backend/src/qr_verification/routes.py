@@ -1,42 +1,60 @@
 """QR Code generation and verification API routes"""
 from datetime import datetime, timedelta, timezone
-import secrets
-import qrcode
-from io import BytesIO
-import base64
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from config.database import get_db
+from config.database import get_async_db
+from config.settings import get_settings
 from src import models, schemas
-from src.auth.auth import get_current_active_user
+from src.auth.auth import get_current_active_user, require_role
+from src.students.resolver import get_student_or_404
+from src.qr_verification.tokens import (
+    ExpiredQRToken,
+    InvalidQRToken,
+    issue_qr_token,
+    spent_nonces,
+    verify_qr_token
+)
+from src.qr_verification.rendering import qr_content, render_batch, render_cached
 
+settings = get_settings()
 router = APIRouter(prefix="/qr", tags=["QR Codes"])
 
 
+def _issue_token(student_id: str, attendance_type: schemas.AttendanceType, expires_at: datetime) -> str:
+    """Sign a token, mapping student IDs the token format cannot carry to a 400"""
+    try:
+        return issue_qr_token(student_id, attendance_type, expires_at)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+
 @router.post("/generate", response_model=schemas.QRGenerateResponse)
 async def generate_qr_code(
     qr_data: schemas.QRGenerateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    """Generate QR code for student attendance"""
-    # Find student
-    student = db.query(models.Student).filter(
-        models.Student.student_id == qr_data.student_id
-    ).first()
+    """
+    Generate QR code for student attendance
     
-    if not student:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Student not found"
-        )
+    `format` selects a PNG or SVG data URL, or the raw module matrix for
+    clients that draw the code themselves (the cheapest option).
+    """
+    # Find student
+    student = await get_student_or_404(db, qr_data.student_id)
     
-    # Generate unique token
-    token = secrets.token_urlsafe(32)
+    # Set expiration, truncated to the second precision carried in the token
+    expires_at = (
+        datetime.now(timezone.utc) + timedelta(minutes=settings.qr_token_ttl_minutes)
+    ).replace(microsecond=0)
     
-    # Set expiration (15 minutes from now)
-    expires_at = datetime.now(timezone.utc) + timedelta(minutes=15)
+    # Generate signed token
+    token = _issue_token(student.student_id, qr_data.type, expires_at)
     
     # Create QR token record
     db_token = models.QRToken(
@@ -47,69 +65,177 @@ async def generate_qr_code(
     )
     
     db.add(db_token)
-    db.commit()
+    await db.commit()
+    
+    # Generate QR code image, cached until the token expires
+    content = qr_content(student.student_id, qr_data.type.value, token)
+    rendered = await render_cached(token, content, qr_data.format.value, expires_at)
+    
+    return {
+        **rendered,
+        "token": token,
+        "expires_at": expires_at
+    }
+
+
+@router.post("/batch", response_model=schemas.QRBatchResponse)
+async def generate_class_qr_codes(
+    batch_data: schemas.QRBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(require_role("admin", "system_admin", "teacher"))
+):
+    """
+    Pre-generate QR codes for every active student in a class
+    
+    Meant to run ahead of the morning rush: tokens are stored in one bulk
+    insert, images are rendered across a process pool, and each rendering
+    is cached so later GET /qr/{token} calls are served from memory.
+    
+    Permissions:
+    - Admin/System Admin: any class
+    - Teacher: only the students they teach
+    """
+    query = (
+        select(models.Student.id, models.Student.student_id, models.Student.full_name)
+        .where(
+            models.Student.school_id == batch_data.school_id,
+            models.Student.class_name == batch_data.class_name,
+            models.Student.is_active == True
+        )
+        .order_by(models.Student.full_name)
+    )
+    is_teacher = current_user.role == models.UserRole.TEACHER
+    if is_teacher:
+        query = query.where(models.Student.teacher_id == current_user.id)
+    result = await db.execute(query)
+    students = result.all()
+    if not students and is_teacher:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not teach any active students in this class"
+        )
+    if not students:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No active students in this class"
+        )
     
-    # Generate QR code image
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr_content = f"{qr_data.student_id}|{qr_data.type.value}|{token}"
-    qr.add_data(qr_content)
-    qr.make(fit=True)
+    ttl_minutes = batch_data.ttl_minutes or settings.qr_batch_ttl_minutes
+    expires_at = (
+        datetime.now(timezone.utc) + timedelta(minutes=ttl_minutes)
+    ).replace(microsecond=0)
     
-    img = qr.make_image(fill_color="black", back_color="white")
+    tokens = [_issue_token(student.student_id, batch_data.type, expires_at) for student in students]
+    await db.execute(insert(models.QRToken), [
+        {
+            "token": token,
+            "student_id": student.id,
+            "type": batch_data.type,
+            "expires_at": expires_at,
+            "is_used": False
+        }
+        for student, token in zip(students, tokens)
+    ])
+    await db.commit()
     
-    # Convert to base64
-    buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    img_str = base64.b64encode(buffer.getvalue()).decode()
-    qr_code_url = f"data:image/png;base64,{img_str}"
+    contents = [
+        qr_content(student.student_id, batch_data.type.value, token)
+        for student, token in zip(students, tokens)
+    ]
+    rendered = await render_batch(tokens, contents, batch_data.format.value, expires_at)
     
     return {
-        "qr_code_url": qr_code_url,
+        "count": len(students),
+        "expires_at": expires_at,
+        "codes": [
+            {
+                **image,
+                "student_id": student.student_id,
+                "student_name": student.full_name,
+                "token": token,
+                "expires_at": expires_at
+            }
+            for student, token, image in zip(students, tokens, rendered)
+        ]
+    }
+
+
+@router.get("/{token}", response_model=schemas.QRGenerateResponse)
+async def get_qr_code(
+    token: str,
+    format: schemas.QRFormat = Query(schemas.QRFormat.PNG, description="png, svg or matrix"),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Fetch the image for an issued, unexpired token (served from the render cache when warm)"""
+    try:
+        claims = verify_qr_token(token)
+    except ExpiredQRToken:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="QR code has expired"
+        )
+    except InvalidQRToken:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Invalid QR code"
+        )
+    
+    content = qr_content(claims.student_id, claims.type.value, token)
+    rendered = await render_cached(token, content, format.value, claims.expires_at)
+    
+    return {
+        **rendered,
         "token": token,
-        "expires_at": expires_at
+        "expires_at": claims.expires_at
     }
 
 
 @router.post("/validate")
 async def validate_qr_code(
     qr_data: schemas.QRValidateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Validate QR code token"""
-    # Find token
-    qr_token = db.query(models.QRToken).filter(
-        models.QRToken.token == qr_data.token
-    ).first()
-    
-    if not qr_token:
+    # Check signature and expiration without touching the database
+    try:
+        claims = verify_qr_token(qr_data.token)
+    except ExpiredQRToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="QR code has expired"
+        )
+    except InvalidQRToken:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid QR code"
         )
     
-    # Check if already used
-    if qr_token.is_used:
+    # Codes consumed through this worker are known without a query; the
+    # qr_tokens row stays the authority for codes used through other workers
+    if spent_nonces.is_spent(claims.nonce):
+        is_used = True
+    else:
+        is_used = await db.scalar(
+            select(models.QRToken.is_used).where(models.QRToken.token == qr_data.token)
+        )
+    if is_used is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="QR code already used"
+            detail="Invalid QR code"
         )
-    
-    # Check expiration
-    if qr_token.expires_at < datetime.now(timezone.utc):
+    if is_used:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="QR code has expired"
+            detail="QR code already used"
         )
     
     # Get student info
-    student = db.query(models.Student).filter(
-        models.Student.id == qr_token.student_id
-    ).first()
+    student = await get_student_or_404(db, claims.student_id)
     
     return {
         "status": "valid",
         "student_id": student.student_id,
         "student_name": student.full_name,
-        "type": qr_token.type.value
+        "type": claims.type.value
     }
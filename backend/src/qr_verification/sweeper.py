@@ -0,0 +1,152 @@
+"""Background deletion of expired and used QR tokens
+
+Every generated code adds a qr_tokens row. Once a token has expired, or has
+been used, the row only matters for QR_TOKEN_RETENTION_MINUTES: the
+signature check rejects expired tokens, and a used token's row is no longer
+needed to refuse it (the single-use check finds no unused row). The one
+exception is offline scanner sync, which consumes tokens that were valid
+when scanned but have expired since, so the retention should cover
+ATTENDANCE_SYNC_MAX_AGE_HOURS.
+
+The sweeper deletes such rows in batches of QR_SWEEP_BATCH_SIZE, each in its
+own short transaction, so it never holds long locks or builds a huge undo
+log. On PostgreSQL an advisory lock keeps concurrent workers from sweeping
+the same rows at once.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, or_, select, text
+
+from config.database import async_engine
+from config.settings import get_settings
+from src import models
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant shared by every worker so only one sweeps at a time
+_ADVISORY_LOCK_ID = 72_020
+
+
+class QRTokenSweeper:
+    """Periodic, batched cleanup of qr_tokens with sweep metrics"""
+    
+    def __init__(self, interval_seconds: float, batch_size: int, max_batches: int, retention_minutes: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.retention_minutes = retention_minutes
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.deleted_total = 0
+        self.last_deleted = 0
+        self.last_duration_ms: Optional[float] = None
+        self.last_swept_at: Optional[datetime] = None
+        self.table_rows: Optional[int] = None
+    
+    async def start(self):
+        """Start sweeping in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Cancel the background sweep"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("QR token sweep failed")
+            await asyncio.sleep(self.interval_seconds)
+    
+    def _stale_condition(self, now: datetime):
+        cutoff = now - timedelta(minutes=self.retention_minutes)
+        return or_(
+            models.QRToken.expires_at < cutoff,
+            (models.QRToken.is_used == True) & (models.QRToken.created_at < cutoff)
+        )
+    
+    async def _delete_batch(self, now: datetime) -> Optional[int]:
+        """Delete one batch; None if another worker holds the sweep lock"""
+        stale_ids = (
+            select(models.QRToken.id)
+            .where(self._stale_condition(now))
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        async with async_engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                locked = await conn.scalar(
+                    text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": _ADVISORY_LOCK_ID}
+                )
+                if not locked:
+                    return None
+            result = await conn.execute(delete(models.QRToken).where(models.QRToken.id.in_(stale_ids)))
+            return result.rowcount
+    
+    async def _count_rows(self) -> int:
+        async with async_engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                # Planner estimate: free, unlike count(*) on a large table
+                estimate = await conn.scalar(
+                    text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass('qr_tokens')")
+                )
+                if estimate is not None and estimate >= 0:
+                    return estimate
+            return await conn.scalar(select(func.count()).select_from(models.QRToken))
+    
+    async def sweep(self) -> int:
+        """Delete stale tokens, at most max_batches batches; returns rows deleted"""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        deleted = 0
+        for _ in range(self.max_batches):
+            batch = await self._delete_batch(now)
+            if batch is None:
+                break
+            deleted += batch
+            if batch < self.batch_size:
+                break
+            # Let request handlers in between batches
+            await asyncio.sleep(0)
+        
+        self.sweeps += 1
+        self.last_deleted = deleted
+        self.deleted_total += deleted
+        self.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.last_swept_at = now
+        self.table_rows = await self._count_rows()
+        if deleted:
+            logger.info("Deleted %d stale QR tokens in %.1f ms", deleted, self.last_duration_ms)
+        return deleted
+    
+    def stats(self) -> dict:
+        """Sweep counters and the last known qr_tokens size"""
+        return {
+            "table_rows": self.table_rows,
+            "sweeps": self.sweeps,
+            "deleted_total": self.deleted_total,
+            "last_deleted": self.last_deleted,
+            "last_duration_ms": self.last_duration_ms,
+            "last_swept_at": self.last_swept_at.isoformat() if self.last_swept_at else None,
+            "retention_minutes": self.retention_minutes
+        }
+
+
+qr_token_sweeper = QRTokenSweeper(
+    interval_seconds=settings.qr_sweep_interval_seconds,
+    batch_size=settings.qr_sweep_batch_size,
+    max_batches=settings.qr_sweep_max_batches,
+    retention_minutes=settings.qr_token_retention_minutes
+)
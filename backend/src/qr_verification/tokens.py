@@ -0,0 +1,166 @@
+"""Signed, self-contained QR tokens
+
+A token carries the student ID, attendance type, expiry and a random nonce,
+followed by an HMAC-SHA256 signature over those fields:
+
+    base64url("v1|<student_id>|<type>|<expires_at>|<nonce>") "." base64url(mac)
+
+Anyone holding the signing key (the API, or a gate scanner provisioned with
+it) can check a token with pure CPU work. Single use is enforced by
+remembering the nonces of consumed tokens until they expire.
+
+The signing key is never the JWT secret itself: without QR_SIGNING_KEY it is
+derived from SECRET_KEY with HKDF under a "qr-token" label, so a key handed
+to gate scanners cannot be used to forge login tokens.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Optional
+
+from config.settings import get_settings
+from src.models import AttendanceType
+
+settings = get_settings()
+
+TOKEN_VERSION = "v1"
+_MAC_BYTES = 16
+_FIELD_SEPARATOR = "|"
+_KEY_LABEL = b"qr-token"
+
+
+class InvalidQRToken(Exception):
+    """Raised when a QR token is malformed or its signature does not match"""
+
+
+class ExpiredQRToken(InvalidQRToken):
+    """Raised when a correctly signed QR token is past its expiry"""
+
+
+@dataclass(frozen=True)
+class QRTokenClaims:
+    """Fields carried inside a signed QR token"""
+    student_id: str
+    type: AttendanceType
+    expires_at: datetime
+    nonce: str
+
+
+def _hkdf_sha256(secret: bytes, label: bytes) -> bytes:
+    """One-block HKDF (RFC 5869) with an empty salt: a 32-byte key bound to label"""
+    prk = hmac.new(b"\x00" * hashlib.sha256().digest_size, secret, hashlib.sha256).digest()
+    return hmac.new(prk, label + b"\x01", hashlib.sha256).digest()
+
+
+@lru_cache()
+def _signing_key() -> bytes:
+    if settings.qr_signing_key:
+        return settings.qr_signing_key.encode()
+    return _hkdf_sha256(settings.secret_key.encode(), _KEY_LABEL)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(_signing_key(), payload, hashlib.sha256).digest()[:_MAC_BYTES]
+
+
+def issue_qr_token(student_id: str, attendance_type: AttendanceType, expires_at: datetime) -> str:
+    """Create a signed token for one arrival or departure scan"""
+    if _FIELD_SEPARATOR in student_id:
+        raise ValueError(f"Student ID {student_id!r} cannot be carried in a QR token")
+    nonce = _b64encode(secrets.token_bytes(12))
+    payload = _FIELD_SEPARATOR.join([
+        TOKEN_VERSION,
+        student_id,
+        attendance_type.value,
+        str(int(expires_at.timestamp())),
+        nonce
+    ]).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def verify_qr_token(token: str, at: Optional[datetime] = None) -> QRTokenClaims:
+    """
+    Check a token's signature and expiry and return its claims
+
+    Expiry is checked against `at` when given (the time an offline scanner
+    read the code), otherwise against the current time.
+    """
+    try:
+        encoded_payload, encoded_mac = token.split(".")
+        payload = _b64decode(encoded_payload)
+        mac = _b64decode(encoded_mac)
+    except (ValueError, TypeError):
+        raise InvalidQRToken("Malformed QR token")
+    
+    if not hmac.compare_digest(mac, _sign(payload)):
+        raise InvalidQRToken("Bad QR token signature")
+    
+    try:
+        version, student_id, attendance_type, expires_at, nonce = payload.decode().split(_FIELD_SEPARATOR)
+        claims = QRTokenClaims(
+            student_id=student_id,
+            type=AttendanceType(attendance_type),
+            expires_at=datetime.fromtimestamp(int(expires_at), tz=timezone.utc),
+            nonce=nonce
+        )
+    except ValueError:
+        raise InvalidQRToken("Malformed QR token")
+    
+    if version != TOKEN_VERSION:
+        raise InvalidQRToken("Unsupported QR token version")
+    
+    if claims.expires_at < (at or datetime.now(timezone.utc)):
+        raise ExpiredQRToken("QR token has expired")
+    
+    return claims
+
+
+class SpentNonceStore:
+    """
+    Nonces of consumed tokens, kept only until the token would have expired
+
+    Lookups are O(1) and the store never grows beyond the tokens consumed
+    within one token lifetime. It is process-local; the qr_tokens table
+    remains the cross-worker authority for single use.
+    """
+    
+    def __init__(self):
+        self._expiries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+    
+    def is_spent(self, nonce: str) -> bool:
+        """Return True if the nonce was consumed and has not yet expired"""
+        with self._lock:
+            expires_at = self._expiries.get(nonce)
+            return expires_at is not None and expires_at > time.time()
+    
+    def mark_spent(self, claims: QRTokenClaims):
+        """Record a consumed token until its expiry"""
+        now = time.time()
+        with self._lock:
+            self._expiries[claims.nonce] = claims.expires_at.timestamp()
+            if now >= self._next_purge:
+                self._expiries = {
+                    nonce: expires_at
+                    for nonce, expires_at in self._expiries.items()
+                    if expires_at > now
+                }
+                self._next_purge = now + 60
+
+
+spent_nonces = SpentNonceStore()
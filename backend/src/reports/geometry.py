@@ -0,0 +1,99 @@
+"""Vectorized helpers for shrinking GPS paths before they are returned
+
+Paths are projected onto a local equirectangular plane in metres, which is
+accurate to well under a metre over the few kilometres a school run covers,
+so tolerances can be given in metres.
+"""
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def project_to_metres(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Project lat/lng degrees to an (n, 2) array of x/y metres around the path's centre"""
+    lat0 = np.radians(lats.mean())
+    x = np.radians(lngs) * np.cos(lat0) * EARTH_RADIUS_M
+    y = np.radians(lats) * EARTH_RADIUS_M
+    return np.column_stack((x, y))
+
+
+def _segment_distances(points: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Distance from each point to the segment start-end"""
+    segment = end - start
+    length_sq = segment @ segment
+    if length_sq == 0:
+        return np.hypot(*(points - start).T)
+    t = np.clip((points - start) @ segment / length_sq, 0.0, 1.0)
+    closest = start + t[:, None] * segment
+    return np.hypot(*(points - closest).T)
+
+
+def simplify_path(lats: np.ndarray, lngs: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification; returns the indices of the points to keep
+
+    Uses an explicit stack rather than recursion so long tracks cannot hit the
+    recursion limit, and measures each span's points in one NumPy pass.
+    """
+    count = len(lats)
+    if count <= 2 or tolerance_m <= 0:
+        return np.arange(count)
+    
+    points = project_to_metres(lats, lngs)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _segment_distances(points[first + 1:last], points[first], points[last])
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance_m:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    
+    return np.flatnonzero(keep)
+
+
+def downsample_by_time(epoch_seconds: np.ndarray, bucket_seconds: float) -> np.ndarray:
+    """Keep the first point of every time bucket, plus the final point; returns indices"""
+    count = len(epoch_seconds)
+    if count <= 2 or bucket_seconds <= 0:
+        return np.arange(count)
+    
+    buckets = np.floor((epoch_seconds - epoch_seconds[0]) / bucket_seconds)
+    _, first_in_bucket = np.unique(buckets, return_index=True)
+    return np.union1d(first_in_bucket, [count - 1])
+
+
+def cap_points(count: int, max_points: int) -> np.ndarray:
+    """Evenly spaced indices, always including the endpoints, so at most max_points remain"""
+    if count <= max_points:
+        return np.arange(count)
+    if max_points < 2:
+        return np.arange(min(count, max_points))
+    return np.unique(np.linspace(0, count - 1, max_points).round().astype(int))
+
+
+def encode_polyline(lats: np.ndarray, lngs: np.ndarray, precision: int = 5) -> str:
+    """Encode coordinates in the Google encoded polyline format"""
+    factor = 10 ** precision
+    coords = np.column_stack((
+        np.round(lats * factor).astype(np.int64),
+        np.round(lngs * factor).astype(np.int64)
+    ))
+    deltas = np.diff(coords, axis=0, prepend=[[0, 0]]).ravel()
+    # Zig-zag encode so small negative deltas also take few characters
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    
+    chunks = []
+    for value in values.tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
@@ -0,0 +1,201 @@
+"""Daily attendance rollups for dashboards and summary reports
+
+Each attendance scan increments one (school, class, day) row in the same
+transaction as the scan itself, so summaries read a handful of rows per day
+no matter how much raw history is kept. A student's first arrival of the
+day also claims a (student, day) row in student_arrival_days; only that
+first arrival counts towards students_arrived, which absentees are derived
+from, so a student who scans in twice is not counted twice. If the rollups ever drift (for
+example after a manual data fix) rebuild them from raw attendance:
+
+    python -m src.reports.rollups rebuild [--since YYYY-MM-DD]
+"""
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from config.database import SessionLocal, upsert_insert
+from config.settings import get_settings
+from src import models
+from src.students.resolver import StudentIdentity
+from src.timestamps import as_utc
+
+settings = get_settings()
+
+_school_tz = ZoneInfo(settings.school_timezone)
+_late_after = time.fromisoformat(settings.late_arrival_time)
+
+RollupKey = Tuple[int, str, date]
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {"arrivals": 0, "departures": 0, "late_arrivals": 0, "students_arrived": 0}
+
+
+def rollup_counts(attendance_type: str, timestamp: datetime) -> Tuple[date, dict]:
+    """Local school day of a scan and the counters it increments"""
+    # Naive timestamps are UTC, like everywhere else in the app
+    local = as_utc(timestamp).astimezone(_school_tz)
+    
+    if attendance_type == models.AttendanceType.ARRIVAL.value:
+        counts = {"arrivals": 1, "departures": 0, "late_arrivals": int(local.time() > _late_after)}
+    else:
+        counts = {"arrivals": 0, "departures": 1, "late_arrivals": 0}
+    return local.date(), counts
+
+
+def school_today() -> date:
+    """The current day in the school timezone"""
+    return datetime.now(_school_tz).date()
+
+
+async def record_attendance_rollup(
+    db: AsyncSession,
+    student: StudentIdentity,
+    attendance_type: str,
+    timestamp: datetime
+):
+    """Increment the rollup row for one scan inside the caller's transaction"""
+    await record_attendance_rollups(db, [(student, attendance_type, timestamp)])
+
+
+async def record_attendance_rollups(
+    db: AsyncSession,
+    scans: Iterable[Tuple[StudentIdentity, str, datetime]]
+):
+    """
+    Increment the rollup rows for many scans with one multi-row upsert
+
+    Scans are summed per (school, class, day) first: an upsert may not touch
+    the same row twice, and a synced scanner queue usually hits only a few.
+    """
+    totals: Dict[RollupKey, Dict[str, int]] = defaultdict(_empty_counts)
+    arrival_days: Dict[Tuple[int, date], RollupKey] = {}
+    for student, attendance_type, timestamp in scans:
+        if student.school_id is None:
+            continue
+        day, counts = rollup_counts(attendance_type, timestamp)
+        key = (student.school_id, student.class_name or "", day)
+        row = totals[key]
+        for name, value in counts.items():
+            row[name] += value
+        if counts["arrivals"]:
+            arrival_days[(student.id, day)] = key
+    if not totals:
+        return
+    
+    if arrival_days:
+        # Rows that already existed are not returned: those students had arrived
+        marker = models.StudentArrivalDay
+        statement = upsert_insert(db, marker).values([
+            {"student_id": student_id, "day": day} for student_id, day in sorted(arrival_days)
+        ])
+        result = await db.execute(
+            statement
+            .on_conflict_do_nothing(index_elements=[marker.student_id, marker.day])
+            .returning(marker.student_id, marker.day)
+        )
+        for student_id, day in result:
+            totals[arrival_days[(student_id, day)]]["students_arrived"] += 1
+    
+    rollup = models.AttendanceDailyRollup
+    statement = upsert_insert(db, rollup).values([
+        {"school_id": school_id, "class_name": class_name, "day": day, **counts}
+        for (school_id, class_name, day), counts in totals.items()
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[rollup.school_id, rollup.class_name, rollup.day],
+        set_={
+            "arrivals": rollup.arrivals + statement.excluded.arrivals,
+            "departures": rollup.departures + statement.excluded.departures,
+            "late_arrivals": rollup.late_arrivals + statement.excluded.late_arrivals,
+            "students_arrived": rollup.students_arrived + statement.excluded.students_arrived,
+            "updated_at": func.now()
+        }
+    )
+    await db.execute(statement)
+
+
+def rebuild_rollups(db: Session, since: Optional[date] = None) -> int:
+    """
+    Recompute rollups from raw attendance, from `since` onwards (or entirely)
+
+    Raw rows are streamed with a server-side cursor and aggregated in memory
+    per (school, class, day), so memory is bounded by the number of rollup
+    rows and student arrival days, not attendance rows. student_arrival_days
+    is rebuilt for the same days. Returns the number of rollup rows written.
+    """
+    query = (
+        select(
+            models.Attendance.student_id,
+            models.Student.school_id,
+            models.Student.class_name,
+            models.Attendance.type,
+            models.Attendance.timestamp
+        )
+        .join(models.Student, models.Student.id == models.Attendance.student_id)
+        .where(models.Student.school_id.is_not(None))
+    )
+    delete_query = delete(models.AttendanceDailyRollup)
+    delete_arrivals = delete(models.StudentArrivalDay)
+    if since:
+        # Start a day early so scans near midnight in the school timezone count
+        query = query.where(models.Attendance.timestamp >= since - timedelta(days=1))
+        delete_query = delete_query.where(models.AttendanceDailyRollup.day >= since)
+        delete_arrivals = delete_arrivals.where(models.StudentArrivalDay.day >= since)
+    
+    totals: Dict[RollupKey, Dict[str, int]] = defaultdict(_empty_counts)
+    arrival_days = set()
+    result = db.execute(query, execution_options={"yield_per": settings.report_stream_batch_size})
+    for row in result:
+        day, counts = rollup_counts(row.type.value, row.timestamp)
+        if since and day < since:
+            continue
+        bucket = totals[(row.school_id, row.class_name or "", day)]
+        for field, increment in counts.items():
+            bucket[field] += increment
+        if counts["arrivals"] and (row.student_id, day) not in arrival_days:
+            arrival_days.add((row.student_id, day))
+            bucket["students_arrived"] += 1
+    
+    db.execute(delete_query)
+    db.execute(delete_arrivals)
+    rows = [
+        {"school_id": school_id, "class_name": class_name, "day": day, **counts}
+        for (school_id, class_name, day), counts in totals.items()
+    ]
+    if rows:
+        db.execute(insert(models.AttendanceDailyRollup), rows)
+    if arrival_days:
+        db.execute(
+            insert(models.StudentArrivalDay),
+            [{"student_id": student_id, "day": day} for student_id, day in arrival_days]
+        )
+    db.commit()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain daily attendance rollups")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rebuild = subcommands.add_parser("rebuild", help="Recompute rollups from raw attendance")
+    rebuild.add_argument("--since", type=date.fromisoformat, help="First day to rebuild (default: all)")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        written = rebuild_rollups(db, since=args.since)
+        print(f"Rebuilt {written} attendance rollup rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
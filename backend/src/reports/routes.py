@@ -1,16 +1,156 @@
 """Reports API endpoints"""
+import base64
+import csv
+import io
+import json
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.orm import Session
-from typing import Optional, List
-from datetime import datetime, date
+from typing import Iterator, Optional, List
+from datetime import datetime, date, timedelta
 
-from config.database import get_db
+from config.database import SessionLocal, get_db
+from config.settings import get_settings
 from src.auth.auth import get_current_user
-from src.models import User, Student, Attendance, LocationTracking, Notification, UserRole
+from src.reports import geometry
+from src.reports.rollups import school_today
+from src.models import (
+    User, Student, Attendance, AttendanceDailyRollup, LocationTracking, Notification, UserRole
+)
 
+settings = get_settings()
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 
+ATTENDANCE_EXPORT_FIELDS = [
+    "id", "student_id", "student_name", "class_name", "type", "timestamp", "lat", "lng", "scanner_id"
+]
+
+
+def _attendance_report_query(
+    current_user: User,
+    school_id: Optional[int],
+    student_id: Optional[str],
+    date: Optional[date],
+    start_date: Optional[date],
+    end_date: Optional[date]
+):
+    """Build the role-filtered attendance report query, selecting flat columns only"""
+    query = (
+        select(
+            Attendance.id,
+            Student.student_id,
+            Student.full_name.label("student_name"),
+            Student.class_name,
+            Attendance.type,
+            Attendance.timestamp,
+            Attendance.latitude.label("lat"),
+            Attendance.longitude.label("lng"),
+            Attendance.scanner_id
+        )
+        .join(Student, Student.id == Attendance.student_id)
+    )
+    
+    # Apply role-based filtering
+    if current_user.role == UserRole.PARENT:
+        # Parents can only see their own children
+        query = query.where(Student.parent_id == current_user.id)
+    elif current_user.role == UserRole.TEACHER:
+        # Teachers can see students they teach
+        query = query.where(Student.teacher_id == current_user.id)
+    elif current_user.role in [UserRole.ADMIN, UserRole.SYSTEM_ADMIN]:
+        # Admins can filter by school_id if provided
+        if school_id:
+            query = query.where(Student.school_id == school_id)
+    else:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    # Apply additional filters
+    if student_id:
+        query = query.where(Student.student_id == student_id)
+    
+    # Date filtering, as timestamp ranges so the timestamp indexes apply
+    if date:
+        start_date, end_date = date, date
+    if start_date:
+        query = query.where(Attendance.timestamp >= start_date)
+    if end_date:
+        query = query.where(Attendance.timestamp < end_date + timedelta(days=1))
+    
+    return query
+
+
+def _encode_cursor(timestamp: datetime, record_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{record_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        timestamp, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _format_attendance_row(row) -> dict:
+    return {
+        "id": row.id,
+        "student_id": row.student_id,
+        "student_name": row.student_name,
+        "class_name": row.class_name,
+        "type": row.type,
+        "timestamp": row.timestamp,
+        "location": {
+            "lat": row.lat,
+            "lng": row.lng
+        } if row.lat and row.lng else None,
+        "scanner_id": row.scanner_id
+    }
+
+
+def _stream_attendance_export(query, export_format: str) -> Iterator[str]:
+    """
+    Yield the report as NDJSON lines or CSV text in constant memory
+    
+    Runs with its own session because the request's session is closed before
+    a streaming response body is produced. Rows are fetched through a
+    server-side cursor in batches of report_stream_batch_size.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            query.order_by(Attendance.timestamp.desc(), Attendance.id.desc()),
+            execution_options={"yield_per": settings.report_stream_batch_size}
+        )
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == "csv":
+            writer.writerow(ATTENDANCE_EXPORT_FIELDS)
+        
+        for partition in result.partitions():
+            for row in partition:
+                if export_format == "csv":
+                    writer.writerow([
+                        row.id, row.student_id, row.student_name, row.class_name,
+                        row.type.value, row.timestamp.isoformat(), row.lat, row.lng, row.scanner_id
+                    ])
+                else:
+                    buffer.write(json.dumps(jsonable_encoder(_format_attendance_row(row))))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        # Header only, when there were no rows at all
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+
 @router.get("/attendance")
 async def get_attendance_report(
     school_id: Optional[int] = Query(None, description="Filter by school ID"),
@@ -18,88 +158,55 @@ async def get_attendance_report(
     date: Optional[date] = Query(None, description="Filter by specific date"),
     start_date: Optional[date] = Query(None, description="Start of date range"),
     end_date: Optional[date] = Query(None, description="End of date range"),
+    format: str = Query("json", pattern="^(json|ndjson|csv)$", description="json (paginated), ndjson or csv (streamed)"),
+    limit: int = Query(1000, ge=1, le=10000, description="Page size for the json format"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous json page"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Generate attendance report with flexible filtering
     
+    The json format is paginated with a keyset cursor; ndjson and csv stream
+    the whole result set in constant memory.
+    
     Permissions:
     - Admin/System Admin: Can view all attendance for their school
     - Teacher: Can view attendance for their assigned students
     - Parent: Can view attendance for their children only
     """
-    # Build base query
-    query = db.query(Attendance).join(Student)
-    
-    # Apply role-based filtering
-    if current_user.role == UserRole.PARENT:
-        # Parents can only see their own children
-        query = query.filter(Student.parent_id == current_user.id)
-    elif current_user.role == UserRole.TEACHER:
-        # Teachers can see students they teach
-        query = query.filter(Student.teacher_id == current_user.id)
-    elif current_user.role in [UserRole.ADMIN, UserRole.SYSTEM_ADMIN]:
-        # Admins can filter by school_id if provided
-        if school_id:
-            query = query.filter(Student.school_id == school_id)
-    else:
-        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    query = _attendance_report_query(current_user, school_id, student_id, date, start_date, end_date)
     
-    # Apply additional filters
-    if student_id:
-        query = query.filter(Student.student_id == student_id)
-    
-    # Date filtering
-    if date:
-        # Single date filter
-        query = query.filter(
-            db.func.date(Attendance.timestamp) == date
+    if format != "json":
+        media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+        return StreamingResponse(
+            _stream_attendance_export(query, format),
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename=attendance-report.{format}"}
         )
-    elif start_date and end_date:
-        # Date range filter
-        query = query.filter(
-            Attendance.timestamp >= start_date,
-            Attendance.timestamp <= end_date
+    
+    # Keyset pagination: continue strictly after the last row of the previous page
+    if cursor:
+        cursor_timestamp, cursor_id = _decode_cursor(cursor)
+        query = query.where(
+            tuple_(Attendance.timestamp, Attendance.id) < tuple_(cursor_timestamp, cursor_id)
         )
-    elif start_date:
-        query = query.filter(Attendance.timestamp >= start_date)
-    elif end_date:
-        query = query.filter(Attendance.timestamp <= end_date)
     
     # Order by timestamp
-    query = query.order_by(Attendance.timestamp.desc())
+    query = query.order_by(Attendance.timestamp.desc(), Attendance.id.desc()).limit(limit)
     
     # Execute query
-    attendance_records = query.all()
-    
-    # Get all unique student IDs and fetch students in one query to avoid N+1
-    student_ids = list(set([record.student_id for record in attendance_records]))
-    students_dict = {}
-    if student_ids:
-        students = db.query(Student).filter(Student.id.in_(student_ids)).all()
-        students_dict = {s.id: s for s in students}
+    rows = db.execute(query).all()
     
     # Format response
-    report_data = []
-    for record in attendance_records:
-        student = students_dict.get(record.student_id)
-        report_data.append({
-            "id": record.id,
-            "student_id": student.student_id if student else None,
-            "student_name": student.full_name if student else None,
-            "class_name": student.class_name if student else None,
-            "type": record.type,
-            "timestamp": record.timestamp,
-            "location": {
-                "lat": record.latitude,
-                "lng": record.longitude
-            } if record.latitude and record.longitude else None,
-            "scanner_id": record.scanner_id
-        })
+    report_data = [_format_attendance_row(row) for row in rows]
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = _encode_cursor(rows[-1].timestamp, rows[-1].id)
     
     return {
         "total_records": len(report_data),
+        "next_cursor": next_cursor,
         "filters": {
             "school_id": school_id,
             "student_id": student_id,
@@ -111,19 +218,109 @@ async def get_attendance_report(
     }
 
 
+@router.get("/attendance/summary")
+async def get_attendance_summary(
+    school_id: int = Query(..., description="School to summarise"),
+    start_date: Optional[date] = Query(None, description="First day (default: today)"),
+    end_date: Optional[date] = Query(None, description="Last day (default: start_date)"),
+    class_name: Optional[str] = Query(None, description="Filter by class"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Per-class, per-day attendance counts for admin dashboards
+    
+    Reads the daily rollup table, so the cost depends on the number of days
+    and classes requested rather than on the amount of raw history. `arrivals`
+    counts scans; absentees are active enrolled students minus the distinct
+    students who arrived that day.
+    
+    Permissions:
+    - Admin/System Admin only
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.SYSTEM_ADMIN]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    start_date = start_date or school_today()
+    end_date = end_date or start_date
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    
+    rollup_query = (
+        select(AttendanceDailyRollup)
+        .where(
+            AttendanceDailyRollup.school_id == school_id,
+            AttendanceDailyRollup.day >= start_date,
+            AttendanceDailyRollup.day <= end_date
+        )
+    )
+    enrolled_query = (
+        select(Student.class_name, func.count(Student.id).label("enrolled"))
+        .where(Student.school_id == school_id, Student.is_active == True)
+        .group_by(Student.class_name)
+    )
+    if class_name:
+        rollup_query = rollup_query.where(AttendanceDailyRollup.class_name == class_name)
+        enrolled_query = enrolled_query.where(Student.class_name == class_name)
+    
+    rollups = {
+        (rollup.day, rollup.class_name): rollup
+        for rollup in db.execute(rollup_query).scalars()
+    }
+    enrolled = {row.class_name or "": row.enrolled for row in db.execute(enrolled_query)}
+    
+    # One entry per class per day, including days with no scans at all
+    summary = []
+    day = start_date
+    while day <= end_date:
+        for class_key in sorted(set(enrolled) | {key for rollup_day, key in rollups if rollup_day == day}):
+            rollup = rollups.get((day, class_key))
+            students_arrived = rollup.students_arrived if rollup else 0
+            summary.append({
+                "date": day.isoformat(),
+                "class_name": class_key or None,
+                "enrolled": enrolled.get(class_key, 0),
+                "arrivals": rollup.arrivals if rollup else 0,
+                "students_arrived": students_arrived,
+                "departures": rollup.departures if rollup else 0,
+                "late_arrivals": rollup.late_arrivals if rollup else 0,
+                "absentees": max(enrolled.get(class_key, 0) - students_arrived, 0)
+            })
+        day += timedelta(days=1)
+    
+    return {
+        "filters": {
+            "school_id": school_id,
+            "class_name": class_name,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat()
+        },
+        "data": summary
+    }
+
+
 @router.get("/gps-paths")
 async def get_gps_paths_report(
     student_id: str = Query(..., description="Student ID to get GPS path for"),
     date: Optional[date] = Query(None, description="Filter by specific date"),
     start_date: Optional[date] = Query(None, description="Start of date range"),
     end_date: Optional[date] = Query(None, description="End of date range"),
-    limit: int = Query(1000, description="Maximum number of points to return"),
+    limit: int = Query(1000, ge=2, le=50000, description="Maximum number of points to return"),
+    tolerance: float = Query(0, ge=0, description="Douglas-Peucker tolerance in metres (0 disables)"),
+    bucket_seconds: int = Query(0, ge=0, description="Keep at most one point per this many seconds (0 disables)"),
+    format: str = Query("points", pattern="^(points|polyline)$", description="points or an encoded polyline"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Generate GPS path report for a student
     
+    The raw path is reduced server-side: first to one point per
+    `bucket_seconds`, then simplified with Douglas-Peucker at `tolerance`
+    metres, and finally thinned evenly to at most `limit` points. Endpoints
+    are always kept. `format=polyline` returns the coordinates as a Google
+    encoded polyline instead of a list of objects.
+    
     Permissions:
     - Admin/System Admin: Can view any student's GPS path
     - Teacher: Can view GPS paths for students they teach
@@ -144,50 +341,77 @@ async def get_gps_paths_report(
     elif current_user.role not in [UserRole.ADMIN, UserRole.SYSTEM_ADMIN]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    # Build query
-    query = db.query(LocationTracking).filter(LocationTracking.student_id == student.id)
-    
-    # Date filtering
-    if date:
-        query = query.filter(db.func.date(LocationTracking.timestamp) == date)
-    elif start_date and end_date:
-        query = query.filter(
-            LocationTracking.timestamp >= start_date,
-            LocationTracking.timestamp <= end_date
+    # Build query, with date filters as timestamp ranges so the index applies
+    query = (
+        select(
+            LocationTracking.timestamp,
+            LocationTracking.latitude,
+            LocationTracking.longitude,
+            LocationTracking.accuracy
         )
-    elif start_date:
-        query = query.filter(LocationTracking.timestamp >= start_date)
-    elif end_date:
-        query = query.filter(LocationTracking.timestamp <= end_date)
+        .where(LocationTracking.student_id == student.id)
+    )
+    if date:
+        start_date, end_date = date, date
+    if start_date:
+        query = query.where(LocationTracking.timestamp >= start_date)
+    if end_date:
+        query = query.where(LocationTracking.timestamp < end_date + timedelta(days=1))
     
-    # Order by timestamp and limit
-    query = query.order_by(LocationTracking.timestamp.asc()).limit(limit)
+    # Read one row past the cap so truncation can be reported rather than hidden
+    max_raw_points = settings.report_gps_max_raw_points
+    query = query.order_by(LocationTracking.timestamp.asc()).limit(max_raw_points + 1)
+    rows = db.execute(query).all()
+    truncated = len(rows) > max_raw_points
+    rows = rows[:max_raw_points]
     
-    # Execute query
-    locations = query.all()
+    if rows:
+        timestamps = np.array([row.timestamp.timestamp() for row in rows])
+        lats = np.array([row.latitude for row in rows])
+        lngs = np.array([row.longitude for row in rows])
+    else:
+        timestamps = lats = lngs = np.empty(0)
     
-    # Format response
-    path_data = [
-        {
-            "timestamp": loc.timestamp,
-            "lat": loc.latitude,
-            "lng": loc.longitude,
-            "accuracy": loc.accuracy
-        }
-        for loc in locations
-    ]
+    # Each step returns indices into the previous step's points
+    keep = np.arange(len(rows))
+    step = geometry.downsample_by_time(timestamps[keep], bucket_seconds)
+    keep = keep[step]
+    step = geometry.simplify_path(lats[keep], lngs[keep], tolerance)
+    keep = keep[step]
+    step = geometry.cap_points(len(keep), limit)
+    keep = keep[step]
     
-    return {
+    response = {
         "student_id": student.student_id,
         "student_name": student.full_name,
-        "total_points": len(path_data),
+        "raw_points": len(rows),
+        "total_points": len(keep),
+        "truncated": truncated,
         "filters": {
             "date": date.isoformat() if date else None,
             "start_date": start_date.isoformat() if start_date else None,
-            "end_date": end_date.isoformat() if end_date else None
-        },
-        "path": path_data
+            "end_date": end_date.isoformat() if end_date else None,
+            "tolerance": tolerance,
+            "bucket_seconds": bucket_seconds
+        }
     }
+    
+    if format == "polyline":
+        response["start_time"] = rows[keep[0]].timestamp if len(keep) else None
+        response["end_time"] = rows[keep[-1]].timestamp if len(keep) else None
+        response["polyline"] = geometry.encode_polyline(lats[keep], lngs[keep])
+        return response
+    
+    response["path"] = [
+        {
+            "timestamp": rows[index].timestamp,
+            "lat": rows[index].latitude,
+            "lng": rows[index].longitude,
+            "accuracy": rows[index].accuracy
+        }
+        for index in keep.tolist()
+    ]
+    return response
 
 
 @router.get("/alerts")
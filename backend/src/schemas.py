@@ -1,7 +1,7 @@
 """Pydantic schemas for request/response validation"""
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 
@@ -64,7 +64,8 @@ class UserResponse(BaseModel):
 
 # Student Schemas
 class StudentBase(BaseModel):
-    student_id: str
+    # "|" separates the fields of signed QR tokens
+    student_id: str = Field(..., min_length=1, pattern=r"^[^|]+$")
     full_name: str
     class_name: Optional[str] = None
     device_id: Optional[str] = None
@@ -110,6 +111,23 @@ class LocationPost(BaseModel):
     accuracy: Optional[float] = None
 
 
+class LocationBatchPost(BaseModel):
+    locations: List[LocationPost] = Field(..., min_length=1, max_length=1000)
+
+
+class LocationBatchItemResult(BaseModel):
+    index: int
+    student_id: str
+    status: str
+    detail: Optional[str] = None
+
+
+class LocationBatchResponse(BaseModel):
+    accepted: int
+    rejected: int
+    results: List[LocationBatchItemResult]
+
+
 class LocationResponse(BaseModel):
     timestamp: datetime
     lat: float
@@ -120,6 +138,11 @@ class LocationResponse(BaseModel):
         from_attributes = True
 
 
+class StudentLocationResponse(LocationResponse):
+    student_id: str
+    student_name: str
+
+
 # Attendance Schemas
 class AttendanceCreate(BaseModel):
     student_id: str
@@ -130,6 +153,30 @@ class AttendanceCreate(BaseModel):
     scanner_id: Optional[str] = None
 
 
+class AttendanceSyncItem(AttendanceCreate):
+    # Generated by the scanner when the scan is queued; replays reuse it
+    idempotency_key: str = Field(..., min_length=1, max_length=128)
+
+
+class AttendanceSyncRequest(BaseModel):
+    scans: List[AttendanceSyncItem] = Field(..., min_length=1, max_length=1000)
+
+
+class AttendanceSyncItemResult(BaseModel):
+    index: int
+    idempotency_key: str
+    status: str
+    attendance_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class AttendanceSyncResponse(BaseModel):
+    recorded: int
+    duplicates: int
+    rejected: int
+    results: List[AttendanceSyncItemResult]
+
+
 class AttendanceResponse(BaseModel):
     id: int
     type: str
@@ -142,17 +189,44 @@ class AttendanceResponse(BaseModel):
 
 
 # QR Code Schemas
+class QRFormat(str, Enum):
+    PNG = "png"
+    SVG = "svg"
+    MATRIX = "matrix"
+
+
 class QRGenerateRequest(BaseModel):
     student_id: str
     type: AttendanceType
+    format: QRFormat = QRFormat.PNG
 
 
 class QRGenerateResponse(BaseModel):
-    qr_code_url: str
+    qr_code_url: Optional[str] = None  # png/svg data URL
+    matrix: Optional[List[str]] = None  # Rows of "1"/"0" modules for the matrix format
     token: str
     expires_at: datetime
 
 
+class QRBatchRequest(BaseModel):
+    school_id: int
+    class_name: str
+    type: AttendanceType
+    format: QRFormat = QRFormat.PNG
+    ttl_minutes: Optional[int] = Field(None, ge=1, le=1440)
+
+
+class QRBatchItem(QRGenerateResponse):
+    student_id: str
+    student_name: str
+
+
+class QRBatchResponse(BaseModel):
+    count: int
+    expires_at: datetime
+    codes: List[QRBatchItem]
+
+
 class QRValidateRequest(BaseModel):
     token: str
     scanner_id: str
@@ -177,6 +251,15 @@ class NotificationResponse(BaseModel):
         from_attributes = True
 
 
+class UnreadCountResponse(BaseModel):
+    unread: int
+
+
+class MarkAllReadResponse(BaseModel):
+    marked: int
+    unread: int
+
+
 # School Schemas
 class SchoolCreate(BaseModel):
     name: str
@@ -201,3 +284,45 @@ class SchoolResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+# Geofence Schemas
+class GeofenceUpdate(BaseModel):
+    radius_m: Optional[float] = Field(None, gt=0)
+    polygon: Optional[List[LocationData]] = Field(None, min_length=3)
+
+
+class GeofenceResponse(BaseModel):
+    school_id: int
+    school_name: str
+    latitude: float
+    longitude: float
+    radius_m: Optional[float] = None
+    polygon: Optional[List[LocationData]] = None
+
+
+# Bulk Import Schemas
+class UserImportRow(BaseModel):
+    email: EmailStr
+    password: Optional[str] = None  # Blank leaves the account unusable until an admin sets one
+    full_name: str
+    phone: Optional[str] = None
+    role: UserRole
+
+
+class StudentImportRow(StudentBase):
+    school_code: str
+    parent_email: EmailStr
+    teacher_email: Optional[EmailStr] = None
+
+
+class ImportRowError(BaseModel):
+    row: int
+    detail: str
+
+
+class ImportResponse(BaseModel):
+    total_rows: int
+    created: int
+    dry_run: bool
+    errors: List[ImportRowError]
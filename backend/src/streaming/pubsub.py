@@ -0,0 +1,112 @@
+"""Event bus that fans real-time events out to every worker process
+
+Producers publish location and notification events to the bus; each uvicorn
+worker subscribes once at startup and forwards the events it receives to the
+WebSocket clients connected to that worker.
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Optional
+
+from config.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+LOCATION_CHANNEL = "location"
+NOTIFICATION_CHANNEL = "notification"
+CHANNELS = (LOCATION_CHANNEL, NOTIFICATION_CHANNEL)
+
+EventHandler = Callable[[str, dict], Awaitable[None]]
+
+
+class InMemoryBus:
+    """Bus for a single worker process: events go straight to the local handler"""
+    
+    def __init__(self):
+        self._handler: Optional[EventHandler] = None
+    
+    async def start(self, handler: EventHandler):
+        self._handler = handler
+    
+    async def stop(self):
+        self._handler = None
+    
+    async def publish(self, channel: str, message: dict):
+        if self._handler is not None:
+            await self._handler(channel, message)
+
+
+class RedisBus:
+    """
+    Bus shared by all workers through Redis pub/sub
+
+    Every worker publishes to and subscribes on the same Redis channels, so a
+    location posted to one worker reaches sockets held by any other.
+    """
+    
+    def __init__(self, redis_url: str, prefix: str):
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._client = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    def _channel(self, channel: str) -> str:
+        return f"{self.prefix}:{channel}"
+    
+    async def start(self, handler: EventHandler):
+        # Imported lazily so the in-memory bus works without redis installed
+        import redis.asyncio as redis
+        
+        self._client = redis.from_url(self.redis_url)
+        self._listener = asyncio.create_task(self._listen(handler))
+    
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def publish(self, channel: str, message: dict):
+        """Publish to every worker; Redis errors propagate so callers can retry"""
+        if self._client is None:
+            return
+        await self._client.publish(self._channel(channel), json.dumps(message, default=str))
+    
+    async def _listen(self, handler: EventHandler):
+        channels = {self._channel(channel): channel for channel in CHANNELS}
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(*channels)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    channel = channels.get(message["channel"].decode())
+                    try:
+                        await handler(channel, json.loads(message["data"]))
+                    except Exception:
+                        logger.exception("Error handling %s event", channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis subscription lost, reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+def create_event_bus():
+    """Build the bus selected by the pubsub_backend setting"""
+    if settings.pubsub_backend == "redis":
+        return RedisBus(settings.redis_url, settings.pubsub_channel_prefix)
+    if settings.pubsub_backend == "memory":
+        return InMemoryBus()
+    raise ValueError(f"Unknown pubsub backend: {settings.pubsub_backend}")
+
+
+event_bus = create_event_bus()
@@ -1,91 +1,222 @@
 """WebSocket streaming endpoints for real-time updates"""
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
+import asyncio
 import json
+import logging
 from datetime import datetime
 
-from config.database import get_db
+from config.database import AsyncSessionLocal, get_db
+from config.settings import get_settings
+from src.auth.auth import AuthenticatedUser, get_current_user
 from src.models import Student, User, UserRole
+from src.students.resolver import get_student_or_404
+from src.streaming.pubsub import LOCATION_CHANNEL, NOTIFICATION_CHANNEL, event_bus
 
+settings = get_settings()
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/streaming", tags=["streaming"])
 
+# Close code telling clients to reconnect after a stall or overflow
+WS_TRY_AGAIN_LATER = 1013
+# Close code for a missing or invalid token, or a stream the user may not watch
+WS_POLICY_VIOLATION = 1008
+
+
+class ClientConnection:
+    """
+    A WebSocket with its own bounded outbound queue and writer task
+    
+    Broadcasts only enqueue pre-serialized text, so a slow client delays
+    nobody but itself. When a location queue is full the oldest pending
+    message is dropped, since only the newest positions matter. Notifications
+    are never dropped silently: overflowing the queue closes the socket with
+    1013 (try again later) so the app reconnects and resyncs through the REST
+    API. A send that fails or stalls past ws_send_timeout_seconds closes the
+    socket the same way.
+    """
+    
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int,
+        on_close: Callable[["ClientConnection"], None],
+        drop_oldest: bool = True
+    ):
+        self.websocket = websocket
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._on_close = on_close
+        self._closing = False
+        self._closer = None
+        self._writer = asyncio.create_task(self._write())
+    
+    def send(self, message: dict):
+        """Queue a message for this client"""
+        self.send_text(json.dumps(message, default=str))
+    
+    def send_text(self, text: str):
+        """Queue pre-serialized text; a full queue drops the oldest message or closes the socket"""
+        if self._closing:
+            return
+        if self._queue.full():
+            self.dropped += 1
+            if not self.drop_oldest:
+                self._writer.cancel()
+                self._closer = asyncio.create_task(self._shut_down())
+                return
+            self._queue.get_nowait()
+        self._queue.put_nowait(text)
+    
+    async def _write(self):
+        try:
+            while True:
+                text = await self._queue.get()
+                await asyncio.wait_for(
+                    self.websocket.send_text(text),
+                    timeout=settings.ws_send_timeout_seconds
+                )
+        except asyncio.CancelledError:
+            raise
+        except (WebSocketDisconnect, RuntimeError, ConnectionError, asyncio.TimeoutError):
+            # Client went away or stalled for too long
+            await self._shut_down()
+    
+    async def _shut_down(self):
+        if self._closing:
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=WS_TRY_AGAIN_LATER),
+                timeout=settings.ws_send_timeout_seconds
+            )
+        except (WebSocketDisconnect, RuntimeError, ConnectionError, asyncio.TimeoutError):
+            # Already gone; nothing left to tell the client
+            pass
+        self._on_close(self)
+    
+    def close(self):
+        """Stop the writer task"""
+        self._writer.cancel()
+
 
 # Connection manager to handle multiple WebSocket connections
 class ConnectionManager:
     def __init__(self):
         # Store active connections by student_id
-        self.location_connections: Dict[str, List[WebSocket]] = {}
+        self.location_connections: Dict[str, List[ClientConnection]] = {}
         # Store active connections for notifications by user_id
-        self.notification_connections: Dict[int, List[WebSocket]] = {}
+        self.notification_connections: Dict[int, List[ClientConnection]] = {}
+    
+    @staticmethod
+    def _remove(connections: dict, key, websocket: WebSocket):
+        for connection in connections.get(key, []):
+            if connection.websocket is websocket:
+                connection.close()
+                connections[key].remove(connection)
+                break
+        if key in connections and not connections[key]:
+            del connections[key]
     
-    async def connect_location(self, websocket: WebSocket, student_id: str):
+    @staticmethod
+    def _fan_out(connections: List[ClientConnection], message: dict):
+        # Serialize once, then hand the same text to every client queue
+        text = json.dumps(message, default=str)
+        for connection in list(connections):
+            connection.send_text(text)
+    
+    async def connect_location(self, websocket: WebSocket, student_id: str) -> ClientConnection:
         """Connect a client to location updates for a specific student"""
         await websocket.accept()
-        if student_id not in self.location_connections:
-            self.location_connections[student_id] = []
-        self.location_connections[student_id].append(websocket)
+        connection = ClientConnection(
+            websocket,
+            max_queue=settings.ws_location_queue_size,
+            on_close=lambda conn: self.disconnect_location(conn.websocket, student_id)
+        )
+        self.location_connections.setdefault(student_id, []).append(connection)
+        return connection
     
     def disconnect_location(self, websocket: WebSocket, student_id: str):
         """Disconnect a client from location updates"""
-        if student_id in self.location_connections:
-            self.location_connections[student_id].remove(websocket)
-            if not self.location_connections[student_id]:
-                del self.location_connections[student_id]
+        self._remove(self.location_connections, student_id, websocket)
     
     async def broadcast_location(self, student_id: str, message: dict):
         """Broadcast location update to all connected clients for a student"""
         if student_id in self.location_connections:
-            disconnected = []
-            for connection in self.location_connections[student_id]:
-                try:
-                    await connection.send_json(message)
-                except (WebSocketDisconnect, RuntimeError, ConnectionError) as e:
-                    disconnected.append(connection)
-            
-            # Remove disconnected clients
-            for conn in disconnected:
-                try:
-                    self.location_connections[student_id].remove(conn)
-                except (ValueError, KeyError):
-                    pass
-    
-    async def connect_notifications(self, websocket: WebSocket, user_id: int):
+            self._fan_out(self.location_connections[student_id], message)
+    
+    async def connect_notifications(self, websocket: WebSocket, user_id: int) -> ClientConnection:
         """Connect a client to notification updates"""
         await websocket.accept()
-        if user_id not in self.notification_connections:
-            self.notification_connections[user_id] = []
-        self.notification_connections[user_id].append(websocket)
+        connection = ClientConnection(
+            websocket,
+            max_queue=settings.ws_notification_queue_size,
+            on_close=lambda conn: self.disconnect_notifications(conn.websocket, user_id),
+            drop_oldest=False
+        )
+        self.notification_connections.setdefault(user_id, []).append(connection)
+        return connection
     
     def disconnect_notifications(self, websocket: WebSocket, user_id: int):
         """Disconnect a client from notification updates"""
-        if user_id in self.notification_connections:
-            self.notification_connections[user_id].remove(websocket)
-            if not self.notification_connections[user_id]:
-                del self.notification_connections[user_id]
+        self._remove(self.notification_connections, user_id, websocket)
     
     async def send_notification(self, user_id: int, message: dict):
         """Send notification to a specific user"""
         if user_id in self.notification_connections:
-            disconnected = []
-            for connection in self.notification_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                except (WebSocketDisconnect, RuntimeError, ConnectionError) as e:
-                    disconnected.append(connection)
-            
-            # Remove disconnected clients
-            for conn in disconnected:
-                try:
-                    self.notification_connections[user_id].remove(conn)
-                except (ValueError, KeyError):
-                    pass
+            self._fan_out(self.notification_connections[user_id], message)
+    
+    def stats(self) -> dict:
+        """Connection counts and messages dropped or refused for slow clients"""
+        location = [c for conns in self.location_connections.values() for c in conns]
+        notification = [c for conns in self.notification_connections.values() for c in conns]
+        return {
+            "location_connections": len(location),
+            "notification_connections": len(notification),
+            "dropped_messages": sum(c.dropped for c in location + notification)
+        }
 
 
 # Global connection manager instance
 manager = ConnectionManager()
 
 
+async def _authenticate(websocket: WebSocket, token: str) -> Optional[AuthenticatedUser]:
+    """The active user the token belongs to, or None after closing the socket with 1008"""
+    async with AsyncSessionLocal() as db:
+        try:
+            user = await get_current_user(token, db)
+        except HTTPException:
+            user = None
+    if user is None or not user.is_active:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return None
+    return user
+
+
+async def _authorize_location_stream(
+    websocket: WebSocket,
+    token: str,
+    student_id: str
+) -> Optional[AuthenticatedUser]:
+    """Authenticate and apply GET /location/{student_id}/last's access rule"""
+    user = await _authenticate(websocket, token)
+    if user is None:
+        return None
+    async with AsyncSessionLocal() as db:
+        try:
+            student = await get_student_or_404(db, student_id)
+        except HTTPException:
+            student = None
+    if student is None or (user.role == UserRole.PARENT and student.parent_id != user.id):
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return None
+    return user
+
+
 @router.websocket("/location/{student_id}")
 async def websocket_location_stream(
     websocket: WebSocket,
@@ -101,20 +232,21 @@ async def websocket_location_stream(
     - Connect: ws://localhost:8000/api/v1/streaming/location/{student_id}?token=<jwt_token>
     - Receive: JSON messages with location updates
     
-    Permissions:
-    - Parent: Can stream their children's locations
-    - Teacher: Can stream their students' locations
-    - Admin: Can stream any student's location
+    Permissions (the same as GET /location/{student_id}/last):
+    - Parent: Can stream their children's locations only
+    - Teacher, admin and gate scanner: Can stream any student's location
+    
+    A missing or invalid token, an unknown student or a forbidden stream
+    closes the socket with 1008 before it is accepted.
     """
-    # Note: In a production system, you would validate the JWT token here
-    # For simplicity, we're accepting connections with any token
-    # TODO: Implement proper JWT validation for WebSocket connections
+    if await _authorize_location_stream(websocket, token, student_id) is None:
+        return
     
-    await manager.connect_location(websocket, student_id)
+    connection = await manager.connect_location(websocket, student_id)
     
     try:
         # Send initial connection confirmation
-        await websocket.send_json({
+        connection.send({
             "type": "connection",
             "message": f"Connected to location stream for student {student_id}",
             "timestamp": datetime.utcnow().isoformat()
@@ -127,7 +259,7 @@ async def websocket_location_stream(
             
             # Echo back for testing
             if data == "ping":
-                await websocket.send_json({
+                connection.send({
                     "type": "pong",
                     "timestamp": datetime.utcnow().isoformat()
                 })
@@ -154,32 +286,19 @@ async def websocket_notifications_stream(
     Permissions:
     - Any authenticated user can connect to receive their notifications
     
-    Note: This is a basic implementation. In production, implement proper JWT
-    validation for WebSocket connections. The token should be validated and
-    the user_id should be extracted from the token before establishing the connection.
+    The stream is for the user the token belongs to; an invalid token
+    closes the socket with 1008 before anything is sent.
     """
-    # TODO: Implement JWT validation for WebSocket connections
-    # Example implementation:
-    # try:
-    #     from src.auth.auth import decode_token
-    #     payload = decode_token(token)
-    #     user_id = payload.get("user_id")
-    #     if not user_id:
-    #         await websocket.close(code=1008)  # Policy violation
-    #         return
-    # except Exception:
-    #     await websocket.close(code=1008)  # Policy violation
-    #     return
-    
-    # TEMPORARY: For development/testing only
-    # In production, this MUST be replaced with actual JWT validation
-    user_id = 1  # Placeholder - extract from validated token in production
-    
-    await manager.connect_notifications(websocket, user_id)
+    current_user = await _authenticate(websocket, token)
+    if current_user is None:
+        return
+    user_id = current_user.id
+    
+    connection = await manager.connect_notifications(websocket, user_id)
     
     try:
         # Send initial connection confirmation
-        await websocket.send_json({
+        connection.send({
             "type": "connection",
             "message": "Connected to notification stream",
             "timestamp": datetime.utcnow().isoformat()
@@ -192,7 +311,7 @@ async def websocket_notifications_stream(
             
             # Echo back for testing
             if data == "ping":
-                await websocket.send_json({
+                connection.send({
                     "type": "pong",
                     "timestamp": datetime.utcnow().isoformat()
                 })
@@ -202,13 +321,29 @@ async def websocket_notifications_stream(
         print(f"Client disconnected from notification stream for user {user_id}")
 
 
+async def handle_bus_event(channel: str, message: dict):
+    """Deliver an event received from the bus to this worker's sockets"""
+    if channel == LOCATION_CHANNEL:
+        await manager.broadcast_location(message["student_id"], message)
+    elif channel == NOTIFICATION_CHANNEL:
+        await manager.send_notification(message.pop("user_id"), message)
+
+
 # Helper function for other modules to broadcast location updates
-async def broadcast_location_update(student_id: str, latitude: float, longitude: float, accuracy: float = None):
+async def broadcast_location_update(
+    student_id: str,
+    latitude: float,
+    longitude: float,
+    accuracy: float = None,
+    timestamp: datetime = None
+):
     """
     Broadcast location update to all connected clients
     
-    This function can be called from the location_tracking module
-    when a new location is recorded
+    Called from the location_tracking module when a new location is recorded.
+    The update goes through the event bus so clients on every worker see it.
+    Live updates are best effort: the fix is already committed, so a bus
+    failure is logged rather than failing the request.
     """
     message = {
         "type": "location_update",
@@ -216,9 +351,12 @@ async def broadcast_location_update(student_id: str, latitude: float, longitude:
         "latitude": latitude,
         "longitude": longitude,
         "accuracy": accuracy,
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": (timestamp or datetime.utcnow()).isoformat()
     }
-    await manager.broadcast_location(student_id, message)
+    try:
+        await event_bus.publish(LOCATION_CHANNEL, message)
+    except Exception:
+        logger.exception("Failed to publish location update for student %s", student_id)
 
 
 # Helper function for other modules to send notifications
@@ -227,13 +365,15 @@ async def send_notification_update(user_id: int, notification_type: str, message
     Send notification update to a specific user
     
     This function can be called from the notifications module
-    when a new notification is created
+    when a new notification is created. Bus errors propagate, so the
+    dispatcher's websocket channel retries the delivery.
     """
     notification_message = {
         "type": "notification",
+        "user_id": user_id,
         "notification_type": notification_type,
         "message": message,
         "data": data or {},
         "timestamp": datetime.utcnow().isoformat()
     }
-    await manager.send_notification(user_id, notification_message)
+    await event_bus.publish(NOTIFICATION_CHANNEL, notification_message)
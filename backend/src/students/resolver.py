@@ -0,0 +1,109 @@
+"""Cached resolution of external student IDs to internal identities"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import get_settings
+from src import models
+from src.cache import TTLCache
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class StudentIdentity:
+    """The subset of a student row needed by the hot routes"""
+    id: int
+    student_id: str
+    full_name: str
+    class_name: Optional[str]
+    school_id: Optional[int]
+    parent_id: Optional[int]
+    teacher_id: Optional[int]
+
+
+student_cache = TTLCache(
+    max_entries=settings.student_cache_max_entries,
+    ttl_seconds=settings.student_cache_ttl_seconds
+)
+
+_identity_columns = (
+    models.Student.id,
+    models.Student.student_id,
+    models.Student.full_name,
+    models.Student.class_name,
+    models.Student.school_id,
+    models.Student.parent_id,
+    models.Student.teacher_id,
+)
+
+
+def _to_identity(row) -> StudentIdentity:
+    return StudentIdentity(
+        id=row.id,
+        student_id=row.student_id,
+        full_name=row.full_name,
+        class_name=row.class_name,
+        school_id=row.school_id,
+        parent_id=row.parent_id,
+        teacher_id=row.teacher_id
+    )
+
+
+async def resolve_student(db: AsyncSession, student_id: str) -> Optional[StudentIdentity]:
+    """Look up a student by external ID, serving repeat lookups from the cache"""
+    identity = student_cache.get(student_id)
+    if identity is not None:
+        return identity
+    
+    result = await db.execute(
+        select(*_identity_columns).where(models.Student.student_id == student_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    
+    identity = _to_identity(row)
+    student_cache.set(student_id, identity)
+    return identity
+
+
+async def resolve_students(db: AsyncSession, student_ids: Iterable[str]) -> Dict[str, StudentIdentity]:
+    """Resolve many external IDs at once, querying only the cache misses"""
+    resolved = {}
+    missing = []
+    for student_id in set(student_ids):
+        identity = student_cache.get(student_id)
+        if identity is not None:
+            resolved[student_id] = identity
+        else:
+            missing.append(student_id)
+    
+    if missing:
+        result = await db.execute(
+            select(*_identity_columns).where(models.Student.student_id.in_(missing))
+        )
+        for row in result:
+            identity = _to_identity(row)
+            student_cache.set(row.student_id, identity)
+            resolved[row.student_id] = identity
+    
+    return resolved
+
+
+async def get_student_or_404(db: AsyncSession, student_id: str) -> StudentIdentity:
+    """Resolve a student or raise the standard 404 used by the API routes"""
+    identity = await resolve_student(db, student_id)
+    if identity is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Student not found"
+        )
+    return identity
+
+
+def invalidate_student(student_id: str):
+    """Drop a cached identity after the student row has changed"""
+    student_cache.pop(student_id)
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from config.database import get_db
 from src import models, schemas
 from src.auth.auth import get_current_active_user, require_role
+from src.students.resolver import invalidate_student
 
 router = APIRouter(prefix="/students", tags=["Students"])
 
@@ -31,6 +32,7 @@ async def create_student(
     db.add(db_student)
     db.commit()
     db.refresh(db_student)
+    invalidate_student(db_student.student_id)
     
     return db_student
 
@@ -92,6 +94,7 @@ async def update_student(
     
     db.commit()
     db.refresh(student)
+    invalidate_student(student.student_id)
     
     return student
 
@@ -120,6 +123,7 @@ async def update_device(
     
     db.commit()
     db.refresh(student)
+    invalidate_student(student.student_id)
     
     return student
 
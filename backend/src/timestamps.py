@@ -0,0 +1,13 @@
+"""Timestamp conventions shared by the ingest, geofencing and report code
+
+Devices sometimes send timestamps without an offset, and SQLite hands
+timezone-aware columns back without one. Naive timestamps are always UTC.
+"""
+from datetime import datetime, timezone
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    """Attach UTC to a naive timestamp and convert an aware one to UTC"""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, List
 
 from config.database import get_db
-from src.auth.auth import get_current_user, get_password_hash
+from src.auth.auth import get_current_user, get_password_hash_async, invalidate_user
 from src.models import User, UserRole
 from src.schemas import UserResponse, UserRole as UserRoleEnum
 
@@ -107,6 +107,7 @@ async def update_user(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Update fields
+    previous_email = user.email
     if full_name is not None:
         user.full_name = full_name
     if phone is not None:
@@ -120,6 +121,7 @@ async def update_user(
     
     db.commit()
     db.refresh(user)
+    invalidate_user(previous_email)
     
     return user
 
@@ -139,7 +141,7 @@ async def change_password(
     - Users can only change their own password
     - Admins can reset passwords for other users (current_password not required)
     """
-    from src.auth.auth import verify_password
+    from src.auth.auth import verify_password_async
     
     # Find user
     user = db.query(User).filter(User.id == user_id).first()
@@ -155,12 +157,13 @@ async def change_password(
     
     # Verify current password if user is changing their own password
     if is_self and not is_admin:
-        if not verify_password(current_password, user.hashed_password):
+        if not await verify_password_async(current_password, user.hashed_password):
             raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Update password
-    user.hashed_password = get_password_hash(new_password)
+    user.hashed_password = await get_password_hash_async(new_password)
     db.commit()
+    invalidate_user(user.email)
     
     return {"message": "Password updated successfully"}
 
@@ -195,6 +198,7 @@ async def deactivate_user(
     # Deactivate
     user.is_active = False
     db.commit()
+    invalidate_user(user.email)
     
     return {"message": f"User {user.email} has been deactivated"}
 
@@ -223,5 +227,6 @@ async def activate_user(
     # Activate
     user.is_active = True
     db.commit()
+    invalidate_user(user.email)
     
     return {"message": f"User {user.email} has been activated"}
@@ -0,0 +1,124 @@
+"""Shared fixtures: the app on a throwaway SQLite database with seeded users
+
+Set DATABASE_URL before running to test against another database; the
+PostgreSQL-only tests additionally need TEST_POSTGRES_URL and are skipped
+without it.
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+_db_dir = tempfile.mkdtemp(prefix="esalama-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/test.db")
+os.environ.setdefault("DEBUG", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+PASSWORD = "test-password"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from src.main import app
+    
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def seed(client):
+    """One school with an admin, parent, teacher, gate scanner and three students"""
+    from config.database import SessionLocal
+    from src import models
+    from src.auth.auth import get_password_hash
+    
+    hashed = get_password_hash(PASSWORD)
+    db = SessionLocal()
+    users = {
+        role: models.User(email=f"{role}@example.com", hashed_password=hashed, full_name=role.title(), role=user_role)
+        for role, user_role in [
+            ("admin", models.UserRole.ADMIN),
+            ("parent", models.UserRole.PARENT),
+            ("teacher", models.UserRole.TEACHER),
+            ("other_teacher", models.UserRole.TEACHER),
+            ("scanner", models.UserRole.GATE_SCANNER)
+        ]
+    }
+    users["parent"].phone = "+254700000000"
+    school = models.School(name="Test School", code="TS1", latitude=-1.28, longitude=36.82)
+    other_school = models.School(name="Other School", code="TS2", latitude=-1.0, longitude=36.0)
+    db.add_all([*users.values(), school, other_school])
+    db.commit()
+    students = [
+        models.Student(
+            student_id=f"STU{index}",
+            full_name=f"Student {index}",
+            class_name="4A",
+            school_id=school.id,
+            parent_id=users["parent"].id,
+            teacher_id=users["teacher"].id
+        )
+        for index in range(3)
+    ]
+    db.add_all(students)
+    db.commit()
+    ids = {role: user.id for role, user in users.items()}
+    ids.update(
+        school=school.id,
+        other_school=other_school.id,
+        students={student.student_id: student.id for student in students}
+    )
+    db.close()
+    return ids
+
+
+def login(client, role: str) -> dict:
+    response = client.post(
+        "/api/v1/auth/login",
+        data={"username": f"{role}@example.com", "password": PASSWORD}
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client, seed):
+    return login(client, "admin")
+
+
+@pytest.fixture(scope="session")
+def parent_headers(client, seed):
+    return login(client, "parent")
+
+
+@pytest.fixture(scope="session")
+def teacher_headers(client, seed):
+    return login(client, "teacher")
+
+
+@pytest.fixture(scope="session")
+def other_teacher_headers(client, seed):
+    return login(client, "other_teacher")
+
+
+@pytest.fixture
+def pg_conn():
+    """A PostgreSQL connection whose search_path is a throwaway schema, dropped afterwards"""
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    try:
+        with engine.connect() as conn:
+            yield conn
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        engine.dispose()
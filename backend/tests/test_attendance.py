@@ -0,0 +1,87 @@
+"""Attendance scans: single-use QR tokens and offline queue sync"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+
+from config.database import SessionLocal
+from src import models
+
+from conftest import login
+
+
+def _scan(client, headers, student_id: str) -> dict:
+    """A scan of a freshly generated code"""
+    token = client.post(
+        "/api/v1/qr/generate",
+        json={"student_id": student_id, "type": "arrival", "format": "matrix"},
+        headers=headers
+    ).json()["token"]
+    return {
+        "student_id": student_id,
+        "type": "arrival",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "location": {"lat": -1.28, "lng": 36.82},
+        "qr_code_token": token,
+        "scanner_id": "gate-1"
+    }
+
+
+def test_parallel_scans_of_one_code_record_one_attendance(client, seed, admin_headers):
+    scanner_headers = login(client, "scanner")
+    scan = _scan(client, admin_headers, "STU1")
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(
+            lambda _: client.post("/api/v1/attendance/", json=scan, headers=scanner_headers),
+            range(8)
+        ))
+    
+    codes = sorted(response.status_code for response in responses)
+    assert codes == [200] + [401] * 7, [response.text for response in responses]
+
+
+def test_sync_records_once_and_replays_as_duplicates(client, seed, admin_headers):
+    scanner_headers = login(client, "scanner")
+    first = {**_scan(client, admin_headers, "STU2"), "idempotency_key": "queue-1"}
+    second = {**_scan(client, admin_headers, "STU2"), "idempotency_key": "queue-2"}
+    reused = {**first, "idempotency_key": "queue-3"}
+    
+    response = client.post("/api/v1/attendance/sync", json={"scans": [first, second, reused]}, headers=scanner_headers)
+    
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [item["status"] for item in body["results"]] == ["recorded", "recorded", "rejected"]
+    assert body["results"][2]["detail"] == "QR code already used"
+    
+    # The response was lost and the scanner sends its queue again
+    response = client.post("/api/v1/attendance/sync", json={"scans": [first, second]}, headers=scanner_headers)
+    
+    assert response.status_code == 200, response.text
+    replay = response.json()
+    assert (replay["recorded"], replay["duplicates"]) == (0, 2)
+    assert [item["attendance_id"] for item in replay["results"]] == [
+        item["attendance_id"] for item in body["results"][:2]
+    ]
+
+
+def test_sync_does_not_spend_a_token_owned_by_another_student(client, seed, admin_headers):
+    scanner_headers = login(client, "scanner")
+    scan = {**_scan(client, admin_headers, "STU1"), "idempotency_key": "queue-owner-1"}
+    # The stored row says the code was issued to someone else
+    with SessionLocal() as db:
+        db.execute(
+            update(models.QRToken)
+            .where(models.QRToken.token == scan["qr_code_token"])
+            .values(student_id=seed["students"]["STU0"])
+        )
+        db.commit()
+    
+    response = client.post("/api/v1/attendance/sync", json={"scans": [scan]}, headers=scanner_headers)
+    
+    assert response.status_code == 200, response.text
+    assert response.json()["rejected"] == 1
+    with SessionLocal() as db:
+        assert db.scalar(
+            select(models.QRToken.is_used).where(models.QRToken.token == scan["qr_code_token"])
+        ) is False
@@ -0,0 +1,93 @@
+"""Authentication: the principal cache and password hashing"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from config.database import SessionLocal
+from src import models
+from src.auth.auth import get_password_hash, principal_cache
+from src.auth.passwords import PasswordExecutor, password_executor
+
+from conftest import PASSWORD, login
+
+
+def _create_user(email: str) -> int:
+    db = SessionLocal()
+    try:
+        user = models.User(
+            email=email,
+            hashed_password=get_password_hash(PASSWORD),
+            full_name="Cache Test",
+            role=models.UserRole.TEACHER
+        )
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def test_repeat_requests_are_served_from_the_principal_cache(client, admin_headers):
+    client.get("/api/v1/auth/me", headers=admin_headers)
+    hits = principal_cache.hits
+    
+    response = client.get("/api/v1/auth/me", headers=admin_headers)
+    
+    assert response.status_code == 200
+    assert response.json()["email"] == "admin@example.com"
+    assert principal_cache.hits == hits + 1
+
+
+def test_deactivation_takes_effect_despite_the_cache(client, admin_headers):
+    user_id = _create_user("cached@example.com")
+    headers = login(client, "cached")
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+    
+    response = client.delete(f"/api/v1/users/{user_id}", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 400
+    
+    response = client.put(f"/api/v1/users/{user_id}/activate", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+
+def test_login_verifies_on_the_password_executor(client, seed):
+    completed = password_executor.stats()["completed"]
+    
+    login(client, "parent")
+    
+    assert password_executor.stats()["completed"] == completed + 1
+
+
+def test_password_executor_sheds_load_beyond_max_pending():
+    executor = PasswordExecutor(workers=1, max_pending=1)
+    started = threading.Event()
+    release = threading.Event()
+    
+    def blocking_hash(value):
+        started.set()
+        release.wait(5)
+        return value
+    
+    async def run():
+        running = asyncio.create_task(executor.run(blocking_hash, "running"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        queued = asyncio.create_task(executor.run(blocking_hash, "queued"))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(HTTPException) as rejected:
+            await executor.run(blocking_hash, "rejected")
+        
+        release.set()
+        return rejected.value, await running, await queued
+    
+    rejected, running, queued = asyncio.run(run())
+    
+    assert rejected.status_code == 503
+    assert rejected.headers == {"Retry-After": "1"}
+    assert (running, queued) == ("running", "queued")
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["completed"] == 2
@@ -0,0 +1,159 @@
+"""Bulk CSV import: parsing, duplicate checks, account resolution and roles"""
+import io
+
+import pytest
+from sqlalchemy import select
+
+from config.database import SessionLocal
+from src import models
+from src.auth.auth import UNUSABLE_PASSWORD
+from src.bulk_import.importer import (
+    STUDENT_COLUMNS,
+    USER_COLUMNS,
+    ImportFileError,
+    import_students,
+    import_users,
+    read_csv
+)
+
+
+def _csv(text: str, columns):
+    return read_csv(io.StringIO(text, newline=""), columns)
+
+
+def _errors(result) -> dict:
+    return {error["row"]: error["detail"] for error in result["errors"]}
+
+
+def test_read_csv_numbers_lines_and_blanks_cells():
+    rows = _csv(
+        "email,full_name,role,phone\n"
+        " a@example.com ,A,parent,\n"
+        "b@example.com,B,teacher,  \n",
+        USER_COLUMNS
+    )
+    
+    assert rows == [
+        (2, {"email": "a@example.com", "full_name": "A", "role": "parent", "phone": None}),
+        (3, {"email": "b@example.com", "full_name": "B", "role": "teacher", "phone": None})
+    ]
+
+
+def test_read_csv_rejects_missing_columns():
+    with pytest.raises(ImportFileError, match="full_name, role"):
+        _csv("email\na@example.com\n", USER_COLUMNS)
+
+
+def test_import_users_reports_duplicates_and_leaves_blank_passwords_unusable(seed):
+    rows = _csv(
+        "email,full_name,role,password\n"
+        "imp-parent@example.com,Imported Parent,parent,\n"
+        "imp-parent@example.com,Imported Again,parent,\n"
+        "parent@example.com,Existing Parent,parent,\n"
+        "not-an-email,Broken,parent,\n",
+        USER_COLUMNS
+    )
+    db = SessionLocal()
+    try:
+        result = import_users(db, rows)
+        hashed = db.scalar(
+            select(models.User.hashed_password).where(models.User.email == "imp-parent@example.com")
+        )
+    finally:
+        db.close()
+    
+    assert (result["total_rows"], result["created"]) == (4, 1)
+    errors = _errors(result)
+    assert errors[3] == "Duplicate email in file"
+    assert errors[4] == "Email already registered"
+    assert errors[5].startswith("email:")
+    assert hashed == UNUSABLE_PASSWORD
+
+
+def test_import_users_admin_roles_need_system_admin(seed):
+    rows = _csv(
+        "email,full_name,role\n"
+        "imp-admin@example.com,Imported Admin,admin\n"
+        "imp-sysadmin@example.com,Imported Sysadmin,system_admin\n"
+        "imp-scanner@example.com,Imported Scanner,gate_scanner\n",
+        USER_COLUMNS
+    )
+    db = SessionLocal()
+    try:
+        as_admin = import_users(db, rows, dry_run=True)
+        as_system_admin = import_users(db, rows, dry_run=True, allow_admin_roles=True)
+    finally:
+        db.close()
+    
+    assert _errors(as_admin) == {
+        2: "Only a system admin can import admin accounts",
+        3: "Only a system admin can import system_admin accounts"
+    }
+    assert as_system_admin["errors"] == []
+
+
+def test_import_users_route_refuses_admin_accounts_for_admins(client, seed, admin_headers):
+    response = client.post(
+        "/api/v1/imports/users",
+        files={"file": ("users.csv", b"email,full_name,role\nimp-route-admin@example.com,Route Admin,admin\n")},
+        headers=admin_headers
+    )
+    
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 0
+    assert _errors(response.json()) == {2: "Only a system admin can import admin accounts"}
+
+
+def test_import_students_resolves_schools_parents_and_teachers(seed):
+    rows = _csv(
+        "student_id,full_name,class_name,school_code,parent_email,teacher_email\n"
+        "IMP1,Imported One,7D,TS1,parent@example.com,teacher@example.com\n"
+        "IMP1,Imported Twice,7D,TS1,parent@example.com,\n"
+        "STU0,Existing,7D,TS1,parent@example.com,\n"
+        "IMP2,Unknown School,7D,NOPE,parent@example.com,\n"
+        "IMP3,Teacher As Parent,7D,TS1,teacher@example.com,\n"
+        "IMP4,Parent As Teacher,7D,TS1,parent@example.com,parent@example.com\n"
+        "IMP5,No Teacher,7D,TS2,parent@example.com,\n",
+        STUDENT_COLUMNS
+    )
+    db = SessionLocal()
+    try:
+        result = import_students(db, rows)
+        imported = {
+            student.student_id: (student.school_id, student.parent_id, student.teacher_id)
+            for student in db.execute(
+                select(models.Student).where(models.Student.student_id.in_(["IMP1", "IMP5"]))
+            ).scalars()
+        }
+    finally:
+        db.close()
+    
+    assert result["created"] == 2
+    assert _errors(result) == {
+        3: "Duplicate student_id in file",
+        4: "Student ID already exists",
+        5: "Unknown school code NOPE",
+        6: "No parent account for teacher@example.com",
+        7: "No teacher account for parent@example.com"
+    }
+    assert imported == {
+        "IMP1": (seed["school"], seed["parent"], seed["teacher"]),
+        "IMP5": (seed["other_school"], seed["parent"], None)
+    }
+
+
+def test_import_students_dry_run_writes_nothing(seed):
+    rows = _csv(
+        "student_id,full_name,class_name,school_code,parent_email\n"
+        "IMPDRY,Dry Run,7D,TS1,parent@example.com\n",
+        STUDENT_COLUMNS
+    )
+    db = SessionLocal()
+    try:
+        result = import_students(db, rows, dry_run=True)
+        stored = db.scalar(select(models.Student.id).where(models.Student.student_id == "IMPDRY"))
+    finally:
+        db.close()
+    
+    assert (result["created"], result["dry_run"], result["errors"]) == (0, True, [])
+    assert stored is None
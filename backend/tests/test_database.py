@@ -0,0 +1,23 @@
+"""Engine configuration"""
+import asyncio
+
+from sqlalchemy import text
+
+from config.database import AsyncSessionLocal, async_engine, get_async_database_url
+
+
+def test_async_url_uses_an_asyncio_driver():
+    assert get_async_database_url("postgresql://user:secret@db:5432/esalama") == (
+        "postgresql+asyncpg://user:secret@db:5432/esalama"
+    )
+    assert get_async_database_url("sqlite:///./esalama.db") == "sqlite+aiosqlite:///./esalama.db"
+    assert get_async_database_url("postgresql+asyncpg://db/esalama") == "postgresql+asyncpg://db/esalama"
+
+
+def test_async_session_round_trip():
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(text("SELECT 1"))).scalar_one()
+    
+    assert async_engine.dialect.is_async
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,91 @@
+"""Geofence state tracking and enter/exit events"""
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from config.database import AsyncSessionLocal
+from src import models
+from src.geofencing.alerts import stage_geofence_alerts
+from src.geofencing.engine import GeofenceEvent, GeofenceFix, GeofenceIndex, build_geofence, evaluate_fixes
+from src.students.resolver import StudentIdentity
+
+INSIDE = (-1.28, 36.82)  # The seeded school, default 200 m radius
+OUTSIDE = (-1.29, 36.83)
+
+
+def _student(seed) -> StudentIdentity:
+    return StudentIdentity(
+        id=seed["students"]["STU2"], student_id="STU2", full_name="Student 2", class_name="4A",
+        school_id=seed["school"], parent_id=seed["parent"], teacher_id=seed["teacher"]
+    )
+
+
+def _evaluate(fixes):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            events = await evaluate_fixes(db, fixes)
+            await db.commit()
+            state = (await db.execute(
+                select(models.StudentGeofenceState)
+                .where(models.StudentGeofenceState.student_id == fixes[0].student.id)
+            )).scalar_one()
+            return events, state.is_inside, state.timestamp.replace(tzinfo=timezone.utc)
+    
+    return asyncio.run(run())
+
+
+def test_state_written_only_on_transitions(seed):
+    student = _student(seed)
+    start = datetime(2032, 5, 1, 7, 0, tzinfo=timezone.utc)
+    
+    def fix(point, minutes):
+        return GeofenceFix(student, point[0], point[1], 5.0, start + timedelta(minutes=minutes))
+    
+    events, inside, timestamp = _evaluate([fix(INSIDE, 0)])
+    assert events == [] and inside is True and timestamp == start
+    
+    # Still inside: no event, and the stored state keeps the fix that set it
+    events, inside, timestamp = _evaluate([fix(INSIDE, 1), fix(INSIDE, 2)])
+    assert events == [] and inside is True and timestamp == start
+    
+    # Leaving and coming back within one batch reports both crossings
+    events, inside, timestamp = _evaluate([fix(INSIDE, 3), fix(OUTSIDE, 4), fix(INSIDE, 5)])
+    assert [event.event for event in events] == ["exit", "enter"]
+    assert inside is True and timestamp == start + timedelta(minutes=5)
+
+
+def test_circle_and_polygon_containment():
+    circle = build_geofence(SimpleNamespace(
+        id=1, name="Circle", latitude=-1.28, longitude=36.82, geofence_radius_m=100, geofence_polygon=None
+    ))
+    # A 0.01 degree square with a notch cut out of its north-east corner
+    square = [(-1.0, 36.0), (-1.0, 36.01), (-0.995, 36.01), (-0.995, 36.005), (-0.99, 36.005), (-0.99, 36.0)]
+    polygon = build_geofence(SimpleNamespace(
+        id=2, name="Polygon", latitude=-0.995, longitude=36.005, geofence_radius_m=None,
+        geofence_polygon=json.dumps(square)
+    ))
+    index = GeofenceIndex([circle, polygon])
+    
+    assert index.is_inside(1, -1.28, 36.82089)  # ~99 m east
+    assert not index.is_inside(1, -1.28, 36.82091)  # ~101 m east
+    assert index.is_inside(2, -0.998, 36.008)
+    assert not index.is_inside(2, -0.992, 36.008)  # In the notch, inside the bounding box
+    assert not index.is_inside(1, -0.998, 36.008)  # Another school's fence never counts
+    assert not index.is_inside(3, -1.28, 36.82)
+
+
+def test_alert_time_is_in_school_timezone(seed):
+    # 13:05 UTC is 16:05 in Nairobi
+    event = GeofenceEvent(_student(seed), "Test School", "exit", datetime(2032, 5, 1, 13, 5, tzinfo=timezone.utc))
+    
+    async def stage():
+        async with AsyncSessionLocal() as db:
+            pending = await stage_geofence_alerts(db, [event])
+            await db.rollback()
+            return pending
+    
+    (alert,) = asyncio.run(stage())
+    assert alert.message == "Student 2 has left the Test School boundary at 16:05"
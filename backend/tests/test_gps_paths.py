@@ -0,0 +1,94 @@
+"""GPS path reduction: the geometry helpers and GET /reports/gps-paths"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from config.database import SessionLocal
+from src import models
+from src.reports import geometry
+from src.timestamps import as_utc
+
+
+def _noisy_line(count: int, noise_m: float, seed: int = 0):
+    # About 1.1 m per point heading north, with gaussian noise in both axes
+    rng = np.random.default_rng(seed)
+    lats = -1.28 + np.arange(count) * 1e-5 + rng.normal(0, noise_m / 111_000, count)
+    lngs = 36.82 + rng.normal(0, noise_m / 111_000, count)
+    return lats, lngs
+
+
+def test_encode_polyline_matches_reference_example():
+    # The worked example from Google's encoded polyline documentation
+    lats = np.array([38.5, 40.7, 43.252])
+    lngs = np.array([-120.2, -120.95, -126.453])
+    
+    assert geometry.encode_polyline(lats, lngs) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_simplify_keeps_endpoints_and_respects_tolerance():
+    lats, lngs = _noisy_line(500, noise_m=3)
+    
+    keep = geometry.simplify_path(lats, lngs, tolerance_m=10)
+    
+    assert keep[0] == 0 and keep[-1] == len(lats) - 1
+    assert len(keep) < len(lats) // 10
+    # Every dropped point lies within the tolerance of the segment that replaced it
+    points = geometry.project_to_metres(lats, lngs)
+    for first, last in zip(keep[:-1], keep[1:]):
+        distances = geometry._segment_distances(points[first + 1:last], points[first], points[last])
+        assert distances.size == 0 or distances.max() <= 10
+
+
+def test_simplify_zero_tolerance_keeps_everything():
+    lats, lngs = _noisy_line(50, noise_m=3)
+    
+    assert np.array_equal(geometry.simplify_path(lats, lngs, 0), np.arange(50))
+
+
+def test_downsample_by_time_keeps_first_of_each_bucket_and_last():
+    epoch_seconds = np.arange(0, 300, 5, dtype=float)  # 60 fixes, 5s apart
+    
+    keep = geometry.downsample_by_time(epoch_seconds, 60)
+    
+    assert keep.tolist() == [0, 12, 24, 36, 48, 59]
+
+
+def test_cap_points_includes_endpoints():
+    keep = geometry.cap_points(1000, 10)
+    
+    assert len(keep) == 10
+    assert keep[0] == 0 and keep[-1] == 999
+
+
+def test_gps_paths_polyline(client, seed, admin_headers):
+    start = datetime(2031, 5, 4, 6, 0, tzinfo=timezone.utc)
+    lats, lngs = _noisy_line(400, noise_m=3)
+    db = SessionLocal()
+    db.add_all([
+        models.LocationTracking(
+            student_id=seed["students"]["STU1"],
+            latitude=lat,
+            longitude=lng,
+            accuracy=5,
+            timestamp=start + timedelta(seconds=5 * index)
+        )
+        for index, (lat, lng) in enumerate(zip(lats.tolist(), lngs.tolist()))
+    ])
+    db.commit()
+    db.close()
+    
+    response = client.get(
+        "/api/v1/reports/gps-paths",
+        params={"student_id": "STU1", "date": "2031-05-04", "tolerance": 10, "format": "polyline"},
+        headers=admin_headers
+    )
+    
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["raw_points"] == 400
+    assert 2 <= body["total_points"] < 400
+    assert body["truncated"] is False
+    assert "path" not in body
+    keep = geometry.simplify_path(lats, lngs, 10)
+    assert body["polyline"] == geometry.encode_polyline(lats[keep], lngs[keep])
+    assert as_utc(datetime.fromisoformat(body["start_time"])) == start
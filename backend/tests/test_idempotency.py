@@ -0,0 +1,53 @@
+"""Idempotency-Key replay on the ingest endpoints"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.auth.auth import create_access_token
+from src.idempotency import IdempotencyStore
+
+
+def _bearer(email: str, minutes: int) -> dict:
+    token = create_access_token({"sub": email}, expires_delta=timedelta(minutes=minutes))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _fix(student_id: str) -> dict:
+    return {
+        "student_id": student_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "location": {"lat": -1.2921, "lng": 36.8219},
+        "accuracy": 5
+    }
+
+
+def test_store_requires_the_full_interface():
+    with pytest.raises(TypeError):
+        IdempotencyStore()
+
+
+def test_refreshed_token_replays_the_stored_response(client, seed):
+    body = _fix("STU0")
+    first = client.post(
+        "/api/v1/location/",
+        json=body,
+        headers={**_bearer("admin@example.com", 30), "Idempotency-Key": "refresh-1"}
+    )
+    assert first.status_code == 200, first.text
+    
+    # Same user, new token
+    retry = client.post(
+        "/api/v1/location/",
+        json=body,
+        headers={**_bearer("admin@example.com", 31), "Idempotency-Key": "refresh-1"}
+    )
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert retry.json() == first.json()
+    
+    # Another user reusing the key is not served the first user's response
+    other = client.post(
+        "/api/v1/location/",
+        json=body,
+        headers={**_bearer("teacher@example.com", 30), "Idempotency-Key": "refresh-1"}
+    )
+    assert "Idempotent-Replayed" not in other.headers
@@ -0,0 +1,91 @@
+"""Location ingestion and the last-known-location table"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from config.database import AsyncSessionLocal
+from src import models
+from src.location_tracking.last_location import upsert_last_locations
+
+
+def _fix(student_id: str, timestamp: datetime, lat: float = -1.2921, lng: float = 36.8219) -> dict:
+    return {
+        "student_id": student_id,
+        "timestamp": timestamp.isoformat(),
+        "location": {"lat": lat, "lng": lng},
+        "accuracy": 5
+    }
+
+
+def test_last_location_mixed_naive_and_aware(seed):
+    student_id = seed["students"]["STU2"]
+    aware = datetime(2030, 1, 1, 10, 0, tzinfo=timezone(timedelta(hours=3)))  # 07:00 UTC
+    naive = datetime(2030, 1, 1, 8, 0)  # 08:00 UTC
+    fixes = [
+        {"student_id": student_id, "school_id": seed["school"], "latitude": 1.0, "longitude": 1.0,
+         "accuracy": None, "timestamp": aware},
+        {"student_id": student_id, "school_id": seed["school"], "latitude": 2.0, "longitude": 2.0,
+         "accuracy": None, "timestamp": naive}
+    ]
+    
+    async def run():
+        async with AsyncSessionLocal() as db:
+            await upsert_last_locations(db, fixes)
+            await db.commit()
+            return (await db.execute(
+                select(models.StudentLastLocation.latitude)
+                .where(models.StudentLastLocation.student_id == student_id)
+            )).scalar_one()
+    
+    assert asyncio.run(run()) == 2.0
+
+
+def test_batch_mixing_naive_and_aware_timestamps(client, admin_headers, parent_headers):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    naive_newer = (now + timedelta(minutes=1)).replace(tzinfo=None)
+    batch = [
+        _fix("STU1", now, lat=-1.30),
+        _fix("STU1", naive_newer, lat=-1.31),
+        _fix("NOPE", now)
+    ]
+    response = client.post("/api/v1/location/batch", json={"locations": batch}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["accepted"] == 2
+    assert response.json()["rejected"] == 1
+    
+    last = client.get("/api/v1/location/STU1/last", headers=parent_headers).json()
+    # The naive fix is read as UTC, so it is the newer one
+    assert last["lat"] == -1.31
+
+
+def test_batch_writes_every_accepted_fix(client, admin_headers, seed):
+    start = datetime(2033, 1, 1, 8, 0, tzinfo=timezone.utc)
+    batch = [_fix(f"STU{i % 3}", start + timedelta(seconds=i)) for i in range(30)]
+    batch.insert(5, _fix("MISSING", start))
+    
+    response = client.post("/api/v1/location/batch", json={"locations": batch}, headers=admin_headers)
+    
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["accepted"], body["rejected"]) == (30, 1)
+    assert [result["index"] for result in body["results"]] == list(range(31))
+    assert body["results"][5] == {"index": 5, "student_id": "MISSING", "status": "rejected", "detail": "Student not found"}
+    
+    async def stored():
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(
+                select(func.count()).select_from(models.LocationTracking)
+                .where(models.LocationTracking.timestamp >= start.replace(tzinfo=None))
+            )).scalar_one()
+    
+    assert asyncio.run(stored()) == 30
+
+
+def test_batch_size_is_capped(client, admin_headers):
+    now = datetime.now(timezone.utc)
+    batch = [_fix("STU0", now) for _ in range(1001)]
+    
+    response = client.post("/api/v1/location/batch", json={"locations": batch}, headers=admin_headers)
+    
+    assert response.status_code == 422
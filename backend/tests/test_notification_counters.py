@@ -0,0 +1,58 @@
+"""Unread notification counters kept in step with the notifications table"""
+from sqlalchemy import func, select
+
+from config.database import SessionLocal
+from src import models
+from src.notifications.counters import rebuild_unread_counts
+
+
+def _unread_rows(recipient_id: int) -> int:
+    with SessionLocal() as db:
+        return db.scalar(
+            select(func.count())
+            .select_from(models.Notification)
+            .where(models.Notification.recipient_id == recipient_id, models.Notification.is_read.is_(False))
+        )
+
+
+def test_counter_follows_sends_and_reads(client, seed, admin_headers, other_teacher_headers):
+    # A student of its own so no other test's notifications reach this teacher
+    with SessionLocal() as db:
+        db.add(models.Student(
+            student_id="CNT1", full_name="Counter Student", class_name="5B",
+            school_id=seed["other_school"], parent_id=seed["parent"], teacher_id=seed["other_teacher"]
+        ))
+        db.commit()
+    
+    def unread() -> int:
+        response = client.get("/api/v1/notifications/unread-count", headers=other_teacher_headers)
+        assert response.status_code == 200, response.text
+        return response.json()["unread"]
+    
+    assert unread() == 0
+    ids = []
+    for message in ("one", "two", "three"):
+        response = client.post(
+            "/api/v1/notifications/",
+            json={"recipient_role": "teacher", "student_id": "CNT1", "type": "alert", "message": message},
+            headers=admin_headers
+        )
+        assert response.status_code == 200, response.text
+        ids += response.json()["notification_ids"]
+    assert unread() == 3 == _unread_rows(seed["other_teacher"])
+    
+    # Marking the same notification twice only counts once
+    for _ in range(2):
+        response = client.put(f"/api/v1/notifications/{ids[0]}/read", headers=other_teacher_headers)
+        assert response.status_code == 200, response.text
+    assert unread() == 2
+    
+    response = client.put(
+        "/api/v1/notifications/read-all", params={"up_to_id": ids[1]}, headers=other_teacher_headers
+    )
+    assert response.json() == {"marked": 1, "unread": 1}
+    assert unread() == 1 == _unread_rows(seed["other_teacher"])
+    
+    with SessionLocal() as db:
+        rebuild_unread_counts(db)
+    assert unread() == 1
@@ -0,0 +1,90 @@
+"""Attendance digests built by the notification coalescer"""
+import asyncio
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.notifications import service
+from src.notifications.service import NotificationCoalescer, attendance_digest_message
+from src.students.resolver import StudentIdentity
+
+
+def _student(id: int, full_name: str, parent_id: Optional[int] = None) -> StudentIdentity:
+    return StudentIdentity(
+        id=id, student_id=f"STU{id}", full_name=full_name, class_name="4A",
+        school_id=1, parent_id=parent_id, teacher_id=None
+    )
+
+
+def test_digest_counts_students_by_id():
+    twin_a, twin_b = _student(1, "Amani Otieno"), _student(2, "Amani Otieno")
+    events = [(twin_a, "07:30"), (twin_b, "07:30"), (twin_a, "07:31")]
+    
+    assert attendance_digest_message("arrival", events).startswith(
+        "2 students arrived at school between 07:30 and 07:31: Amani Otieno, Amani Otieno"
+    )
+
+
+def test_repeated_scans_of_one_student_are_not_a_digest():
+    student = _student(1, "Amani Otieno")
+    
+    message = attendance_digest_message("arrival", [(student, "07:30"), (student, "07:31")])
+    
+    assert "students" not in message
+    assert "Amani Otieno" in message
+
+
+def test_window_opens_only_when_the_notice_is_dispatched():
+    coalescer = NotificationCoalescer(window_seconds=60, flush_interval_seconds=5)
+    
+    assert coalescer.is_holding(7, "arrival") is False
+    coalescer.open_window(7, "arrival")
+    assert coalescer.is_holding(7, "arrival") is True
+    assert coalescer.is_holding(7, "departure") is False
+    assert coalescer.is_holding(8, "arrival") is False
+
+
+def test_rolled_back_scan_opens_no_window(monkeypatch):
+    coalescer = NotificationCoalescer(window_seconds=60, flush_interval_seconds=5)
+    monkeypatch.setattr(service, "coalescer", coalescer)
+    student = _student(1, "Amani Otieno", parent_id=7)
+    session = SimpleNamespace(added=[])
+    session.add = session.added.append
+    
+    # Two scans staged in one transaction: only the first gets its own row
+    staged = set()
+    first = service.add_attendance_notifications(session, student, "arrival", "07:30", staged)
+    second = service.add_attendance_notifications(session, student, "arrival", "07:31", staged)
+    assert (first.recipients, second.deferred) == ([7], [7])
+    assert len(session.added) == 1
+    
+    # The transaction rolled back, so nothing was dispatched
+    assert coalescer.is_holding(7, "arrival") is False
+    assert service.add_attendance_notifications(session, student, "arrival", "07:32").recipients == [7]
+
+
+def test_failed_flush_keeps_the_digest(monkeypatch, seed):
+    coalescer = NotificationCoalescer(window_seconds=60, flush_interval_seconds=5)
+    students = [
+        _student(seed["students"][f"STU{index}"], f"Student {index}", parent_id=seed["parent"])
+        for index in range(2)
+    ]
+    coalescer.open_window(seed["parent"], "arrival")
+    for student in students:
+        coalescer.defer(seed["parent"], "arrival", student, "07:30")
+    
+    def unavailable():
+        raise OperationalError("INSERT", {}, Exception("database is unavailable"))
+    
+    monkeypatch.setattr(service, "AsyncSessionLocal", unavailable)
+    with pytest.raises(OperationalError):
+        asyncio.run(coalescer.flush(everything=True))
+    assert coalescer.stats()["held_events"] == 2
+    assert coalescer.stats()["digests_sent"] == 0
+    
+    monkeypatch.undo()
+    assert asyncio.run(coalescer.flush(everything=True)) == 1
+    assert coalescer.stats()["held_events"] == 0
+    assert coalescer.stats()["events_coalesced"] == 2
@@ -0,0 +1,63 @@
+import asyncio
+
+from src.notifications.service import NotificationDispatcher
+
+
+def test_slow_channel_does_not_delay_other_channels():
+    async def scenario():
+        dispatcher = NotificationDispatcher(queue_size=1000, max_attempts=1, retry_base_seconds=0.01)
+        delivered = {}
+        
+        async def slow_sms(**payload):
+            await asyncio.sleep(0.2)
+        
+        async def push(**payload):
+            delivered["push"] = loop.time()
+        
+        loop = asyncio.get_running_loop()
+        dispatcher.register_channel("sms", slow_sms, concurrency=2)
+        dispatcher.register_channel("push", push, concurrency=2)
+        await dispatcher.start()
+        
+        started = loop.time()
+        for i in range(40):
+            dispatcher.enqueue("sms", n=i)
+        dispatcher.enqueue("push", n=0)
+        await asyncio.sleep(0.1)
+        
+        stats = dispatcher.stats()
+        await dispatcher.stop(timeout=0)
+        return delivered.get("push", float("inf")) - started, stats
+    
+    push_latency, stats = asyncio.run(scenario())
+    
+    assert push_latency < 0.1
+    assert stats["channels"]["push"]["sent"] == 1
+    assert stats["channels"]["sms"]["in_flight"] == 2
+    assert stats["channels"]["sms"]["queued"] == 38
+
+
+def test_failed_sends_retry_then_dead_letter():
+    async def scenario():
+        dispatcher = NotificationDispatcher(queue_size=10, max_attempts=3, retry_base_seconds=0.001)
+        calls = []
+        
+        async def failing(**payload):
+            calls.append(payload)
+            raise RuntimeError("provider down")
+        
+        dispatcher.register_channel("email", failing, concurrency=1)
+        await dispatcher.start()
+        dispatcher.enqueue("email", to="parent@example.com")
+        for _ in range(100):
+            if dispatcher.dead_letters:
+                break
+            await asyncio.sleep(0.01)
+        await dispatcher.stop(timeout=0)
+        return calls, dispatcher
+    
+    calls, dispatcher = asyncio.run(scenario())
+    
+    assert len(calls) == 3
+    assert dispatcher.stats()["channels"]["email"]["retried"] == 2
+    assert dispatcher.dead_letters[0]["error"] == "RuntimeError('provider down')"
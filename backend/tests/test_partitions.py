@@ -0,0 +1,41 @@
+"""Partition maintenance for location_tracking (PostgreSQL only)"""
+from datetime import timedelta
+
+from sqlalchemy import text
+
+from src.location_tracking import partitions
+
+
+def test_ensure_partitions_moves_rows_out_of_default(pg_conn):
+    # The parent as migration 004 leaves it, with no monthly partitions yet
+    pg_conn.execute(text(
+        "CREATE TABLE location_tracking ("
+        "id SERIAL, student_id INTEGER NOT NULL, latitude DOUBLE PRECISION NOT NULL, "
+        "longitude DOUBLE PRECISION NOT NULL, accuracy DOUBLE PRECISION, "
+        "timestamp TIMESTAMPTZ NOT NULL, created_at TIMESTAMPTZ DEFAULT now(), "
+        "PRIMARY KEY (id, timestamp)) PARTITION BY RANGE (timestamp)"
+    ))
+    pg_conn.execute(text("CREATE TABLE location_tracking_default PARTITION OF location_tracking DEFAULT"))
+    this_month = partitions._current_month()
+    far_future = partitions._add_months(this_month, 36)
+    pg_conn.execute(
+        text(
+            "INSERT INTO location_tracking (student_id, latitude, longitude, timestamp) VALUES "
+            "(1, 1.0, 1.0, :now), (1, 2.0, 2.0, :now), (1, 3.0, 3.0, :far)"
+        ),
+        {"now": this_month + timedelta(days=1), "far": far_future}
+    )
+    
+    created = partitions.ensure_partitions(pg_conn, months_ahead=1)
+    
+    current = partitions.partition_name(this_month)
+    assert created == [current, partitions.partition_name(partitions._add_months(this_month, 1))]
+    assert pg_conn.execute(text(f"SELECT count(*) FROM {current}")).scalar() == 2
+    # Rows outside the new months stay in the default partition, which is attached again
+    assert pg_conn.execute(text("SELECT count(*) FROM location_tracking_default")).scalar() == 1
+    assert pg_conn.execute(text("SELECT count(*) FROM location_tracking")).scalar() == 3
+    assert pg_conn.execute(text(
+        "SELECT relispartition FROM pg_class WHERE oid = to_regclass('location_tracking_default')"
+    )).scalar()
+    
+    assert partitions.ensure_partitions(pg_conn, months_ahead=1) == []
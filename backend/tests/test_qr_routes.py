@@ -0,0 +1,67 @@
+"""QR code generation and validation endpoints"""
+from sqlalchemy import update
+
+from config.database import SessionLocal
+from src import models
+from src.qr_verification.rendering import render_cache
+
+
+def _batch(seed) -> dict:
+    return {"school_id": seed["school"], "class_name": "4A", "type": "arrival", "format": "matrix"}
+
+
+def test_batch_for_own_class(client, seed, teacher_headers):
+    response = client.post("/api/v1/qr/batch", json=_batch(seed), headers=teacher_headers)
+    
+    assert response.status_code == 200, response.text
+    assert response.json()["count"] == 3
+
+
+def test_batch_rejects_teacher_of_another_class(client, seed, other_teacher_headers):
+    response = client.post("/api/v1/qr/batch", json=_batch(seed), headers=other_teacher_headers)
+    
+    assert response.status_code == 403
+
+
+def test_batch_for_admin(client, seed, admin_headers):
+    response = client.post("/api/v1/qr/batch", json=_batch(seed), headers=admin_headers)
+    
+    assert response.status_code == 200, response.text
+    assert response.json()["count"] == 3
+
+
+def test_get_renders_and_caches_on_miss(client, seed, admin_headers):
+    generated = client.post(
+        "/api/v1/qr/generate",
+        json={"student_id": "STU0", "type": "departure", "format": "matrix"},
+        headers=admin_headers
+    ).json()
+    token = generated["token"]
+    render_cache.pop((token, "svg"))
+    
+    response = client.get(f"/api/v1/qr/{token}", params={"format": "svg"}, headers=admin_headers)
+    
+    assert response.status_code == 200, response.text
+    assert response.json()["qr_code_url"].startswith("data:image/svg+xml")
+    assert render_cache.get((token, "svg")) is not None
+
+
+def test_validate_sees_codes_used_through_another_worker(client, seed, admin_headers):
+    token = client.post(
+        "/api/v1/qr/generate",
+        json={"student_id": "STU0", "type": "arrival", "format": "matrix"},
+        headers=admin_headers
+    ).json()["token"]
+    
+    response = client.post("/api/v1/qr/validate", json={"token": token, "scanner_id": "gate-1"}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "valid"
+    
+    # Consumed elsewhere: this worker's spent-nonce store never saw it
+    with SessionLocal() as db:
+        db.execute(update(models.QRToken).where(models.QRToken.token == token).values(is_used=True))
+        db.commit()
+    
+    response = client.post("/api/v1/qr/validate", json={"token": token, "scanner_id": "gate-1"}, headers=admin_headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "QR code already used"
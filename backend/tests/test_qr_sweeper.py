@@ -0,0 +1,63 @@
+"""QR token sweeper: batched deletion of expired and used tokens"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from config.database import SessionLocal
+from src import models
+from src.qr_verification.sweeper import QRTokenSweeper
+
+
+def test_sweep_deletes_stale_tokens_in_batches(seed):
+    now = datetime.now(timezone.utc)
+    long_ago = now - timedelta(days=2)
+    tokens = {
+        # Expired well past the retention window
+        **{f"sweep-expired-{index}": (False, long_ago, long_ago) for index in range(3)},
+        # Used, and created before the retention window
+        **{f"sweep-used-{index}": (True, now + timedelta(minutes=10), long_ago) for index in range(2)},
+        # Fresh and unused, or used too recently to delete
+        "sweep-fresh": (False, now + timedelta(minutes=10), now),
+        "sweep-old-unused": (False, now + timedelta(minutes=10), long_ago),
+        "sweep-just-used": (True, now + timedelta(minutes=10), now),
+        "sweep-just-expired": (False, now - timedelta(minutes=1), now - timedelta(minutes=16))
+    }
+    sweeper = QRTokenSweeper(interval_seconds=60, batch_size=2, max_batches=2, retention_minutes=60)
+    
+    async def sweep_twice():
+        # Clear anything other tests left behind, so the counts below are ours
+        await QRTokenSweeper(60, 1000, 1000, 60).sweep()
+        db = SessionLocal()
+        db.add_all([
+            models.QRToken(
+                token=token,
+                student_id=seed["students"]["STU0"],
+                type=models.AttendanceType.ARRIVAL,
+                is_used=is_used,
+                expires_at=expires_at,
+                created_at=created_at
+            )
+            for token, (is_used, expires_at, created_at) in tokens.items()
+        ])
+        db.commit()
+        db.close()
+        # Two batches of two, then the one row the batch cap left behind
+        return await sweeper.sweep(), await sweeper.sweep()
+    
+    first, second = asyncio.run(sweep_twice())
+    
+    db = SessionLocal()
+    try:
+        remaining = set(db.execute(
+            select(models.QRToken.token).where(models.QRToken.token.in_(list(tokens)))
+        ).scalars())
+    finally:
+        db.close()
+    
+    assert (first, second) == (4, 1)
+    assert remaining == {"sweep-fresh", "sweep-old-unused", "sweep-just-used", "sweep-just-expired"}
+    stats = sweeper.stats()
+    assert (stats["sweeps"], stats["deleted_total"], stats["last_deleted"]) == (2, 5, 1)
+    assert stats["table_rows"] >= len(remaining)
+    assert stats["last_swept_at"] is not None
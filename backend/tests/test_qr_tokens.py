@@ -0,0 +1,69 @@
+"""Signed QR tokens"""
+import hashlib
+import hmac
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from config.settings import get_settings
+from src.models import AttendanceType
+from src.qr_verification import tokens
+from src.qr_verification.tokens import (
+    ExpiredQRToken,
+    InvalidQRToken,
+    issue_qr_token,
+    verify_qr_token
+)
+
+
+def _expiry(minutes: int = 15) -> datetime:
+    return (datetime.now(timezone.utc) + timedelta(minutes=minutes)).replace(microsecond=0)
+
+
+def test_round_trip():
+    expires_at = _expiry()
+    claims = verify_qr_token(issue_qr_token("STU1", AttendanceType.ARRIVAL, expires_at))
+    assert claims.student_id == "STU1"
+    assert claims.type == AttendanceType.ARRIVAL
+    assert claims.expires_at == expires_at
+
+
+def test_tampered_token_rejected():
+    token = issue_qr_token("STU1", AttendanceType.ARRIVAL, _expiry())
+    payload, mac = token.split(".")
+    forged = tokens._b64encode(tokens._b64decode(payload).replace(b"STU1", b"STU2"))
+    with pytest.raises(InvalidQRToken):
+        verify_qr_token(f"{forged}.{mac}")
+
+
+def test_expiry_checked_against_scan_time():
+    token = issue_qr_token("STU1", AttendanceType.ARRIVAL, _expiry(-1))
+    with pytest.raises(ExpiredQRToken):
+        verify_qr_token(token)
+    assert verify_qr_token(token, at=datetime.now(timezone.utc) - timedelta(minutes=5)).student_id == "STU1"
+
+
+def test_signing_key_is_not_the_jwt_secret():
+    settings = get_settings()
+    assert not settings.qr_signing_key
+    key = tokens._signing_key()
+    assert key != settings.secret_key.encode()
+    # A MAC made with the JWT secret must not verify
+    payload = f"v1|STU1|arrival|{int(_expiry().timestamp())}|nonce".encode()
+    mac = hmac.new(settings.secret_key.encode(), payload, hashlib.sha256).digest()[:16]
+    with pytest.raises(InvalidQRToken):
+        verify_qr_token(f"{tokens._b64encode(payload)}.{tokens._b64encode(mac)}")
+
+
+def test_separator_in_student_id_rejected():
+    with pytest.raises(ValueError):
+        issue_qr_token("STU|1", AttendanceType.ARRIVAL, _expiry())
+
+
+def test_student_id_with_separator_cannot_be_created(client, admin_headers, seed):
+    response = client.post(
+        "/api/v1/students/",
+        json={"student_id": "A|B", "full_name": "Pipe", "school_id": seed["school"], "parent_id": seed["parent"]},
+        headers=admin_headers
+    )
+    assert response.status_code == 422
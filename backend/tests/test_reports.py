@@ -0,0 +1,70 @@
+"""Attendance report export: keyset pagination and streamed CSV"""
+import base64
+from datetime import datetime, timezone
+
+import pytest
+
+from config.database import SessionLocal
+from src import models
+from src.reports.routes import ATTENDANCE_EXPORT_FIELDS
+
+
+def test_cursor_pages_through_equal_timestamps(client, seed, admin_headers):
+    # Five scans sharing one timestamp, so only the id breaks ties between pages
+    timestamp = datetime(2031, 6, 7, 5, 0, tzinfo=timezone.utc)
+    db = SessionLocal()
+    scans = [
+        models.Attendance(
+            student_id=seed["students"]["STU2"],
+            type=models.AttendanceType.ARRIVAL,
+            timestamp=timestamp,
+            scanner_id=f"report-{index}"
+        )
+        for index in range(5)
+    ]
+    db.add_all(scans)
+    db.commit()
+    expected = sorted((scan.id for scan in scans), reverse=True)
+    db.close()
+    
+    seen = []
+    params = {"student_id": "STU2", "date": "2031-06-07", "limit": 2}
+    while True:
+        response = client.get("/api/v1/reports/attendance", params=params, headers=admin_headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        seen.extend(row["id"] for row in body["data"])
+        if not body["next_cursor"]:
+            break
+        params["cursor"] = body["next_cursor"]
+    
+    assert seen == expected
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"2031-06-07T05:00:00").decode(),
+    base64.urlsafe_b64encode(b"yesterday|12").decode(),
+    base64.urlsafe_b64encode(b"2031-06-07T05:00:00|twelve").decode()
+])
+def test_malformed_cursor_is_400(client, seed, admin_headers, cursor):
+    response = client.get(
+        "/api/v1/reports/attendance",
+        params={"cursor": cursor},
+        headers=admin_headers
+    )
+    
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_csv_export_of_empty_range_is_header_only(client, seed, admin_headers):
+    response = client.get(
+        "/api/v1/reports/attendance",
+        params={"start_date": "2031-07-01", "end_date": "2031-07-31", "format": "csv"},
+        headers=admin_headers
+    )
+    
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines() == [",".join(ATTENDANCE_EXPORT_FIELDS)]
@@ -0,0 +1,82 @@
+"""Daily attendance rollups: incremental counters and the rebuild command"""
+import asyncio
+from datetime import date, datetime, timezone
+
+from sqlalchemy import select
+
+from config.database import AsyncSessionLocal, SessionLocal
+from src import models
+from src.reports.rollups import rebuild_rollups, record_attendance_rollups, rollup_counts
+from src.students.resolver import StudentIdentity
+
+
+def test_naive_timestamps_are_utc():
+    # 21:30 UTC is 00:30 the next day in Nairobi
+    aware = datetime(2031, 3, 1, 21, 30, tzinfo=timezone.utc)
+    
+    assert rollup_counts("arrival", aware.replace(tzinfo=None)) == rollup_counts("arrival", aware)
+    assert rollup_counts("arrival", aware)[0] == date(2031, 3, 2)
+
+
+def test_rebuild_matches_incremental_counters(client, seed, admin_headers):
+    student = StudentIdentity(
+        id=seed["students"]["STU1"], student_id="STU1", full_name="Student 1", class_name="4A",
+        school_id=seed["school"], parent_id=seed["parent"], teacher_id=seed["teacher"]
+    )
+    scans = [
+        ("arrival", datetime(2031, 3, 1, 4, 30, tzinfo=timezone.utc)),  # 07:30 local, on time
+        ("arrival", datetime(2031, 3, 1, 5, 30, tzinfo=timezone.utc)),  # 08:30 local, late
+        ("departure", datetime(2031, 3, 1, 21, 30, tzinfo=timezone.utc))  # 00:30 local, next day
+    ]
+    
+    def read_rollups():
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(models.AttendanceDailyRollup)
+                .where(models.AttendanceDailyRollup.day.between(date(2031, 3, 1), date(2031, 3, 2)))
+            ).scalars()
+            return {
+                (row.school_id, row.class_name, row.day): (
+                    row.arrivals, row.departures, row.late_arrivals, row.students_arrived
+                )
+                for row in rows
+            }
+        finally:
+            db.close()
+    
+    async def record(batch):
+        async with AsyncSessionLocal() as db:
+            db.add_all([
+                models.Attendance(student_id=student.id, type=models.AttendanceType(kind), timestamp=timestamp)
+                for kind, timestamp in batch
+            ])
+            await record_attendance_rollups(db, [(student, kind, timestamp) for kind, timestamp in batch])
+            await db.commit()
+    
+    # The second arrival comes in a later transaction and must not count the student again
+    asyncio.run(record(scans[:1]))
+    asyncio.run(record(scans[1:]))
+    incremental = read_rollups()
+    
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db, since=date(2031, 3, 1))
+    finally:
+        db.close()
+    
+    assert incremental == {
+        (seed["school"], "4A", date(2031, 3, 1)): (2, 0, 1, 1),
+        (seed["school"], "4A", date(2031, 3, 2)): (0, 1, 0, 0)
+    }
+    assert read_rollups() == incremental
+    
+    response = client.get(
+        "/api/v1/reports/attendance/summary",
+        params={"school_id": seed["school"], "start_date": "2031-03-01", "class_name": "4A"},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    (day,) = response.json()["data"]
+    # Three students enrolled in 4A, one of whom scanned in twice
+    assert (day["arrivals"], day["students_arrived"], day["absentees"]) == (2, 1, 2)
@@ -0,0 +1,207 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from config.database import SessionLocal
+from src import models
+from src.streaming.routes import (
+    WS_POLICY_VIOLATION,
+    WS_TRY_AGAIN_LATER,
+    ClientConnection,
+    ConnectionManager,
+    manager
+)
+
+from conftest import login
+
+
+class FakeWebSocket:
+    def __init__(self, send_delay: float = 0.0):
+        self.send_delay = send_delay
+        self.sent = []
+        self.close_codes = []
+    
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.send_delay)
+        self.sent.append(text)
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code: int = 1000):
+        self.close_codes.append(code)
+
+
+def _run(scenario):
+    return asyncio.run(scenario())
+
+
+def test_location_queue_drops_oldest():
+    async def scenario():
+        websocket = FakeWebSocket()
+        closed = []
+        connection = ClientConnection(websocket, max_queue=2, on_close=closed.append)
+        for i in range(5):
+            connection.send_text(str(i))
+        await asyncio.sleep(0.01)
+        connection.close()
+        return websocket, connection, closed
+    
+    websocket, connection, closed = _run(scenario)
+    
+    assert websocket.sent == ["3", "4"]
+    assert connection.dropped == 3
+    assert websocket.close_codes == [] and closed == []
+
+
+def test_notification_overflow_closes_socket():
+    async def scenario():
+        websocket = FakeWebSocket()
+        closed = []
+        connection = ClientConnection(websocket, max_queue=2, on_close=closed.append, drop_oldest=False)
+        for i in range(3):
+            connection.send_text(str(i))
+        await asyncio.sleep(0.01)
+        return websocket, connection, closed
+    
+    websocket, connection, closed = _run(scenario)
+    
+    assert websocket.sent == []
+    assert websocket.close_codes == [WS_TRY_AGAIN_LATER]
+    assert closed == [connection]
+
+
+def test_stalled_send_closes_socket(monkeypatch):
+    from src.streaming import routes
+    
+    monkeypatch.setattr(routes.settings, "ws_send_timeout_seconds", 0.05)
+    
+    async def scenario():
+        websocket = FakeWebSocket(send_delay=1.0)
+        closed = []
+        connection = ClientConnection(websocket, max_queue=4, on_close=closed.append)
+        connection.send_text("slow")
+        await asyncio.sleep(0.2)
+        return websocket, connection, closed
+    
+    websocket, connection, closed = _run(scenario)
+    
+    assert websocket.close_codes == [WS_TRY_AGAIN_LATER]
+    assert closed == [connection]
+
+
+def test_slow_client_does_not_delay_the_others():
+    async def scenario():
+        manager = ConnectionManager()
+        slow = FakeWebSocket(send_delay=1.0)
+        fast = [FakeWebSocket() for _ in range(3)]
+        for websocket in [slow, *fast]:
+            await manager.connect_location(websocket, "STU0")
+        for n in range(5):
+            await manager.broadcast_location("STU0", {"type": "location_update", "n": n})
+        await asyncio.sleep(0.05)
+        stats = manager.stats()
+        for websocket in [slow, *fast]:
+            manager.disconnect_location(websocket, "STU0")
+        return slow, fast, stats
+    
+    slow, fast, stats = _run(scenario)
+    
+    assert all(len(websocket.sent) == 5 for websocket in fast)
+    assert slow.sent == []
+    assert stats["location_connections"] == 4
+    # The first message is in flight; the queue of 16 holds the other four
+    assert stats["dropped_messages"] == 0
+
+
+def test_bus_failure_does_not_fail_location_posts(client, admin_headers, monkeypatch):
+    from src.streaming.pubsub import event_bus
+    
+    async def failing_publish(channel, message):
+        raise ConnectionError("redis unavailable")
+    
+    monkeypatch.setattr(event_bus, "publish", failing_publish)
+    response = client.post(
+        "/api/v1/location/",
+        json={
+            "student_id": "STU0",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "location": {"lat": -1.2921, "lng": 36.8219},
+            "accuracy": 5
+        },
+        headers=admin_headers
+    )
+    
+    assert response.status_code == 200, response.text
+
+
+def test_bus_failure_is_retried_by_the_dispatcher(monkeypatch):
+    from src.notifications.service import NotificationDispatcher
+    from src.streaming.pubsub import event_bus
+    from src.streaming.routes import send_notification_update
+    
+    attempts = []
+    
+    async def flaky_publish(channel, message):
+        attempts.append(channel)
+        if len(attempts) == 1:
+            raise ConnectionError("redis unavailable")
+    
+    monkeypatch.setattr(event_bus, "publish", flaky_publish)
+    
+    async def scenario():
+        dispatcher = NotificationDispatcher(queue_size=10, max_attempts=3, retry_base_seconds=0.001)
+        dispatcher.register_channel("websocket", send_notification_update, concurrency=1)
+        await dispatcher.start()
+        dispatcher.enqueue("websocket", user_id=1, notification_type="arrival", message="hi")
+        for _ in range(100):
+            if dispatcher.stats()["channels"]["websocket"]["sent"]:
+                break
+            await asyncio.sleep(0.01)
+        await dispatcher.stop(timeout=0)
+        return dispatcher.stats()["channels"]["websocket"]
+    
+    stats = _run(scenario)
+    
+    assert stats["retried"] == 1 and stats["sent"] == 1
+    assert len(attempts) == 2
+
+
+def _token(client, role: str) -> str:
+    return login(client, role)["Authorization"].split(" ", 1)[1]
+
+
+@pytest.mark.parametrize("path", ["/api/v1/streaming/location/STU0", "/api/v1/streaming/notifications"])
+def test_stream_rejects_invalid_token(client, seed, path):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(f"{path}?token=not-a-jwt"):
+            pass
+    
+    assert closed.value.code == WS_POLICY_VIOLATION
+
+
+def test_location_stream_applies_the_parent_check(client, seed):
+    with SessionLocal() as db:
+        db.add(models.Student(
+            student_id="WS1", full_name="Someone Else's Child", class_name="6C", school_id=seed["other_school"]
+        ))
+        db.commit()
+    token = _token(client, "parent")
+    
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(f"/api/v1/streaming/location/WS1?token={token}"):
+            pass
+    assert closed.value.code == WS_POLICY_VIOLATION
+    
+    with client.websocket_connect(f"/api/v1/streaming/location/STU0?token={token}") as websocket:
+        assert websocket.receive_json()["type"] == "connection"
+
+
+def test_notification_stream_belongs_to_the_token_user(client, seed):
+    token = _token(client, "parent")
+    
+    with client.websocket_connect(f"/api/v1/streaming/notifications?token={token}") as websocket:
+        assert websocket.receive_json()["type"] == "connection"
+        assert list(manager.notification_connections) == [seed["parent"]]
@@ -28,6 +28,16 @@ interface ESalamaApiService {
         @Header("Authorization") token: String
     ): Response<ApiResponse>
 
+    /**
+     * Record queued scans in order; each scan's idempotency key makes
+     * retries safe. The server sends the parent and teacher notifications.
+     */
+    @POST("api/v1/attendance/sync")
+    suspend fun syncAttendance(
+        @Body request: AttendanceSyncRequest,
+        @Header("Authorization") token: String
+    ): Response<AttendanceSyncResponse>
+
     @POST("api/v1/notifications")
     suspend fun sendNotification(
         @Body notification: NotificationRequest,
@@ -74,6 +74,64 @@ data class AttendanceRecord(
     val scannerId: String? = null
 )
 
+data class LocationPoint(
+    @SerializedName("lat")
+    val lat: Double,
+    @SerializedName("lng")
+    val lng: Double
+)
+
+/**
+ * A scan queued on the device until it reaches /attendance/sync.
+ * The idempotency key is generated once when the scan is queued, so
+ * re-sending a batch whose response was lost cannot record it twice.
+ */
+data class QueuedScan(
+    @SerializedName("idempotency_key")
+    val idempotencyKey: String,
+    @SerializedName("student_id")
+    val studentId: String,
+    @SerializedName("type")
+    val type: String, // "arrival" or "departure"
+    @SerializedName("timestamp")
+    val timestamp: String, // ISO 8601 UTC, the time of the scan
+    @SerializedName("location")
+    val location: LocationPoint,
+    @SerializedName("qr_code_token")
+    val qrCodeToken: String,
+    @SerializedName("scanner_id")
+    val scannerId: String? = null
+)
+
+data class AttendanceSyncRequest(
+    @SerializedName("scans")
+    val scans: List<QueuedScan>
+)
+
+data class AttendanceSyncResult(
+    @SerializedName("index")
+    val index: Int,
+    @SerializedName("idempotency_key")
+    val idempotencyKey: String,
+    @SerializedName("status")
+    val status: String, // "recorded", "duplicate" or "rejected"
+    @SerializedName("attendance_id")
+    val attendanceId: Int? = null,
+    @SerializedName("detail")
+    val detail: String? = null
+)
+
+data class AttendanceSyncResponse(
+    @SerializedName("recorded")
+    val recorded: Int,
+    @SerializedName("duplicates")
+    val duplicates: Int,
+    @SerializedName("rejected")
+    val rejected: Int,
+    @SerializedName("results")
+    val results: List<AttendanceSyncResult>
+)
+
 data class NotificationRequest(
     @SerializedName("user_id")
     val userId: Int,
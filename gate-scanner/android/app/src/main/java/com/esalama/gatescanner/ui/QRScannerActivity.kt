@@ -2,6 +2,7 @@ package com.esalama.gatescanner.ui
 
 import android.annotation.SuppressLint
 import android.os.Bundle
+import android.util.Base64
 import android.util.Log
 import android.view.View
 import android.widget.ProgressBar
@@ -15,14 +16,18 @@ import androidx.core.content.ContextCompat
 import androidx.lifecycle.lifecycleScope
 import com.esalama.gatescanner.R
 import com.esalama.gatescanner.data.api.RetrofitClient
-import com.esalama.gatescanner.data.model.AttendanceRecord
-import com.esalama.gatescanner.data.model.NotificationRequest
-import com.esalama.gatescanner.data.model.QRValidationRequest
+import com.esalama.gatescanner.data.model.AttendanceSyncRequest
+import com.esalama.gatescanner.data.model.AttendanceSyncResult
+import com.esalama.gatescanner.data.model.LocationPoint
+import com.esalama.gatescanner.data.model.QueuedScan
 import com.esalama.gatescanner.utils.PreferencesManager
+import com.esalama.gatescanner.utils.ScanQueue
 import com.google.mlkit.vision.barcode.BarcodeScanning
 import com.google.mlkit.vision.barcode.common.Barcode
 import com.google.mlkit.vision.common.InputImage
 import kotlinx.coroutines.launch
+import kotlinx.coroutines.sync.Mutex
+import kotlinx.coroutines.sync.withLock
 import java.text.SimpleDateFormat
 import java.util.*
 import java.util.concurrent.ExecutorService
@@ -37,15 +42,18 @@ class QRScannerActivity : AppCompatActivity() {
     private lateinit var resultTextView: TextView
     private lateinit var progressBar: ProgressBar
     private lateinit var prefsManager: PreferencesManager
+    private lateinit var scanQueue: ScanQueue
     private lateinit var cameraExecutor: ExecutorService
     
     private var isProcessing = false
     private var lastScannedCode: String? = null
     private var lastScanTime: Long = 0
+    private val syncMutex = Mutex()
 
     companion object {
         private const val TAG = "QRScannerActivity"
         private const val SCAN_COOLDOWN_MS = 3000L // 3 seconds cooldown between scans
+        private const val QR_BASE64_FLAGS = Base64.URL_SAFE or Base64.NO_WRAP
     }
 
     override fun onCreate(savedInstanceState: Bundle?) {
@@ -53,6 +61,7 @@ class QRScannerActivity : AppCompatActivity() {
         setContentView(R.layout.activity_qr_scanner)
 
         prefsManager = PreferencesManager(this)
+        scanQueue = ScanQueue(this)
 
         // Initialize views
         previewView = findViewById(R.id.previewView)
@@ -63,6 +72,9 @@ class QRScannerActivity : AppCompatActivity() {
 
         // Start camera
         startCamera()
+
+        // Send anything queued while the app was offline or closed
+        lifecycleScope.launch { syncPendingScans() }
     }
 
     private fun startCamera() {
@@ -158,40 +170,29 @@ class QRScannerActivity : AppCompatActivity() {
     }
 
     private fun validateAndProcessQR(qrToken: String) {
+        val scan = queueScan(qrToken)
+        if (scan == null) {
+            showError("Invalid QR code")
+            isProcessing = false
+            showLoading(false)
+            return
+        }
+
         lifecycleScope.launch {
             try {
-                val apiService = RetrofitClient.getApiService()
-                val token = prefsManager.getBearerToken()
-                
-                if (token == null) {
-                    showError("Not authenticated. Please log in again.")
-                    return@launch
+                val result = syncPendingScans()[scan.idempotencyKey]
+                when (result?.status) {
+                    "recorded", "duplicate" -> showSuccess(
+                        """
+                            ✓ SUCCESS
+                            Student: ${scan.studentId}
+                            Type: ${scan.type.uppercase()}
+                            Time: ${SimpleDateFormat("HH:mm:ss", Locale.getDefault()).format(Date())}
+                        """.trimIndent()
+                    )
+                    "rejected" -> showError("Scan rejected: ${result.detail}")
+                    else -> showQueued()
                 }
-
-                // Validate QR code
-                val validationRequest = QRValidationRequest(
-                    qrToken = qrToken,
-                    scannerId = prefsManager.getScannerId(),
-                    location = "Main Gate"
-                )
-
-                val response = apiService.validateQR(validationRequest, token)
-
-                if (response.isSuccessful && response.body() != null) {
-                    val validationResponse = response.body()!!
-                    
-                    if (validationResponse.valid) {
-                        // QR code is valid - record attendance
-                        recordAttendance(validationResponse)
-                    } else {
-                        showError("Invalid QR code: ${validationResponse.message}")
-                    }
-                } else {
-                    showError("Validation failed: ${response.message()}")
-                }
-            } catch (e: Exception) {
-                showError("Error: ${e.message}")
-                Log.e(TAG, "Error validating QR", e)
             } finally {
                 isProcessing = false
                 showLoading(false)
@@ -199,82 +200,73 @@ class QRScannerActivity : AppCompatActivity() {
         }
     }
 
-    private suspend fun recordAttendance(validationResponse: com.esalama.gatescanner.data.model.QRValidationResponse) {
-        try {
-            val apiService = RetrofitClient.getApiService()
-            val token = prefsManager.getBearerToken() ?: return
-
-            // Get current timestamp
-            val timestamp = SimpleDateFormat("yyyy-MM-dd'T'HH:mm:ss", Locale.getDefault())
-                .format(Date())
-
-            // Create attendance record
-            val attendanceRecord = AttendanceRecord(
-                studentId = validationResponse.studentId ?: 0,
-                scanType = validationResponse.scanType ?: "arrival",
-                timestamp = timestamp,
-                location = "Main Gate",
-                scannerId = prefsManager.getScannerId()
-            )
-
-            // Record attendance
-            val attendanceResponse = apiService.recordAttendance(attendanceRecord, token)
-
-            if (attendanceResponse.isSuccessful) {
-                // Send notifications to parent and teacher
-                sendNotifications(validationResponse)
-                
-                // Show success message
-                val message = """
-                    ✓ SUCCESS
-                    Student: ${validationResponse.studentName}
-                    Class: ${validationResponse.studentClass}
-                    Type: ${validationResponse.scanType?.uppercase()}
-                    Time: ${SimpleDateFormat("HH:mm:ss", Locale.getDefault()).format(Date())}
-                """.trimIndent()
-                
-                showSuccess(message)
-            } else {
-                showError("Failed to record attendance")
-            }
-        } catch (e: Exception) {
-            showError("Error recording attendance: ${e.message}")
-            Log.e(TAG, "Error recording attendance", e)
+    /**
+     * Put a scan in the offline queue before touching the network.
+     * The token is only decoded here to fill in the student and type; the
+     * server checks its signature and expiry against the scan time on sync.
+     */
+    private fun queueScan(qrToken: String): QueuedScan? {
+        val fields = try {
+            String(Base64.decode(qrToken.substringBefore("."), QR_BASE64_FLAGS)).split("|")
+        } catch (e: IllegalArgumentException) {
+            return null
         }
+        if (fields.size != 5 || fields[0] != "v1") {
+            return null
+        }
+
+        val (latitude, longitude) = prefsManager.getGateLocation()
+        val timestamp = SimpleDateFormat("yyyy-MM-dd'T'HH:mm:ss'Z'", Locale.US).apply {
+            timeZone = TimeZone.getTimeZone("UTC")
+        }.format(Date())
+        val scan = QueuedScan(
+            idempotencyKey = UUID.randomUUID().toString(),
+            studentId = fields[1],
+            type = fields[2],
+            timestamp = timestamp,
+            location = LocationPoint(latitude, longitude),
+            qrCodeToken = qrToken,
+            scannerId = prefsManager.getScannerId()
+        )
+        scanQueue.add(scan)
+        return scan
     }
 
-    private suspend fun sendNotifications(validationResponse: com.esalama.gatescanner.data.model.QRValidationResponse) {
+    /**
+     * Send queued scans to /attendance/sync, oldest first, and drop the ones
+     * the server answered. Scans stay queued while the network is down; a
+     * retry of a batch whose response was lost comes back as duplicates.
+     * Returns the server's results keyed by idempotency key.
+     */
+    private suspend fun syncPendingScans(): Map<String, AttendanceSyncResult> = syncMutex.withLock {
+        val results = mutableMapOf<String, AttendanceSyncResult>()
         try {
             val apiService = RetrofitClient.getApiService()
-            val token = prefsManager.getBearerToken() ?: return
-
-            val notificationMessage = when (validationResponse.scanType) {
-                "arrival" -> "Good morning, ${validationResponse.studentName} has safely entered the school gate at ${
-                    SimpleDateFormat("hh:mm a", Locale.getDefault()).format(Date())
-                }."
-                "departure" -> "${validationResponse.studentName} has left the school at ${
-                    SimpleDateFormat("hh:mm a", Locale.getDefault()).format(Date())
-                }."
-                else -> "${validationResponse.studentName} was scanned at the gate."
-            }
+            val token = prefsManager.getBearerToken() ?: return@withLock results
 
-            // Note: In a real implementation, you would get parent and teacher IDs from the backend
-            // For now, we're creating a notification that the backend will route appropriately
-            val notification = NotificationRequest(
-                userId = validationResponse.studentId ?: 0,
-                type = validationResponse.scanType ?: "arrival",
-                message = notificationMessage,
-                studentId = validationResponse.studentId
-            )
-
-            // Send notification (backend should handle routing to parents and teachers)
-            apiService.sendNotification(notification, token)
-            
-            Log.d(TAG, "Notification sent successfully")
+            while (true) {
+                val batch = scanQueue.peek(ScanQueue.MAX_BATCH)
+                if (batch.isEmpty()) {
+                    break
+                }
+                val response = apiService.syncAttendance(AttendanceSyncRequest(batch), token)
+                val body = response.body()
+                if (!response.isSuccessful || body == null) {
+                    Log.w(TAG, "Attendance sync failed: ${response.code()} ${response.message()}")
+                    break
+                }
+                body.results.forEach { results[it.idempotencyKey] = it }
+                scanQueue.remove(body.results.map { it.idempotencyKey }.toSet())
+                Log.d(TAG, "Synced ${body.recorded} scans, ${body.duplicates} duplicates, ${body.rejected} rejected")
+                if (batch.size < ScanQueue.MAX_BATCH) {
+                    break
+                }
+            }
         } catch (e: Exception) {
-            Log.e(TAG, "Error sending notifications", e)
-            // Don't show error to user as this is not critical
+            // Offline: everything stays queued for the next attempt
+            Log.w(TAG, "Attendance sync deferred, ${scanQueue.size()} scans queued", e)
         }
+        results
     }
 
     private fun showLoading(show: Boolean) {
@@ -297,6 +289,19 @@ class QRScannerActivity : AppCompatActivity() {
         }
     }
 
+    private fun showQueued() {
+        runOnUiThread {
+            resultTextView.text = "✓ SAVED OFFLINE\n${scanQueue.size()} scans will sync when the connection returns"
+            resultTextView.setTextColor(ContextCompat.getColor(this, android.R.color.holo_orange_dark))
+
+            // Reset after 3 seconds
+            resultTextView.postDelayed({
+                resultTextView.text = "Point camera at QR code"
+                resultTextView.setTextColor(ContextCompat.getColor(this, android.R.color.white))
+            }, 3000)
+        }
+    }
+
     private fun showError(message: String) {
         runOnUiThread {
             resultTextView.text = "ERROR: $message"
@@ -20,6 +20,8 @@ class PreferencesManager(context: Context) {
         private const val KEY_USER_ROLE = "user_role"
         private const val KEY_API_BASE_URL = "api_base_url"
         private const val KEY_SCANNER_ID = "scanner_id"
+        private const val KEY_GATE_LATITUDE = "gate_latitude"
+        private const val KEY_GATE_LONGITUDE = "gate_longitude"
         private const val DEFAULT_API_URL = "http://10.0.2.2:8000/"
     }
 
@@ -68,6 +70,21 @@ class PreferencesManager(context: Context) {
         return prefs.getString(KEY_SCANNER_ID, "scanner_001") ?: "scanner_001"
     }
 
+    fun setGateLocation(latitude: Double, longitude: Double) {
+        prefs.edit().apply {
+            putString(KEY_GATE_LATITUDE, latitude.toString())
+            putString(KEY_GATE_LONGITUDE, longitude.toString())
+            apply()
+        }
+    }
+
+    /** Coordinates recorded with every scan from this gate */
+    fun getGateLocation(): Pair<Double, Double> {
+        val latitude = prefs.getString(KEY_GATE_LATITUDE, null)?.toDoubleOrNull() ?: 0.0
+        val longitude = prefs.getString(KEY_GATE_LONGITUDE, null)?.toDoubleOrNull() ?: 0.0
+        return latitude to longitude
+    }
+
     fun isLoggedIn(): Boolean {
         return getAuthToken() != null
     }
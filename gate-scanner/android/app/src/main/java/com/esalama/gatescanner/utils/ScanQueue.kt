@@ -0,0 +1,58 @@
+package com.esalama.gatescanner.utils
+
+import android.content.Context
+import android.content.SharedPreferences
+import com.esalama.gatescanner.data.model.QueuedScan
+import com.google.gson.Gson
+import com.google.gson.reflect.TypeToken
+
+/**
+ * Scans waiting to be sent to /attendance/sync, kept across restarts
+ *
+ * Every scan is queued before any network call, so a gate with no
+ * connection keeps working and nothing is lost if the app is killed.
+ * Scans leave the queue only once the server has given them a result.
+ */
+class ScanQueue(context: Context) {
+
+    private val prefs: SharedPreferences = context.getSharedPreferences(
+        PREFS_NAME, Context.MODE_PRIVATE
+    )
+    private val gson = Gson()
+
+    companion object {
+        private const val PREFS_NAME = "esalama_gate_scanner_queue"
+        private const val KEY_SCANS = "queued_scans"
+        const val MAX_BATCH = 1000 // Server limit per /attendance/sync request
+    }
+
+    @Synchronized
+    fun add(scan: QueuedScan) {
+        save(load() + scan)
+    }
+
+    @Synchronized
+    fun peek(limit: Int = MAX_BATCH): List<QueuedScan> {
+        return load().take(limit)
+    }
+
+    @Synchronized
+    fun remove(idempotencyKeys: Set<String>) {
+        save(load().filterNot { it.idempotencyKey in idempotencyKeys })
+    }
+
+    @Synchronized
+    fun size(): Int {
+        return load().size
+    }
+
+    private fun load(): List<QueuedScan> {
+        val json = prefs.getString(KEY_SCANS, null) ?: return emptyList()
+        val type = object : TypeToken<List<QueuedScan>>() {}.type
+        return gson.fromJson(json, type)
+    }
+
+    private fun save(scans: List<QueuedScan>) {
+        prefs.edit().putString(KEY_SCANS, gson.toJson(scans)).commit()
+    }
+}